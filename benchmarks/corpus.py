@@ -0,0 +1,24 @@
+"""Seeded synthetic corpora, so every benchmark run sees the same data."""
+import random
+from typing import Any, Dict, List
+import numpy as np
+from vertexops.utils import EMBED_DIM
+
+WORDS = ("model deploy vector search query token latency cache index shard registry job dataset "
+         "embedding prompt context answer stream batch metric trace budget worker queue").split()
+
+def texts(n: int, words: int = 40, seed: int = 0) -> List[str]:
+    """n pseudo-documents of `words` words drawn from a small domain vocabulary."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=words)) for _ in range(n)]
+
+def embeddings(n: int, dim: int = EMBED_DIM, seed: int = 0) -> np.ndarray:
+    """(n, dim) float32 Gaussian vectors."""
+    return np.random.default_rng(seed).standard_normal((n, dim), dtype=np.float32)
+
+def items(n: int, dim: int = EMBED_DIM, words: int = 40, seed: int = 0) -> List[Dict[str, Any]]:
+    """bulk_add() items with precomputed embeddings, so ingest isn't dominated by hashing text."""
+    vecs = embeddings(n, dim, seed)
+    docs = texts(n, words, seed)
+    return [{"id": f"doc-{i}", "text": docs[i], "embedding": vecs[i].tolist(), "metadata": {"shard": i % 16}}
+            for i in range(n)]
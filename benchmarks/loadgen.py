@@ -0,0 +1,165 @@
+"""
+Open-loop load generator for the VertexOps API.
+
+Requests arrive as a Poisson process at --rate per second, whether or not earlier ones
+have finished, so a stalled server shows up as growing latency rather than a politely
+slower client (no coordinated omission: latency counts from the scheduled start). The
+workload is a weighted mix of search/add/rag/deploy. By default the app is driven
+in-process through httpx's ASGI transport; --url targets a running server instead.
+
+For in-process runs, an event-loop lag probe is also reported. It shows how long
+handlers (or the vector store lock) hold the loop.
+
+    python -m benchmarks.loadgen --rate 300 --duration 20 --mix search=70,add=20,rag=9,deploy=1
+    python -m benchmarks.loadgen --url http://127.0.0.1:8080 --rate 100 --corpus 0
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import httpx
+from benchmarks import corpus
+
+HEADERS = {"x-api-key": "supersecret123"}
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in REQUESTS:
+            raise SystemExit(f"unknown workload {name!r}; choose from {', '.join(REQUESTS)}")
+        mix[name] = float(weight)
+    return mix
+
+def _search(rng: random.Random, docs: List[str]):
+    return "POST", "/vector/search", {"json": {"text": rng.choice(docs), "top_k": 10}}
+
+def _add(rng: random.Random, docs: List[str]):
+    return "POST", "/vector/add", {"params": {"id": f"load-{rng.getrandbits(48):x}", "text": rng.choice(docs)}}
+
+def _rag(rng: random.Random, docs: List[str]):
+    return "POST", "/rag/query", {"json": {"query": rng.choice(docs), "top_k": 5}}
+
+def _deploy(rng: random.Random, docs: List[str]):
+    return "POST", "/models/deploy", {"json": {"model_type": "custom", "config": {}}}
+
+REQUESTS = {"search": _search, "add": _add, "rag": _rag, "deploy": _deploy}
+
+async def loop_lag_probe(samples: List[float], interval: float = 0.01):
+    """Record how late a periodic wakeup fires: time the loop was busy with something else."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+async def run(client: httpx.AsyncClient, rate: float, duration: float, mix: Dict[str, float], seed: int,
+              queries: List[str]) -> Tuple[Dict[str, list], float]:
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    stats: Dict[str, list] = defaultdict(list)  # name -> [(latency, ok)]
+
+    async def one(name: str, scheduled: float):
+        method, path, kwargs = REQUESTS[name](rng, queries)
+        try:
+            response = await client.request(method, path, headers=HEADERS, **kwargs)
+            ok = response.status_code < 400
+            if not ok:
+                stats[f"{name}.status"].append(response.status_code)
+        except Exception as e:
+            ok = False
+            stats[f"{name}.status"].append(type(e).__name__)
+        stats[name].append((time.perf_counter() - scheduled, ok))
+
+    tasks = []
+    start = time.perf_counter()
+    next_at = start
+    while next_at - start < duration:
+        next_at += rng.expovariate(rate)
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(rng.choices(names, weights)[0], next_at)))
+    await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - start
+
+def summarize(stats: Dict[str, list], elapsed: float) -> Dict[str, Dict[str, float]]:
+    report = {}
+    for name, samples in stats.items():
+        if name.endswith(".status"):
+            continue
+        latencies = np.asarray([lat for lat, _ in samples]) * 1000
+        errors = sum(1 for _, ok in samples if not ok)
+        p50, p95, p99, p999 = np.percentile(latencies, [50, 95, 99, 99.9])
+        statuses = stats.get(f"{name}.status", [])
+        report[name] = {"requests": len(samples), "qps": len(samples) / elapsed, "error_rate": errors / len(samples),
+                        "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "p999_ms": p999,
+                        "errors": {str(s): statuses.count(s) for s in set(statuses)}}
+    return report
+
+def print_report(report: Dict[str, Dict[str, float]], lag: Optional[List[float]]):
+    print(f"{'endpoint':<10} {'reqs':>7} {'qps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'p99.9':>8}  (ms)")
+    for name, r in sorted(report.items()):
+        print(f"{name:<10} {r['requests']:>7} {r['qps']:>8.1f} {r['error_rate'] * 100:>6.2f} {r['p50_ms']:>8.2f} "
+              f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['p999_ms']:>8.2f}")
+        if r["errors"]:
+            print(f"{'':<10} errors: {r['errors']}")
+    if lag:
+        p50, p99, worst = np.percentile(np.asarray(lag) * 1000, [50, 99, 100])
+        print(f"event-loop lag: p50 {p50:.2f}ms  p99 {p99:.2f}ms  max {worst:.2f}ms")
+
+async def main_async(args) -> dict:
+    mix = parse_mix(args.mix)
+    queries = corpus.texts(1000, words=8, seed=args.seed + 1)
+    lag: Optional[List[float]] = None
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            for i in range(args.corpus):
+                await client.post("/vector/add", headers=HEADERS, params={"id": f"corpus-{i}", "text": queries[i % len(queries)]})
+            stats, elapsed = await run(client, args.rate, args.duration, mix, args.seed, queries)
+    else:
+        from vertexops import main, admission
+        if args.no_admission:
+            admission.controller = admission.AdmissionController(rates="", concurrency="", queue="")
+        async with main.app.router.lifespan_context(main.app):
+            if args.corpus:
+                main.vector_store.bulk_add(corpus.items(args.corpus, seed=args.seed))
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=args.timeout) as client:
+                lag = []
+                probe = asyncio.create_task(loop_lag_probe(lag))
+                try:
+                    stats, elapsed = await run(client, args.rate, args.duration, mix, args.seed, queries)
+                finally:
+                    probe.cancel()
+    report = summarize(stats, elapsed)
+    print_report(report, lag)
+    return {"args": vars(args), "elapsed": elapsed, "endpoints": report,
+            "loop_lag_ms": None if not lag else {"p50": float(np.percentile(lag, 50) * 1000),
+                                                 "p99": float(np.percentile(lag, 99) * 1000),
+                                                 "max": float(max(lag) * 1000)}}
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=200, help="mean arrivals per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of arrivals")
+    parser.add_argument("--mix", default="search=70,add=20,rag=9,deploy=1", help="weighted workload mix")
+    parser.add_argument("--corpus", type=int, default=10_000, help="documents loaded before the run")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--no-admission", action="store_true", help="in-process: disable rate limits/load shedding")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the report as JSON here")
+    args = parser.parse_args(argv)
+    result = asyncio.run(main_async(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2, default=float)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Per-request overhead of the metrics middleware: the pure ASGI MetricsMiddleware
+against the BaseHTTPMiddleware function it replaced, on a trivial parametrised route.
+Requests are driven straight through the ASGI interface so only the app stack is timed.
+
+    python -m benchmarks.middleware --requests 20000
+"""
+import argparse
+import asyncio
+from time import perf_counter
+from fastapi import FastAPI
+from vertexops.middleware import MetricsMiddleware
+from vertexops.monitoring import record_request
+from vertexops.tracing import start_trace, server_timing
+
+def build_app(kind: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    if kind == "asgi":
+        app.add_middleware(MetricsMiddleware)
+    elif kind == "base_http":
+        @app.middleware("http")
+        async def add_metrics(request, call_next):
+            # The middleware as it was before MetricsMiddleware, raw-path labels included
+            start = perf_counter()
+            spans = start_trace()
+            response = await call_next(request)
+            latency = perf_counter() - start
+            record_request(request.method, request.url.path, str(response.status_code), latency)
+            response.headers["Server-Timing"] = server_timing(spans, latency)
+            return response
+    return app
+
+async def drive(app: FastAPI, requests: int, distinct_ids: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        path = f"/items/{i % distinct_ids}"
+        return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+                "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+    for i in range(200):  # warm up
+        await app(scope(i), receive, send)
+    start = perf_counter()
+    for i in range(requests):
+        await app(scope(i), receive, send)
+    return (perf_counter() - start) / requests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--distinct-ids", type=int, default=1000, help="distinct paths hitting the one route")
+    args = parser.parse_args()
+    results = {kind: asyncio.run(drive(build_app(kind), args.requests, args.distinct_ids))
+               for kind in ("none", "base_http", "asgi")}
+    print(f"{'middleware':<12} {'us/request':>11} {'overhead us':>12}")
+    for kind, seconds in results.items():
+        print(f"{kind:<12} {seconds * 1e6:>11.1f} {(seconds - results['none']) * 1e6:>12.1f}")
+
+if __name__ == "__main__":
+    main()
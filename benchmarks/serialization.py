@@ -0,0 +1,52 @@
+"""
+Before/after cost of serializing /vector/search responses.
+
+"before" is the default path: build VectorSearchResponse (pydantic validation), then
+FastAPI's jsonable_encoder + JSONResponse. "after" are the fast-path variants.
+
+    python -m benchmarks.serialization --top-k 100 500 --text-bytes 1000
+"""
+import argparse
+import random
+import string
+import timeit
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from vertexops.schemas import VectorSearchResponse
+from vertexops.serialization import FastJSONResponse, project, orjson
+
+def make_results(top_k: int, text_bytes: int):
+    rng = random.Random(0)
+    return [{"score": rng.random(), "id": f"doc-{i}",
+             "text": "".join(rng.choices(string.ascii_letters + " ", k=text_bytes)),
+             "metadata": {"source": "bench", "chunk": i}} for i in range(top_k)]
+
+def before(results):
+    model = VectorSearchResponse(results=results)
+    return JSONResponse(jsonable_encoder(model)).body
+
+def after(results):
+    return FastJSONResponse({"results": results}).body
+
+def after_projected(results):
+    return FastJSONResponse({"results": project(results, ["id", "score"])}).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--text-bytes", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}")
+    print(f"{'top_k':>6} {'variant':<16} {'ms/resp':>9} {'bytes':>10} {'speedup':>8}")
+    for top_k in args.top_k:
+        results = make_results(top_k, args.text_bytes)
+        number = max(1, 2000 // top_k)
+        base = None
+        for name, fn in (("before", before), ("fast", after), ("fast+fields", after_projected)):
+            best = min(timeit.repeat(lambda: fn(results), number=number, repeat=args.repeat)) / number
+            base = base or best
+            print(f"{top_k:>6} {name:<16} {best * 1000:>9.3f} {len(fn(results)):>10} {base / best:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
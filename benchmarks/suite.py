@@ -0,0 +1,158 @@
+"""
+Hot-path benchmarks: text_to_embedding throughput, bulk_add ingest rate, search
+p50/p99 by corpus size and top_k, memory per vector, and in-process RAGService latency
+(against the zero-latency LLM stub, so only our own code is timed).
+
+Results are written as JSON. With --baseline they are compared against an earlier
+results file, and the run exits non-zero if any metric regressed by more than
+--threshold (a fraction, default 0.2).
+
+    python -m benchmarks.suite --sizes 10000 100000 --out bench.json
+    python -m benchmarks.suite --sizes 10000 100000 --baseline bench.json
+    python -m benchmarks.suite --sizes 1000000 --top-k 10 --queries 50   # the 1M corpus
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tracemalloc
+from typing import Any, Dict, List
+import numpy as np
+import httpx
+from vertexops.utils import text_to_embedding
+from vertexops.vector_store import InMemoryVectorStore
+from vertexops.rag_service import RAGService
+from vertexops.llm_client import LLMClient
+from vertexops.llm_stub import FaultInjectingLLM
+from benchmarks import corpus
+
+Results = Dict[str, Dict[str, Any]]
+
+def metric(results: Results, name: str, value: float, unit: str, better: str):
+    results[name] = {"value": round(value, 4), "unit": unit, "better": better}
+    print(f"{name:<40} {value:>14.3f} {unit}")
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return {"p50": float(p50), "p99": float(p99)}
+
+def bench_embedding(results: Results, n: int):
+    docs = corpus.texts(n, seed=1)
+    start = time.perf_counter()
+    for doc in docs:
+        text_to_embedding(doc)
+    metric(results, "embedding.texts_per_s", n / (time.perf_counter() - start), "texts/s", "higher")
+
+def build_store(n: int) -> InMemoryVectorStore:
+    store = InMemoryVectorStore()
+    store.bulk_add(corpus.items(n))
+    return store
+
+def bench_ingest(results: Results, n: int, batch: int = 10_000) -> InMemoryVectorStore:
+    items = corpus.items(n)
+    store = InMemoryVectorStore()
+    start = time.perf_counter()
+    for i in range(0, n, batch):
+        store.bulk_add(items[i:i + batch])
+    metric(results, f"ingest.{n}.vectors_per_s", n / (time.perf_counter() - start), "vectors/s", "higher")
+    return store
+
+def bench_memory(results: Results, n: int):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # Items are built inside the traced window so the texts the store keeps are counted;
+    # what the store doesn't keep (the embedding lists) is freed before measuring
+    items = corpus.items(n)
+    store = InMemoryVectorStore()
+    store.bulk_add(items)
+    del items
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    metric(results, f"memory.{n}.bytes_per_vector", used / len(store), "bytes", "lower")
+
+def bench_search(results: Results, store: InMemoryVectorStore, n: int, top_ks: List[int], queries: int):
+    qs = corpus.embeddings(queries, seed=2).tolist()
+    store.search(qs[0], top_k=max(top_ks))  # warm up
+    for k in top_ks:
+        samples = []
+        for q in qs:
+            start = time.perf_counter()
+            store.search(q, top_k=k)
+            samples.append(time.perf_counter() - start)
+        p = percentiles(samples)
+        metric(results, f"search.{n}.k{k}.p50_ms", p["p50"], "ms", "lower")
+        metric(results, f"search.{n}.k{k}.p99_ms", p["p99"], "ms", "lower")
+
+def bench_rag(results: Results, store: InMemoryVectorStore, n: int, queries: int):
+    service = RAGService(store)
+    service.cache = None  # every query takes the full path
+    service.llm = LLMClient("bench", "stub-model", base_url="http://stub", hedge=False,
+                            transport=httpx.ASGITransport(app=FaultInjectingLLM(latency=0)))
+    docs = corpus.texts(queries, words=8, seed=3)
+
+    async def run():
+        await service.generate_response(docs[0], top_k=5)  # warm up
+        samples = []
+        for q in docs:
+            start = time.perf_counter()
+            await service.generate_response(q, top_k=5)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    p = percentiles(asyncio.run(run()))
+    metric(results, f"rag.{n}.p50_ms", p["p50"], "ms", "lower")
+    metric(results, f"rag.{n}.p99_ms", p["p99"], "ms", "lower")
+
+def compare(results: Results, baseline: Results, threshold: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than `threshold` (a fraction)."""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None or not base["value"]:
+            continue
+        change = (current["value"] - base["value"]) / base["value"]
+        worse = change if base["better"] == "lower" else -change
+        if worse > threshold:
+            regressions.append(f"{name}: {base['value']} -> {current['value']} {base['unit']} ({worse:+.0%} worse)")
+    return regressions
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="corpus sizes (vectors)")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--queries", type=int, default=200, help="timed queries per search/RAG measurement")
+    parser.add_argument("--embed-texts", type=int, default=20_000)
+    parser.add_argument("--skip-memory", action="store_true", help="memory tracing doubles ingest work")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results: Results = {}
+    bench_embedding(results, args.embed_texts)
+    for n in args.sizes:
+        store = bench_ingest(results, n)
+        if not args.skip_memory:
+            bench_memory(results, n)
+        bench_search(results, store, n, args.top_k, args.queries)
+        bench_rag(results, store, n, args.queries)
+        del store
+
+    report = {"meta": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                       "platform": platform.platform(), "timestamp": time.time(), "args": vars(args)},
+              "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Admission control tests for VertexOps platform"""
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from vertexops import admission
+from vertexops.admission import AdmissionController, ConcurrencyLimiter, Rejected, TokenBucket
+from vertexops.main import app
+
+HEADERS = {"x-api-key": "supersecret123"}
+
+def test_token_bucket_refills():
+    """Test that a drained bucket reports the wait until its next token"""
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0 and bucket.take() == 0
+    wait = bucket.take()
+    assert 0 < wait <= 0.1
+
+def test_concurrency_limiter_queues_then_sheds():
+    """Test FIFO hand-off of slots, queue bound and SLO timeout"""
+    async def scenario():
+        limiter = ConcurrencyLimiter("test", limit=1, max_queue=1, slo=0.2)
+        assert await limiter.acquire() == 0.0
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        with pytest.raises(Rejected) as full:
+            await limiter.acquire()  # queue full
+        assert full.value.status_code == 503
+        limiter.release(0.05)
+        assert await waiter > 0  # got the slot after queueing
+        with pytest.raises(Rejected):
+            await limiter.acquire()  # slot never freed within the SLO
+        assert not limiter._waiters and limiter.active == 1
+        limiter.service_time = 1.0
+        with pytest.raises(Rejected) as slow:
+            await limiter.acquire()  # expected wait is already over the SLO
+        assert slow.value.retry_after == 1.0
+
+    asyncio.run(scenario())
+
+def test_rate_limited_search_returns_429(monkeypatch):
+    """Test that a client over its rate gets 429 with Retry-After, and it's counted"""
+    monkeypatch.setattr(admission, "controller", AdmissionController(rates="search=0.5:2", concurrency="", queue=""))
+    with TestClient(app) as client:
+        codes = [client.post("/vector/search", headers=HEADERS, json={"text": "limit me"}) for _ in range(3)]
+        assert [r.status_code for r in codes] == [200, 200, 429]
+        assert codes[2].headers["retry-after"] == "2"
+        assert client.post("/vector/search", json={"text": "x"}).status_code == 401
+        metrics = client.get("/metrics").text
+        assert 'vertexops_admission_requests_total{result="rate_limited",route_class="search"}' in metrics
@@ -21,6 +21,21 @@ def test_root_endpoint():
         # Should return HTML
         assert "text/html" in response.headers.get("content-type", "")
 
+def test_ui_assets_fingerprinted_and_cached():
+    """Test that pages link fingerprinted, precompressed assets and revalidate with 304"""
+    import re
+    with TestClient(app) as client:
+        page = client.get("/dashboard")
+        assert page.headers["cache-control"] == "no-cache"
+        assert client.get("/dashboard", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+        css = re.search(r'href="(/static/dashboard\.\w+\.css)"', page.text).group(1)
+        response = client.get(css, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert "immutable" in response.headers["cache-control"]
+        assert ".card" in response.text
+        assert client.get("/static/missing.css").status_code == 404
+
 def test_api_info_endpoint():
     """Test the API info endpoint"""
     with TestClient(app) as client:
@@ -90,5 +105,67 @@ def test_rag_query_with_auth():
         assert "response_text" in data
         assert "source_docs" in data
 
+def test_vector_search_with_text():
+    """Test vector search by text"""
+    with TestClient(app) as client:
+        headers = {"x-api-key": "supersecret123"}
+        client.post("/vector/add", headers=headers, params={"id": "search-doc", "text": "searchable document"})
+        response = client.post("/vector/search", headers=headers, json={"text": "searchable document", "top_k": 1})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert results[0]["id"] == "search-doc"
+        assert results[0]["score"] > 0.99
+
+def test_vector_search_fast_path_projection():
+    """Test the fast path's field projection and gzip for large bodies"""
+    from vertexops import serialization
+    with TestClient(app) as client:
+        headers = {"x-api-key": "supersecret123"}
+        client.post("/vector/add", headers=headers, params={"id": "fast-doc", "text": "fast path document"})
+        response = client.post("/vector/search?fields=id,score", headers=headers, json={"text": "fast path document", "top_k": 1})
+        assert response.status_code == 200
+        assert response.json()["results"] == [{"id": "fast-doc", "score": response.json()["results"][0]["score"]}]
+        assert client.post("/vector/search?fields=id,nope", headers=headers, json={"text": "x"}).status_code == 400
+        old = serialization.GZIP_MIN_BYTES
+        serialization.GZIP_MIN_BYTES = 10
+        try:
+            response = client.post("/vector/search?fast=true", headers={**headers, "Accept-Encoding": "gzip"},
+                                   json={"text": "fast path document", "top_k": 1})
+        finally:
+            serialization.GZIP_MIN_BYTES = old
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["results"][0]["text"] == "fast path document"
+
+def test_metrics_labelled_by_route_template():
+    """Test that request metrics use route templates, not raw paths, and record response size"""
+    with TestClient(app) as client:
+        headers = {"x-api-key": "supersecret123"}
+        client.post("/models/no-such-model-1/finetune", headers=headers, json={"dataset_uri": "x"})
+        client.get("/definitely/not/a/route")
+        metrics = client.get("/metrics").text
+        assert 'endpoint="/models/{model_id}/finetune"' in metrics
+        assert "no-such-model-1" not in metrics
+        assert 'endpoint="<unmatched>"' in metrics
+        assert 'vertexops_response_size_bytes_count{endpoint="/models/{model_id}/finetune"}' in metrics
+
+def test_metrics_resource_gauges_computed_at_scrape():
+    """Test that store size, lock, thread and event-loop gauges are read when /metrics is scraped"""
+    from vertexops import main
+    with TestClient(app) as client:
+        headers = {"x-api-key": "supersecret123"}
+        client.post("/vector/add", headers=headers, params={"id": "gauge-doc", "text": "gauge document"})
+        metrics = client.get("/metrics").text
+        values = {line.split(" ")[0]: float(line.split(" ")[1]) for line in metrics.splitlines()
+                  if line.startswith("vertexops_") and " " in line}
+        assert values["vertexops_vector_count"] == len(main.vector_store)
+        assert values["vertexops_vector_embedding_bytes"] == len(main.vector_store) * main.vector_store.dim * 4
+        assert values["vertexops_vector_resident_bytes"] >= values["vertexops_vector_embedding_bytes"]
+        assert "vertexops_vector_lock_wait_seconds_total" in values
+        for registry in ("models", "jobs", "job_owners"):
+            assert f'vertexops_registry_compactions_total{{registry="{registry}"}}' in values
+        assert values["vertexops_job_workers_alive"] > 0
+        assert values["vertexops_threads"] >= 1
+        assert 0 <= values["vertexops_event_loop_lag_seconds"] < 1
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,34 @@
+"""Benchmark suite smoke tests for VertexOps platform"""
+import json
+from benchmarks.suite import compare, main
+
+def test_compare_flags_regressions_by_direction():
+    """Test that only metrics worse than the threshold in their own direction are flagged"""
+    baseline = {"rate": {"value": 100.0, "unit": "ops/s", "better": "higher"},
+                "p99": {"value": 10.0, "unit": "ms", "better": "lower"},
+                "p50": {"value": 5.0, "unit": "ms", "better": "lower"}}
+    results = {"rate": {"value": 70.0}, "p99": {"value": 11.0}, "p50": {"value": 2.0}}
+    regressions = compare(results, baseline, threshold=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("rate:")
+
+def test_suite_writes_results_and_passes_against_itself(tmp_path):
+    """Test a tiny end-to-end run, then a comparison against its own output"""
+    out = tmp_path / "bench.json"
+    args = ["--sizes", "500", "--top-k", "5", "--queries", "5", "--embed-texts", "50"]
+    assert main(args + ["--out", str(out)]) == 0
+    results = json.loads(out.read_text())["results"]
+    assert {"embedding.texts_per_s", "ingest.500.vectors_per_s", "memory.500.bytes_per_vector",
+            "search.500.k5.p99_ms", "rag.500.p50_ms"} <= set(results)
+    assert main(args + ["--baseline", str(out), "--threshold", "1000"]) == 0
+
+def test_loadgen_in_process_reports_percentiles(tmp_path):
+    """Test a short open-loop run against the in-process app"""
+    from benchmarks import loadgen
+    out = tmp_path / "load.json"
+    assert loadgen.main(["--rate", "100", "--duration", "0.3", "--corpus", "100", "--mix", "search=3,add=1",
+                         "--out", str(out)]) == 0
+    report = json.loads(out.read_text())
+    search = report["endpoints"]["search"]
+    assert search["requests"] > 0 and search["error_rate"] == 0
+    assert search["p50_ms"] <= search["p99_ms"] <= search["p999_ms"]
+    assert report["loop_lag_ms"]["max"] >= 0
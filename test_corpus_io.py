@@ -0,0 +1,77 @@
+"""Vector corpus export/import tests for VertexOps platform"""
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from vertexops.main import app
+from vertexops.vector_store import InMemoryVectorStore
+from vertexops import corpus_io
+
+HEADERS = {"x-api-key": "supersecret123"}
+
+def make_store(n=50, dim=8, seed=0):
+    store = InMemoryVectorStore()
+    rng = np.random.default_rng(seed)
+    store.add_embeddings(rng.standard_normal((n, dim), dtype=np.float32),
+                         [{"id": f"doc-{i}", "text": f"text {i} ü", "metadata": {"i": i}} for i in range(n)])
+    return store
+
+def import_bytes(store, data, chunk_size=7):
+    importer = corpus_io.Importer(store)
+    for start in range(0, len(data), chunk_size):
+        for item in importer.feed(data[start:start + chunk_size]):
+            importer.load(item)
+    for item in importer.finish():
+        importer.load(item)
+    return importer
+
+def test_npz_round_trip_in_small_chunks():
+    """Test that an npz export re-imports identically, fed a few bytes at a time, without regrowing"""
+    source = make_store()
+    data = b"".join(corpus_io.export_frames(source, "npz", batch_size=16))
+    target = InMemoryVectorStore()
+    importer = import_bytes(target, data)
+    assert importer.imported == len(target) == 50
+    assert target._records == source._records
+    assert np.array_equal(target._matrix[:50], source._matrix[:50])
+    assert target.stats()["grows"] == 0  # the header pre-sized the matrix
+    assert target.search(source._matrix[3].tolist(), top_k=1)[0]["id"] == "doc-3"
+
+def test_import_rejects_garbage_and_dimension_mismatch():
+    """Test that malformed or truncated streams and mismatched dimensions are format errors"""
+    with pytest.raises(corpus_io.CorpusFormatError):
+        import_bytes(InMemoryVectorStore(), b"not an export at all")
+    data = b"".join(corpus_io.export_frames(make_store(), "npz"))
+    with pytest.raises(corpus_io.CorpusFormatError):
+        import_bytes(InMemoryVectorStore(), data[:-10])
+    with pytest.raises(corpus_io.CorpusFormatError):
+        import_bytes(make_store(dim=4), data)
+
+def test_import_rejects_oversized_or_bogus_header():
+    """Test that the header is validated before anything is reserved for it"""
+    for header in ('{"count": 100000000000, "dim": 8}', '{"count": 10, "dim": -1}',
+                   '{"count": "10", "dim": 8}', '{"count": 10, "dim": 4}', '{"count": 10000000, "dim": 8192}'):
+        store = make_store(n=1, dim=8)
+        with pytest.raises(corpus_io.CorpusFormatError):
+            import_bytes(store, corpus_io.MAGIC + header.encode() + b"\n")
+        assert store.stats()["allocated_bytes"] < 1_000_000
+
+def test_export_import_endpoints():
+    """Test the HTTP round trip: export the app's store and import it back"""
+    from vertexops import main
+    with TestClient(app) as client:
+        client.post("/vector/add", headers=HEADERS, params={"id": "export-doc", "text": "exported document"})
+        before = len(main.vector_store)
+        response = client.get("/vector/export", headers=HEADERS, params={"batch_size": 2})
+        assert response.status_code == 200
+        assert response.headers["x-vector-count"] == str(before)
+        assert response.content.startswith(corpus_io.MAGIC)
+        response = client.post("/vector/import", headers=HEADERS, content=response.content)
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok", "imported": before, "total": 2 * before}
+        response = client.post("/vector/import", headers=HEADERS, content=b"garbage")
+        assert response.status_code == 400
+        huge = corpus_io.MAGIC + b'{"count": 100000000000, "dim": 128}\n'
+        assert client.post("/vector/import", headers=HEADERS, content=huge).status_code == 400
+        wide = corpus_io.MAGIC + b'{"count": 10000000, "dim": 8192}\n'
+        assert client.post("/vector/import", headers=HEADERS, content=wide).status_code == 400
+        assert client.get("/vector/export").status_code == 401
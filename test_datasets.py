@@ -0,0 +1,119 @@
+"""Fine-tune dataset loader tests for VertexOps platform"""
+import json
+import tracemalloc
+import pytest
+from vertexops import datasets
+import os
+from vertexops.datasets import DatasetLoader, DigestSet, resolve_dataset_uri
+
+def write_jsonl(path, records):
+    path.write_text("".join((r if isinstance(r, str) else json.dumps(r)) + "\n" for r in records))
+
+def test_resolve_bucket_uri(monkeypatch, tmp_path):
+    """Test that bucket URIs map onto the local bucket root"""
+    monkeypatch.setattr(datasets, "DATASET_BUCKET_ROOT", tmp_path)
+    assert resolve_dataset_uri("gs://bucket/train/data.jsonl") == tmp_path / "bucket/train/data.jsonl"
+    assert str(resolve_dataset_uri("file:///data/x.csv")) == "/data/x.csv"
+
+def test_loader_validates_dedupes_and_chunks(tmp_path, monkeypatch):
+    """Test validation, dedupe, stats and chunking over a bucket directory of JSONL and CSV"""
+    monkeypatch.setattr(datasets, "DATASET_BUCKET_ROOT", tmp_path / "buckets")
+    root = tmp_path / "buckets" / "ml" / "ft"
+    root.mkdir(parents=True)
+    write_jsonl(root / "a.jsonl", [
+        {"prompt": "What is VertexOps?", "completion": "An LLMOps platform."},
+        {"prompt": "What is VertexOps?", "completion": "An LLMOps platform."},
+        {"messages": [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]},
+        {"prompt": "missing completion"},
+        "{not json",
+    ])
+    (root / "b.csv").write_text("prompt,completion\nQ1,A1\nQ2,A2\n")
+
+    loader = DatasetLoader("gs://ml/ft", chunk_size=2, cache_dir=tmp_path / "cache")
+    chunks = list(loader.iter_chunks())
+    assert [len(c) for c in chunks] == [2, 2]
+    stats = loader.stats.to_dict()
+    assert stats["records"] == 7
+    assert stats["valid"] == 5 and stats["invalid"] == 2 and stats["duplicates"] == 1 and stats["unique"] == 4
+    assert stats["min_tokens"] > 0 and stats["max_tokens"] >= stats["mean_tokens"]
+    assert sum(stats["token_histogram"].values()) == 5
+    assert {e["line"] for e in stats["errors"]} == {4, 5}
+
+def test_loader_reuses_shard_cache(tmp_path):
+    """Test that a second load reads the binary cache and a changed source rebuilds it"""
+    source = tmp_path / "data.jsonl"
+    write_jsonl(source, [{"text": f"record {i}"} for i in range(25)])
+    first = DatasetLoader(str(source), cache_dir=tmp_path / "cache", shard_records=10)
+    records = [r for chunk in first.iter_chunks() for r in chunk]
+    assert not first.from_cache
+    manifest = json.loads(next((tmp_path / "cache").glob("*/manifest.json")).read_text())
+    assert manifest["shards"] == ["shard-00000.bin", "shard-00001.bin", "shard-00002.bin"]
+
+    second = DatasetLoader(str(source), cache_dir=tmp_path / "cache")
+    assert [r for chunk in second.iter_chunks() for r in chunk] == records
+    assert second.from_cache
+    assert second.stats.to_dict() == first.stats.to_dict()
+
+    write_jsonl(source, [{"text": "changed"}])
+    third = DatasetLoader(str(source), cache_dir=tmp_path / "cache")
+    assert third.scan()["valid"] == 1 and not third.from_cache
+
+def test_loader_memory_is_bounded(tmp_path):
+    """Test that peak memory stays flat while streaming a dataset much larger than it"""
+    source = tmp_path / "big.jsonl"
+    with open(source, "w") as f:
+        for i in range(30000):
+            f.write(json.dumps({"prompt": f"question {i} " + "x" * 200, "completion": "answer"}) + "\n")
+    loader = DatasetLoader(str(source), chunk_size=500, cache_dir=tmp_path / "cache")
+    tracemalloc.start()
+    stats = loader.scan()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert stats["unique"] == 30000
+    assert source.stat().st_size > 6_000_000
+    assert peak < 4_000_000
+
+def test_digest_set_is_exact_across_levels():
+    """Test that dedupe has no false positives or negatives once digests are frozen into sorted levels"""
+    digests = [os.urandom(16) for _ in range(5000)]
+    seen = DigestSet(buffer_size=64)
+    assert not any(seen.add(d) for d in digests)
+    assert all(seen.add(d) for d in digests)
+    assert len(seen) == 5000
+    # Shared prefix, and digests that differ only in trailing zero bytes
+    assert seen.add(digests[0][:8] + bytes(8)) is False
+    assert seen.add(digests[0][:8] + bytes(7) + b"\x01") is False
+    assert seen.add(digests[0][:8] + bytes(8)) is True
+
+def test_digest_set_spills_runs_past_its_memory_limit(tmp_path):
+    """Test that past the memory limit levels are merged into run files and lookups stay exact"""
+    digests = [os.urandom(16) for _ in range(20000)]
+    seen = DigestSet(buffer_size=256, memory_limit=16 * 2048, directory=tmp_path / "runs")
+    seen.MERGE_BLOCK = 100  # many blocks per merge
+    assert not any(seen.add(d) for d in digests)
+    assert seen.memory_bytes <= 16 * 2048
+    assert list((tmp_path / "runs").iterdir())
+    assert all(seen.add(d) for d in digests)
+    assert len(seen) == 20000
+
+def test_concurrent_builds_do_not_clobber_each_other(tmp_path):
+    """Test that two interleaved builds of one dataset both finish and publish a single cache"""
+    source = tmp_path / "data.jsonl"
+    write_jsonl(source, [{"text": f"record {i}"} for i in range(30)])
+    first = DatasetLoader(str(source), chunk_size=5, cache_dir=tmp_path / "cache", shard_records=10)
+    second = DatasetLoader(str(source), chunk_size=5, cache_dir=tmp_path / "cache", shard_records=10)
+    a, b = first.iter_chunks(), second.iter_chunks()
+    out_a, out_b = [next(a)], [next(b)]  # both builds in progress at once
+    out_a.extend(a)
+    out_b.extend(b)
+    assert sum(map(len, out_a)) == sum(map(len, out_b)) == 30
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == [first.fingerprint()]
+    assert DatasetLoader(str(source), cache_dir=tmp_path / "cache").scan()["unique"] == 30
+
+def test_missing_dataset(tmp_path):
+    """Test that a missing dataset is reported clearly"""
+    with pytest.raises(FileNotFoundError):
+        DatasetLoader(str(tmp_path / "nope.jsonl"), cache_dir=tmp_path).scan()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,53 @@
+"""Dashboard event stream tests for VertexOps platform"""
+import time
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from vertexops.main import app
+from vertexops.broadcaster import SnapshotBroadcaster
+
+def test_snapshot_broadcaster_shares_one_computation():
+    """Test that many subscribers share one sampler and only changed snapshots are published"""
+    state = {"models": 1}
+    broadcaster = SnapshotBroadcaster(lambda: {"timestamp": time.time(), **state}, interval=0.01)
+
+    async def scenario():
+        subs = [broadcaster.subscribe() for _ in range(5)]
+        first = [await sub.get(timeout=1) for sub in subs]
+        assert all(event == ("snapshot", first[0][1]) for event in first)
+        await asyncio.sleep(0.05)
+        state["models"] = 2
+        second = [await sub.get(timeout=1) for sub in subs]
+        assert all(event[1]["models"] == 2 for event in second)
+        for sub in subs:
+            sub.close()
+        await asyncio.sleep(0.05)
+        return broadcaster._task.done()
+
+    assert asyncio.run(scenario())
+    # One computation per tick, not per subscriber
+    assert broadcaster.computations < 20
+
+def test_snapshot_is_computed_off_the_event_loop():
+    """Test that the snapshot (registry reads and all) is computed on a worker thread"""
+    threads = []
+    broadcaster = SnapshotBroadcaster(lambda: threads.append(threading.current_thread()) or {"timestamp": time.time()},
+                                      interval=0.01)
+
+    async def scenario():
+        with broadcaster.subscribe() as sub:
+            await sub.get(timeout=1)
+        await broadcaster.stop()
+
+    asyncio.run(scenario())
+    assert threads and threading.main_thread() not in threads
+
+def test_events_endpoint_requires_api_key():
+    """Test that the /events stream rejects a missing or wrong API key"""
+    with TestClient(app) as client:
+        assert client.get("/events").status_code == 401
+        assert client.get("/events?api_key=wrong").status_code == 403
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,281 @@
+"""Job scheduler tests for VertexOps platform"""
+import time
+import threading
+import pytest
+from vertexops.jobs import JobScheduler
+from vertexops.model_service import ModelService
+
+def wait_for(predicate, timeout=5.0):
+    """Poll until predicate() is true"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_priority_order_with_single_worker(tmp_path):
+    """Test that higher-priority jobs run first"""
+    order, gate = [], threading.Event()
+    scheduler = JobScheduler(tmp_path / "jobs.json", workers=1)
+    scheduler.register("blocker", lambda job, cancelled: gate.wait(5))
+    scheduler.register("work", lambda job, cancelled: order.append(job["payload"]["name"]))
+    scheduler.start()
+    scheduler.submit("blocker")
+    scheduler.submit("work", {"name": "low"}, priority=0)
+    scheduler.submit("work", {"name": "high"}, priority=5)
+    gate.set()
+    assert wait_for(lambda: len(order) == 2)
+    assert order == ["high", "low"]
+    scheduler.stop()
+
+def test_per_model_type_limit(tmp_path):
+    """Test that a model type never exceeds its concurrency limit"""
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def handler(job, cancelled):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    scheduler = JobScheduler(tmp_path / "jobs.json", workers=4, type_limits={"vertex": 1})
+    scheduler.register("deploy", handler)
+    scheduler.start()
+    jobs = [scheduler.submit("deploy", model_type="vertex") for _ in range(4)]
+    assert wait_for(lambda: all(scheduler.get(j["job_id"])["status"] == "succeeded" for j in jobs))
+    assert peak[0] == 1
+    scheduler.stop()
+
+def test_cancel_queued_and_running(tmp_path):
+    """Test cancelling a queued job and signalling a running one"""
+    started = threading.Event()
+
+    def handler(job, cancelled):
+        started.set()
+        cancelled.wait(5)
+
+    scheduler = JobScheduler(tmp_path / "jobs.json", workers=1)
+    scheduler.register("work", handler)
+    scheduler.start()
+    running = scheduler.submit("work")
+    queued = scheduler.submit("work")
+    assert started.wait(2)
+    assert scheduler.cancel(queued["job_id"])["status"] == "cancelled"
+    scheduler.cancel(running["job_id"])
+    assert wait_for(lambda: scheduler.get(running["job_id"])["status"] == "cancelled")
+    assert scheduler.get(queued["job_id"])["started_at"] is None
+    assert scheduler.cancel("missing") is None
+    scheduler.stop()
+
+def test_cancel_leaves_finished_jobs_alone(tmp_path):
+    """Test that cancelling a job that already finished changes nothing and notifies nobody"""
+    scheduler = JobScheduler(tmp_path / "jobs.json", workers=1)
+    scheduler.register("work", lambda job, cancelled: {"ok": True})
+    seen = []
+    scheduler.add_listener(seen.append)
+    scheduler.start()
+    job = scheduler.submit("work")
+    assert wait_for(lambda: scheduler.get(job["job_id"])["status"] == "succeeded")
+    finished = dict(scheduler.get(job["job_id"]))
+    notified = len(seen)
+    assert scheduler.cancel(job["job_id"]) == finished
+    assert scheduler.get(job["job_id"]) == finished
+    assert "cancel_requested" not in finished
+    assert len(seen) == notified
+    scheduler.stop()
+
+def test_failed_job_records_error(tmp_path):
+    """Test that a raising handler marks the job failed"""
+    def handler(job, cancelled):
+        raise RuntimeError("boom")
+
+    scheduler = JobScheduler(tmp_path / "jobs.json", workers=1)
+    scheduler.register("work", handler)
+    scheduler.start()
+    job = scheduler.submit("work")
+    assert wait_for(lambda: scheduler.get(job["job_id"])["status"] == "failed")
+    assert scheduler.get(job["job_id"])["message"] == "boom"
+    scheduler.stop()
+
+def test_unfinished_jobs_resume_after_restart(tmp_path):
+    """Test that queued jobs survive a restart"""
+    first = JobScheduler(tmp_path / "jobs.json", workers=1)
+    first.register("work", lambda job, cancelled: None)
+    job = first.submit("work")  # never started: no workers
+    first.stop()
+
+    second = JobScheduler(tmp_path / "jobs.json", workers=1)
+    second.register("work", lambda job, cancelled: {"ok": True})
+    second.start()
+    assert wait_for(lambda: second.get(job["job_id"])["status"] == "succeeded")
+    assert second.get(job["job_id"])["result"] == {"ok": True}
+    second.stop()
+
+def test_second_scheduler_leaves_live_owners_jobs_alone(tmp_path):
+    """Test that a scheduler starting on a shared jobs file doesn't take over a live scheduler's jobs"""
+    gate, ran_by_b = threading.Event(), []
+    a = JobScheduler(tmp_path / "jobs.json", workers=1, heartbeat=0.05)
+    a.register("work", lambda job, cancelled: gate.wait(5))
+    a.start()
+    running = a.submit("work")
+    queued = a.submit("work")
+    assert wait_for(lambda: a.get(running["job_id"])["status"] == "running")
+
+    b = JobScheduler(tmp_path / "jobs.json", workers=2, heartbeat=0.05)
+    b.register("work", lambda job, cancelled: ran_by_b.append(job["job_id"]))
+    b.start()
+    time.sleep(0.3)  # several heartbeats
+    assert ran_by_b == []
+    assert b.get(queued["job_id"])["status"] == "queued"
+    gate.set()
+    assert wait_for(lambda: all(b.get(j["job_id"])["status"] == "succeeded" for j in (running, queued)))
+    assert ran_by_b == []
+    a.stop()
+    b.stop()
+
+def test_stopped_owners_jobs_are_adopted(tmp_path):
+    """Test that jobs interrupted by a scheduler's shutdown are re-run by a live one"""
+    started = threading.Event()
+
+    def interrupted(job, cancelled):
+        started.set()
+        cancelled.wait(5)
+
+    a = JobScheduler(tmp_path / "jobs.json", workers=1, heartbeat=0.05)
+    a.register("work", interrupted)
+    b = JobScheduler(tmp_path / "jobs.json", workers=1, heartbeat=0.05)
+    b.register("work", lambda job, cancelled: {"by": "b"})
+    a.start()
+    b.start()
+    job = a.submit("work")
+    assert started.wait(2)
+    a.stop()
+    assert wait_for(lambda: b.get(job["job_id"])["status"] == "succeeded")
+    assert b.get(job["job_id"])["result"] == {"by": "b"}
+    assert b.get(job["job_id"])["owner"] == b.owner
+    b.stop()
+
+def test_cancel_job_running_in_another_scheduler(tmp_path):
+    """Test that cancelling through one scheduler stops a job running in another"""
+    started = threading.Event()
+
+    def handler(job, cancelled):
+        started.set()
+        cancelled.wait(5)
+
+    a = JobScheduler(tmp_path / "jobs.json", workers=1, heartbeat=0.05)
+    a.register("work", handler)
+    b = JobScheduler(tmp_path / "jobs.json", workers=1, heartbeat=0.05)
+    b.register("work", handler)
+    a.start()
+    b.start()
+    job = a.submit("work")
+    assert started.wait(2)
+    assert b.cancel(job["job_id"])["cancel_requested"] is True
+    assert wait_for(lambda: b.get(job["job_id"])["status"] == "cancelled")
+    a.stop()
+    b.stop()
+
+def test_orphans_run_exactly_once_across_schedulers(tmp_path):
+    """Test that schedulers racing to adopt and claim the same jobs never run one twice"""
+    lock, runs = threading.Lock(), {}
+
+    def handler(job, cancelled):
+        with lock:
+            runs[job["job_id"]] = runs.get(job["job_id"], 0) + 1
+        time.sleep(0.01)
+
+    gone = JobScheduler(tmp_path / "jobs.json", workers=1)
+    gone.register("work", handler)
+    jobs = [gone.submit("work") for _ in range(20)]  # never started: orphans once it stops
+    gone.stop()
+    schedulers = [JobScheduler(tmp_path / "jobs.json", workers=2, heartbeat=0.02) for _ in range(3)]
+    for scheduler in schedulers:
+        scheduler.register("work", handler)
+    threads = [threading.Thread(target=scheduler.start) for scheduler in schedulers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert wait_for(lambda: all(schedulers[0].get(j["job_id"])["status"] == "succeeded" for j in jobs))
+    assert runs == {j["job_id"]: 1 for j in jobs}
+    for scheduler in schedulers:
+        scheduler.stop()
+
+def test_model_service_deploy_and_finetune_run_as_jobs(tmp_path):
+    """Test deploy and fine-tune through the scheduler"""
+    service = ModelService(tmp_path / "models.json")
+    service.DEPLOY_SECONDS = service.FINETUNE_SECONDS = 0.01
+    entry = service.deploy_model("custom", {})
+    assert wait_for(lambda: service.get_status(entry["model_id"])["status"] == "deployed")
+    # The model flips to deployed just before the worker records the job's success
+    assert wait_for(lambda: service.get_job(entry["job_id"])["status"] == "succeeded")
+
+    dataset = tmp_path / "data.jsonl"
+    dataset.write_text('{"prompt": "hi", "completion": "hello"}\n')
+    job = service.fine_tune(entry["model_id"], str(dataset))
+    assert wait_for(lambda: service.get_job(job["job_id"])["status"] == "succeeded")
+    assert service.get_status(entry["model_id"])["version"] == 1
+    assert service.get_job(job["job_id"])["result"]["dataset"]["valid"] == 1
+
+    missing = service.fine_tune(entry["model_id"], str(tmp_path / "missing.jsonl"))
+    assert wait_for(lambda: service.get_job(missing["job_id"])["status"] == "failed")
+    assert "Dataset not found" in service.get_job(missing["job_id"])["message"]
+    service.close()
+
+def test_cancel_job_endpoint():
+    """Test the job cancellation endpoint"""
+    from fastapi.testclient import TestClient
+    from vertexops.main import app
+    headers = {"x-api-key": "supersecret123"}
+    with TestClient(app) as client:
+        assert client.post("/jobs/missing/cancel", headers=headers).status_code == 404
+        job_id = client.post("/models/deploy", headers=headers, json={"model_type": "custom"}).json()["job_id"]
+        response = client.post(f"/jobs/{job_id}/cancel", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["kind"] == "deploy"
+
+def test_get_job_long_poll_returns_on_transition():
+    """Test that ?wait holds the request until the job changes state"""
+    from fastapi.testclient import TestClient
+    from vertexops import main
+    headers = {"x-api-key": "supersecret123"}
+    with TestClient(main.app) as client:
+        # The app's service only lives for this lifespan, so tune it inside
+        main.model_service.DEPLOY_SECONDS = 0.3
+        assert client.get("/jobs/missing", headers=headers).status_code == 404
+        deploy = client.post("/models/deploy", headers=headers, json={"model_type": "custom"}).json()
+        model_id, job_id = deploy["model_id"], deploy["job_id"]
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+        while job["status"] not in ("succeeded", "failed", "cancelled"):
+            start = time.monotonic()
+            job = client.get(f"/jobs/{job_id}", headers=headers, params={"wait": 5}).json()
+            assert time.monotonic() - start < 4
+        assert job["status"] == "succeeded"
+        assert job["result"] == {"model_id": model_id}
+
+def test_jobs_websocket_pushes_transitions():
+    """Test that /ws/jobs pushes each state change of a job"""
+    from fastapi.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+    from vertexops import main
+    headers = {"x-api-key": "supersecret123"}
+    with TestClient(main.app) as client:
+        main.model_service.DEPLOY_SECONDS = 0.05
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/ws/jobs") as ws:
+                ws.receive_json()
+        with client.websocket_connect("/ws/jobs?api_key=supersecret123") as ws:
+            model_id = client.post("/models/deploy", headers=headers, json={"model_type": "custom"}).json()["model_id"]
+            statuses = []
+            while "succeeded" not in statuses:
+                message = ws.receive_json()
+                if message["type"] == "job" and message["job"]["model_id"] == model_id:
+                    statuses.append(message["job"]["status"])
+            assert statuses == ["queued", "running", "succeeded"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
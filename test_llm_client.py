@@ -0,0 +1,127 @@
+"""LLM client tail-latency tests against the local fault-injecting stub"""
+import time
+import asyncio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from vertexops.main import app
+from vertexops.llm_client import LLMClient, LLMUnavailable
+from vertexops.llm_stub import FaultInjectingLLM
+from vertexops.rag_service import RAGService
+from vertexops.vector_store import InMemoryVectorStore
+
+def make_client(stub, **kwargs):
+    """LLM client wired to the stub through an in-process ASGI transport"""
+    return LLMClient("test-key", "stub-model", base_url="http://stub", transport=httpx.ASGITransport(app=stub), **kwargs)
+
+def test_complete_returns_stub_answer():
+    """Test a healthy completion"""
+    client = make_client(FaultInjectingLLM(answer="hello there"))
+    assert asyncio.run(client.complete("prompt")).strip() == "hello there"
+
+def test_deadline_cuts_slow_call_short():
+    """Test that a propagated deadline bounds the call"""
+    client = make_client(FaultInjectingLLM(latency=2.0), hedge=False)
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(client.complete("prompt", deadline=time.monotonic() + 0.1))
+    assert time.monotonic() - start < 1.0
+
+def test_expired_deadline_skips_backend():
+    """Test that an already-expired deadline never reaches the backend"""
+    stub = FaultInjectingLLM()
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(make_client(stub).complete("prompt", deadline=time.monotonic() - 1))
+    assert stub.calls == 0
+
+def test_hedged_request_beats_slow_primary():
+    """Test that a duplicate request is raced once the primary exceeds the hedge delay"""
+    stub = FaultInjectingLLM(script=[(2.0, 200)], answer="hedged")
+    client = make_client(stub)
+    client.latencies.default_delay = 0.05
+    start = time.monotonic()
+    assert asyncio.run(client.complete("prompt")).strip() == "hedged"
+    assert time.monotonic() - start < 1.0
+    assert stub.calls == 2
+
+def test_circuit_breaker_fails_fast():
+    """Test that repeated upstream errors open the circuit and stop backend calls"""
+    stub = FaultInjectingLLM(error_rate=1.0)
+    client = make_client(stub, hedge=False)
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(LLMUnavailable):
+                await client.complete("prompt")
+        assert client.breaker.state == "open"
+        with pytest.raises(LLMUnavailable, match="Circuit breaker open"):
+            await client.complete("prompt")
+
+    asyncio.run(run())
+    assert stub.calls == 5
+
+def test_circuit_breaker_recovers_after_cooldown():
+    """Test that a successful half-open trial closes the circuit"""
+    stub = FaultInjectingLLM(script=[(0.0, 503)] * 5)
+    client = make_client(stub, hedge=False)
+    client.breaker.cooldown = 0.05
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(LLMUnavailable):
+                await client.complete("prompt")
+        await asyncio.sleep(0.1)
+        return await client.complete("prompt")
+
+    assert asyncio.run(run()).strip() == "stub answer"
+    assert client.breaker.state == "closed"
+
+def test_caller_deadlines_do_not_open_the_breaker():
+    """Test that timeouts under a caller's short deadline are neutral, but LLM_TIMEOUT expiring is a failure"""
+    client = make_client(FaultInjectingLLM(latency=1.0), hedge=False, timeout=0.05)
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(LLMUnavailable):
+                await client.complete("prompt", deadline=time.monotonic() + 0.01)
+        assert client.breaker.state == "closed"
+        for _ in range(5):
+            with pytest.raises(LLMUnavailable):
+                await client.complete("prompt")
+        assert client.breaker.state == "open"
+
+    asyncio.run(run())
+
+def test_stream_relays_tokens():
+    """Test streaming tokens from the stub"""
+    client = make_client(FaultInjectingLLM(answer="one two three"))
+
+    async def run():
+        return [t async for t in client.stream("prompt")]
+
+    assert "".join(asyncio.run(run())) == "one two three"
+
+def test_rag_falls_back_when_backend_fails():
+    """Test that RAGService answers locally when the LLM is unavailable"""
+    store = InMemoryVectorStore()
+    store.add_text("doc-llm", "VertexOps falls back locally")
+    rag = RAGService(store)
+    rag.llm = make_client(FaultInjectingLLM(error_rate=1.0), hedge=False)
+    res = asyncio.run(rag.generate_response("What happens on failure?", top_k=1))
+    assert res["response_text"].startswith("[SIMULATED LLM ANSWER]")
+    # failed-upstream fallbacks are not cached
+    assert len(rag.cache) == 0
+
+    rag.llm = make_client(FaultInjectingLLM(answer="real answer"))
+    res = asyncio.run(rag.generate_response("What happens on failure?", top_k=1))
+    assert res["response_text"] == "real answer"
+
+def test_invalid_deadline_header_rejected():
+    """Test that a malformed deadline header is a client error"""
+    with TestClient(app) as client:
+        response = client.post("/rag/query", headers={"x-api-key": "supersecret123", "x-request-timeout-ms": "soon"},
+                               json={"query": "deadline?"})
+        assert response.status_code == 400
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,214 @@
+"""Model registry and model service tests for VertexOps platform"""
+import json
+import time
+import pytest
+from vertexops.registry import JournaledRegistry
+from vertexops.model_service import ModelService
+
+def test_registry_replays_journal(tmp_path):
+    """Test that writes survive a reload without a snapshot rewrite"""
+    reg = JournaledRegistry(tmp_path / "models.json")
+    reg.put("m1", {"model_id": "m1", "status": "deploying"})
+    reg.put("m2", {"model_id": "m2", "status": "deploying"})
+    reg.update("m1", status="deployed")
+    reg.delete("m2")
+    reg.close()
+    # snapshot untouched, changes live in the journal
+    assert json.loads((tmp_path / "models.json").read_text())["records"] == {}
+
+    reloaded = JournaledRegistry(tmp_path / "models.json")
+    assert reloaded.to_dict() == {"m1": {"model_id": "m1", "status": "deployed"}}
+
+def test_registry_ignores_torn_journal_line(tmp_path):
+    """Test that a partially written last event is dropped on load"""
+    reg = JournaledRegistry(tmp_path / "models.json")
+    reg.put("m1", {"status": "deployed"})
+    reg.close()
+    with open(tmp_path / "models.journal", "a") as f:
+        f.write('{"op": "put", "key": "m2", "val')
+
+    reloaded = JournaledRegistry(tmp_path / "models.json")
+    assert reloaded.to_dict() == {"m1": {"status": "deployed"}}
+    reloaded.put("m3", {"status": "deploying"})
+    reloaded.close()
+    assert set(JournaledRegistry(tmp_path / "models.json").to_dict()) == {"m1", "m3"}
+
+def test_registry_compacts_into_atomic_snapshot(tmp_path):
+    """Test that the journal is folded into the snapshot once it grows"""
+    reg = JournaledRegistry(tmp_path / "models.json", compact_every=10)
+    for i in range(25):
+        reg.put(f"m{i}", {"i": i})
+    # compacted once at 10 events; the next compaction waits for as many events as records
+    assert len(json.loads((tmp_path / "models.json").read_text())["records"]) == 10
+    assert len((tmp_path / "models.journal").read_text().splitlines()) == 15
+    assert not (tmp_path / "models.json.tmp").exists()
+    reg.compact()
+    assert len(json.loads((tmp_path / "models.json").read_text())["records"]) == 25
+    assert (tmp_path / "models.journal").read_text() == ""
+
+def test_registry_shared_between_processes(tmp_path):
+    """Test that two registries on the same files see each other's writes"""
+    a = JournaledRegistry(tmp_path / "models.json", compact_every=5)
+    b = JournaledRegistry(tmp_path / "models.json", compact_every=5)
+    a.put("m1", {"status": "deploying"})
+    assert b.get("m1") == {"status": "deploying"}
+    b.update("m1", status="deployed")
+    assert a.get("m1")["status"] == "deployed"
+    assert a.version == b.version
+    for i in range(10):  # a compacts; b must reload instead of replaying from a stale offset
+        a.put(f"x{i}", {"i": i})
+    assert set(b.to_dict()) == set(a.to_dict())
+    b.put("m2", {"status": "deploying"})
+    a.close()
+    b.close()
+    assert len(JournaledRegistry(tmp_path / "models.json")) == 12
+
+def test_registry_compare_and_set(tmp_path):
+    """Test that a stale expected revision is rejected"""
+    from vertexops.registry import RegistryConflict
+    a = JournaledRegistry(tmp_path / "models.json")
+    b = JournaledRegistry(tmp_path / "models.json")
+    a.put("m1", {"version": 1})
+    rev = b.revision("m1")
+    a.update("m1", version=2)
+    with pytest.raises(RegistryConflict):
+        b.update("m1", expected_rev=rev, version=2)
+    assert b.update("m1", expected_rev=b.revision("m1"), version=3)["version"] == 3
+
+def test_model_service_deploy_persists(tmp_path):
+    """Test that a deployed model is visible after restarting the service"""
+    service = ModelService(tmp_path / "models.json")
+    entry = service.deploy_model("custom", {"name": "m"})
+    assert service.get_status(entry["model_id"])["status"] == "deploying"
+    assert entry["model_id"] in ModelService(tmp_path / "models.json").list_models()
+
+def test_list_page_cursor_and_filters(tmp_path):
+    """Test cursor pagination and status/type filters over the in-memory registry"""
+    service = ModelService(tmp_path / "models.json")
+    for i in range(5):
+        service._models.put(f"m{i}", {"model_id": f"m{i}", "model_type": "vertex" if i % 2 else "custom",
+                                      "status": "deployed", "created_at": 100.0 + i})
+    page, cursor, total = service.list_page(limit=2)
+    assert list(page) == ["m0", "m1"] and total == 5
+    page, cursor, _ = service.list_page(limit=2, cursor=cursor)
+    assert list(page) == ["m2", "m3"]
+    page, cursor, _ = service.list_page(limit=2, cursor=cursor)
+    assert list(page) == ["m4"] and cursor is None
+
+    page, _, total = service.list_page(model_type="vertex")
+    assert list(page) == ["m1", "m3"] and total == 2
+    assert service.list_page(status="failed")[2] == 0
+    with pytest.raises(ValueError):
+        service.list_page(cursor="not-a-cursor")
+    service.close()
+
+def test_models_endpoint_etag_and_304(tmp_path, monkeypatch):
+    """Test that an unchanged registry answers If-None-Match with 304"""
+    from fastapi.testclient import TestClient
+    from vertexops import main
+    service = ModelService(tmp_path / "models.json")
+    service.DEPLOY_SECONDS = 60
+    monkeypatch.setattr(main, "model_service", service)
+    headers = {"x-api-key": "supersecret123"}
+    with TestClient(main.app) as client:
+        client.post("/models/deploy", headers=headers, json={"model_type": "custom"})
+        client.post("/models/deploy", headers=headers, json={"model_type": "vertex"})
+        first = client.get("/models", headers=headers, params={"limit": 1})
+        assert first.status_code == 200
+        assert len(first.json()) == 1
+        assert first.headers["x-total-count"] == "2"
+        assert 'rel="next"' in first.headers["link"]
+        etag = first.headers["etag"]
+
+        cached = client.get("/models", headers={**headers, "If-None-Match": etag}, params={"limit": 1})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        client.post("/models/deploy", headers=headers, json={"model_type": "custom"})
+        changed = client.get("/models", headers={**headers, "If-None-Match": etag}, params={"limit": 1})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert client.get("/models", headers=headers, params={"cursor": "bogus"}).status_code == 400
+    service.close()
+
+def test_model_handle_cache_lru_and_single_load():
+    """Test that concurrent misses load once and the budget evicts the least recently used handles"""
+    import threading
+    from vertexops.model_cache import ModelHandleCache, FakeModelLoader
+    loader = FakeModelLoader(load_latency=0.05, size_bytes=100)
+    cache = ModelHandleCache(loader, budget_bytes=250)
+    a = {"model_id": "a", "config": {}}
+    threads = [threading.Thread(target=cache.get, args=(a,)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loader.loads == 1
+    cache.get({"model_id": "b", "config": {}})
+    cache.get(a)  # a is now most recently used
+    cache.get({"model_id": "c", "config": {}})
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["resident_bytes"] == 200
+
+def test_model_service_preloads_deployed_models(tmp_path):
+    """Test that deployed models are warmed in the background when the service starts"""
+    from vertexops.model_cache import FakeModelLoader
+    service = ModelService(tmp_path / "models.json")
+    service.DEPLOY_SECONDS = 0.01
+    model_id = service.deploy_model("test", {})["model_id"]
+    for _ in range(100):
+        if service.get_status(model_id)["status"] == "deployed":
+            break
+        time.sleep(0.02)
+    service.close()
+    loader = FakeModelLoader(load_latency=0, size_bytes=10)
+    restarted = ModelService(tmp_path / "models.json", model_loader=loader)
+    for _ in range(100):
+        if model_id in restarted.handles:
+            break
+        time.sleep(0.02)
+    assert model_id in restarted.handles
+    assert restarted.get_handle(model_id).model_id == model_id
+    assert restarted.handles.stats()["hits"] == 1
+    assert restarted.handles.stats()["misses"] == 0  # preloads aren't lookups
+    restarted.close()
+
+def test_deploy_warms_handle_on_the_job_worker(tmp_path):
+    """Test that a finished deploy has its handle loaded already, also for a model with a null config"""
+    from vertexops.model_cache import FakeModelLoader
+    loader = FakeModelLoader(load_latency=0, size_bytes=10)
+    service = ModelService(tmp_path / "models.json", model_loader=loader)
+    service.DEPLOY_SECONDS = 0.01
+    entry = service.deploy_model("test", None)
+    for _ in range(100):
+        if service.get_job(entry["job_id"])["status"] == "succeeded":
+            break
+        time.sleep(0.02)
+    assert entry["model_id"] in service.handles
+    assert loader.loads == 1
+    assert service.handles.stats()["hits"] == service.handles.stats()["misses"] == 0
+    service.close()
+
+def test_adopted_deploy_can_warm_its_handle(tmp_path, monkeypatch):
+    """Test that a deploy adopted the moment the service starts finds the handle cache ready"""
+    from vertexops.model_cache import FakeModelLoader
+    service = ModelService(tmp_path / "models.json")
+    service.DEPLOY_SECONDS = 60
+    entry = service.deploy_model("test", {})
+    for _ in range(100):
+        if service.get_job(entry["job_id"])["status"] == "running":
+            break
+        time.sleep(0.02)
+    service.close()  # interrupted: left for the next scheduler to adopt
+    monkeypatch.setattr(ModelService, "DEPLOY_SECONDS", 0)
+    restarted = ModelService(tmp_path / "models.json", model_loader=FakeModelLoader(load_latency=0, size_bytes=10))
+    for _ in range(100):
+        if restarted.get_job(entry["job_id"])["status"] == "succeeded":
+            break
+        time.sleep(0.02)
+    assert restarted.get_status(entry["model_id"])["status"] == "deployed"
+    assert entry["model_id"] in restarted.handles
+    restarted.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
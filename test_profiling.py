@@ -0,0 +1,41 @@
+"""Admin profiling endpoint tests for VertexOps platform"""
+import pytest
+from fastapi.testclient import TestClient
+from vertexops import auth, profiling
+from vertexops.main import app
+
+ADMIN = {"x-api-key": "admin-secret"}
+
+@pytest.fixture
+def admin_key(monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_API_KEY", "admin-secret")
+
+def test_admin_endpoints_disabled_without_admin_key():
+    """Test that admin endpoints are off unless ADMIN_API_KEY is set, even for the normal key"""
+    with TestClient(app) as client:
+        response = client.get("/admin/threads", headers={"x-api-key": "supersecret123"})
+        assert response.status_code == 403
+
+def test_thread_dump_and_sampling_profile(admin_key):
+    """Test the thread dump and a short all-thread sampling profile in collapsed format"""
+    with TestClient(app) as client:
+        assert client.get("/admin/threads", headers={"x-api-key": "supersecret123"}).status_code == 403
+        dump = client.get("/admin/threads", headers=ADMIN)
+        assert dump.status_code == 200 and '"MainThread"' in dump.text
+        profile = client.post("/admin/profile", headers=ADMIN, params={"duration": 0.2})
+        assert profile.status_code == 200
+        stack, count = profile.text.splitlines()[0].rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+def test_cprofile_and_allocation_diff(admin_key):
+    """Test the event-loop cProfile report and the tracemalloc diff"""
+    with TestClient(app) as client:
+        report = client.post("/admin/profile", headers=ADMIN, params={"mode": "cprofile", "duration": 0.1})
+        assert report.status_code == 200 and "function calls" in report.text
+        diff = client.post("/admin/tracemalloc", headers=ADMIN, params={"duration": 0.1, "top": 5})
+        assert diff.status_code == 200 and len(diff.json()["top"]) <= 5
+
+def test_one_capture_at_a_time(admin_key):
+    """Test that a second capture is refused while one is running"""
+    with TestClient(app) as client, profiling.capture():
+        assert client.post("/admin/profile", headers=ADMIN, params={"duration": 0.1}).status_code == 409
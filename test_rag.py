@@ -0,0 +1,262 @@
+"""RAG service tests for VertexOps platform"""
+import json
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from vertexops.main import app
+from vertexops.vector_store import InMemoryVectorStore
+from vertexops.rag_service import RAGService
+from vertexops.semantic_cache import SemanticCache
+from vertexops.context_packer import pack_context, estimate_tokens
+
+HEADERS = {"x-api-key": "supersecret123"}
+
+def parse_sse(lines):
+    """Collect (event, data) pairs from a Server-Sent Events body"""
+    events, event = [], None
+    for line in lines:
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            events.append((event, json.loads(line[len("data:"):].strip())))
+    return events
+
+def test_rag_query_stream_endpoint():
+    """Test that the streaming endpoint sends sources first, then tokens, then done"""
+    with TestClient(app) as client:
+        client.post("/vector/add", headers=HEADERS, params={"id": "stream-doc", "text": "VertexOps streams RAG answers"})
+        with client.stream("POST", "/rag/query/stream", headers=HEADERS,
+                           json={"query": "How does VertexOps stream?", "top_k": 2}) as response:
+            assert response.status_code == 200
+            assert "text/event-stream" in response.headers.get("content-type", "")
+            events = parse_sse(response.iter_lines())
+
+    names = [e for e, _ in events]
+    assert names[0] == "sources"
+    assert names[-1] == "done"
+    assert "token" in names
+    assert len(events[0][1]["source_docs"]) <= 2
+    tokens = "".join(d["text"] for e, d in events if e == "token")
+    assert tokens.strip() == events[-1][1]["response_text"]
+    assert "[SIMULATED LLM ANSWER]" in tokens
+
+def test_rag_query_stream_flag():
+    """Test that stream: true on /rag/query returns an event stream"""
+    with TestClient(app) as client:
+        response = client.post("/rag/query", headers=HEADERS, json={"query": "What is VertexOps?", "stream": True})
+        assert response.status_code == 200
+        events = parse_sse(response.text.splitlines())
+        assert events[0][0] == "sources"
+        assert events[-1][0] == "done"
+
+def test_semantic_cache_matches_similar_queries():
+    """Test that a near-duplicate embedding hits and a dissimilar one misses"""
+    cache = SemanticCache(dim=4, capacity=4, threshold=0.95)
+    cache.store([1.0, 0.0, 0.0, 0.0], 5, {"response_text": "a", "source_docs": [{"id": "d1"}]}, latency=0.2)
+    assert cache.lookup([0.99, 0.05, 0.0, 0.0], 5)["result"]["response_text"] == "a"
+    assert cache.lookup([0.0, 1.0, 0.0, 0.0], 5) is None
+    # top_k is part of the key
+    assert cache.lookup([1.0, 0.0, 0.0, 0.0], 3) is None
+
+def test_semantic_cache_evicts_oldest_when_full():
+    """Test that the ring buffer reuses the oldest slot"""
+    cache = SemanticCache(dim=2, capacity=2, threshold=0.99)
+    cache.store([1.0, 0.0], 5, {"response_text": "x", "source_docs": []}, latency=0.1)
+    cache.store([0.0, 1.0], 5, {"response_text": "y", "source_docs": []}, latency=0.1)
+    cache.store([1.0, 1.0], 5, {"response_text": "z", "source_docs": []}, latency=0.1)
+    assert len(cache) == 2
+    assert cache.lookup([1.0, 0.0], 5) is None
+
+def test_semantic_cache_drops_answers_a_new_doc_could_enter():
+    """Test that a new doc only invalidates answers whose top-k it could now reach"""
+    cache = SemanticCache(dim=4, capacity=4, threshold=0.99)
+    cache.store([1.0, 0.0, 0.0, 0.0], 1, {"response_text": "a", "source_docs": [{"id": "d1", "score": 0.5}]}, latency=0.1)
+    cache.invalidate(["far"], [[0.0, 1.0, 0.0, 0.0]])
+    assert cache.lookup([1.0, 0.0, 0.0, 0.0], 1) is not None
+    cache.invalidate(["near"], [[1.0, 1.0, 0.0, 0.0]])
+    assert cache.lookup([1.0, 0.0, 0.0, 0.0], 1) is None
+
+def test_rag_service_cache_hit_and_invalidation():
+    """Test that repeated queries hit the cache until a source doc changes"""
+    store = InMemoryVectorStore()
+    store.add_text("doc-a", "VertexOps caches answers")
+    rag = RAGService(store)
+    first = asyncio.run(rag.generate_response("What does VertexOps cache?", top_k=1))
+    assert len(rag.cache) == 1
+    assert asyncio.run(rag.generate_response("What does VertexOps cache?", top_k=1)) == first
+
+    store.add_text("doc-a", "VertexOps caches answers semantically")
+    assert len(rag.cache) == 0
+
+def test_rag_cache_sees_newly_added_relevant_doc():
+    """Test that adding a new, more relevant doc changes the next cached query's answer"""
+    store = InMemoryVectorStore()
+    store.add_text("doc-a", "VertexOps caches answers")
+    rag = RAGService(store)
+    query = "Which doc answers this exact question?"
+    first = asyncio.run(rag.generate_response(query, top_k=1))
+    assert first["source_docs"][0]["id"] == "doc-a"
+    store.add_text("doc-b", query)  # same text, so the best possible match
+    second = asyncio.run(rag.generate_response(query, top_k=1))
+    assert second["source_docs"][0]["id"] == "doc-b"
+
+def test_cache_metrics_exported():
+    """Test that cache hit/miss counters are exposed"""
+    with TestClient(app) as client:
+        body = client.get("/metrics").text
+        assert "vertexops_rag_cache_requests_total" in body
+        assert "vertexops_rag_cache_saved_seconds_total" in body
+
+def test_concurrent_identical_queries_are_coalesced():
+    """Test that concurrent copies of one query share a single retrieval"""
+    store = InMemoryVectorStore()
+    store.add_text("doc-sf", "VertexOps coalesces duplicate requests")
+    rag = RAGService(store)
+    rag.cache = None
+    calls = []
+    search = store.search
+    store.search = lambda *a, **kw: calls.append(1) or search(*a, **kw)
+
+    async def burst():
+        return await asyncio.gather(*[rag.generate_response("Why coalesce?", top_k=1) for _ in range(10)])
+
+    results = asyncio.run(burst())
+    assert len(calls) == 1
+    assert all(r == results[0] for r in results)
+    assert len(rag._flights) == 0
+
+def test_differently_spelled_queries_are_not_coalesced():
+    """Test that a query differing only in case gets its own retrieval and answer"""
+    store = InMemoryVectorStore()
+    for i in range(20):
+        store.add_text(f"d{i}", f"document number {i}")
+    rag = RAGService(store)
+    rag.cache = None
+
+    async def alone(query):
+        return await rag.generate_response(query, top_k=2)
+
+    async def together():
+        return await asyncio.gather(rag.generate_response("hello world", top_k=2),
+                                    rag.generate_response("Hello World", top_k=2))
+
+    lower, upper = asyncio.run(together())
+    assert lower == asyncio.run(alone("hello world"))
+    assert upper == asyncio.run(alone("Hello World"))
+    assert "Query: Hello World" in upper["response_text"]
+
+def test_estimate_tokens():
+    """Test the local token estimate"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Hello, world!") == 4
+    assert estimate_tokens("x" * 400) == 100
+
+def test_pack_context_orders_dedupes_and_trims():
+    """Test that packing keeps the best chunks, drops overlaps and respects the budget"""
+    long_text = " ".join(f"word{i}" for i in range(500))
+    hits = [
+        {"id": "low", "score": 0.1, "text": long_text},
+        {"id": "best", "score": 0.9, "text": "VertexOps packs RAG context by score"},
+        {"id": "dupe", "score": 0.8, "text": "vertexops  packs RAG context by score"},
+        {"id": "sub", "score": 0.7, "text": "packs RAG context"},
+        {"id": "mid", "score": 0.5, "text": "Token budgets keep prompts small"},
+    ]
+    packed, tokens = pack_context(hits, budget=100)
+    assert [h["id"] for h in packed] == ["best", "mid", "low"]
+    assert packed[-1]["truncated"] is True
+    assert tokens <= 100
+
+    packed, tokens = pack_context(hits, budget=10)
+    assert [h["id"] for h in packed] == ["best"]
+
+def test_prompt_tokens_histogram_exported():
+    """Test that per-request prompt token counts reach /metrics"""
+    with TestClient(app) as client:
+        client.post("/rag/query", headers=HEADERS, json={"query": "How many prompt tokens?"})
+        assert "vertexops_rag_prompt_tokens_bucket" in client.get("/metrics").text
+
+def test_search_batch_matches_single_search():
+    """Test that batched retrieval returns the same hits as one-by-one search"""
+    store = InMemoryVectorStore()
+    store.bulk_add([{"id": f"doc{i}", "text": f"document number {i}"} for i in range(50)])
+    queries = [[float(j == i) for j in range(128)] for i in range(3)]
+    batched = store.search_batch(queries, top_k=4)
+    assert batched == [store.search(q, top_k=4) for q in queries]
+    assert all(len(hits) == 4 for hits in batched)
+    assert batched[0][0]["score"] >= batched[0][-1]["score"]
+
+def test_rag_batch_bounded_concurrency():
+    """Test that batch answers respect the concurrency limit"""
+    store = InMemoryVectorStore()
+    store.add_text("doc-b", "VertexOps answers batches")
+    rag = RAGService(store)
+    rag.cache = None
+    in_flight, peak = 0, 0
+    fallback = rag._fallback_response
+
+    async def tracked(*args):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            return await fallback(*args)
+        finally:
+            in_flight -= 1
+    rag._fallback_response = tracked
+
+    async def run():
+        return [item async for item in rag.generate_batch([f"question {i}" for i in range(8)], top_k=1, concurrency=3)]
+
+    items = asyncio.run(run())
+    assert sorted(item["index"] for item in items) == list(range(8))
+    assert all(item["status"] == "ok" for item in items)
+    assert peak == 3
+
+def test_rag_batch_searches_in_chunks():
+    """Test that batch retrieval scans the corpus in bounded chunks of queries, in order"""
+    store = InMemoryVectorStore()
+    for i in range(5):
+        store.add_text(f"doc-{i}", f"chunked document {i}")
+    rag = RAGService(store)
+    rag.cache = None
+    rag.batch_search_chunk = 2
+    sizes = []
+    search_batch = store.search_batch
+    store.search_batch = lambda queries, **kw: sizes.append(len(queries)) or search_batch(queries, **kw)
+
+    async def run():
+        return [item async for item in rag.generate_batch([f"chunked document {i}" for i in range(5)], top_k=1)]
+
+    items = asyncio.run(run())
+    assert sizes == [2, 2, 1]
+    assert {item["index"]: item["source_docs"][0]["id"] for item in items} == {i: f"doc-{i}" for i in range(5)}
+
+def test_rag_query_batch_endpoint():
+    """Test that the batch endpoint streams one NDJSON line per query"""
+    with TestClient(app) as client:
+        client.post("/vector/add", headers=HEADERS, params={"id": "batch-doc", "text": "Batch RAG with NDJSON"})
+        response = client.post("/rag/query/batch", headers=HEADERS,
+                               json={"queries": ["first batch query", "second batch query"], "top_k": 1})
+        assert response.status_code == 200
+        assert "application/x-ndjson" in response.headers.get("content-type", "")
+        items = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(i["index"] for i in items) == [0, 1]
+        assert all(i["status"] == "ok" and "response_text" in i for i in items)
+
+def test_server_timing_reports_rag_stages():
+    """Test that per-stage spans come back in the Server-Timing header and /metrics"""
+    with TestClient(app) as client:
+        client.post("/vector/add", headers=HEADERS, params={"id": "timing-doc", "text": "Stage timing for RAG"})
+        response = client.post("/rag/query", headers=HEADERS, json={"query": "Which stages are timed?", "top_k": 1})
+        assert response.status_code == 200
+        timing = response.headers["server-timing"]
+        for name in ("rag-embed", "rag-search", "vector_store-similarity", "vector_store-topk", "rag-prompt",
+                     "rag-fallback", "total"):
+            assert f"{name};dur=" in timing
+
+        response = client.post("/vector/search", headers=HEADERS, json={"text": "Stage timing", "top_k": 1})
+        assert "vector_store-similarity;dur=" in response.headers["server-timing"]
+        assert 'vertexops_stage_latency_seconds_bucket{component="rag"' in client.get("/metrics").text
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,61 @@
+"""Cold-start budget tests for VertexOps platform"""
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+# Generous next to the ~0.1s/~0.5s measured locally, so only real regressions trip them
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1000"))
+FIRST_HEALTHY_BUDGET_MS = float(os.getenv("STARTUP_FIRST_HEALTHY_BUDGET_MS", "3000"))
+
+def run_python(code: str, cwd: Path, *args: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    return subprocess.run([sys.executable, *args, "-c", code], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=60)
+
+def test_import_time_budget(tmp_path):
+    """Test that importing vertexops.main stays cheap and leaves heavy dependencies unloaded"""
+    proc = run_python("import sys, vertexops.main; print(sorted(m for m in ('numpy', 'httpx') if m in sys.modules))",
+                      tmp_path, "-X", "importtime")
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "[]"
+    # "import time: self | cumulative | name", cumulative in microseconds
+    line = next(l for l in proc.stderr.splitlines() if l.rstrip().endswith("| vertexops.main"))
+    cumulative_ms = int(line.split("|")[1]) / 1000
+    assert cumulative_ms < IMPORT_BUDGET_MS, f"import took {cumulative_ms:.0f}ms"
+    assert not (tmp_path / "vertexops").exists()  # no registry I/O at import
+
+def test_time_to_first_healthy_response(tmp_path):
+    """Test that import + lifespan startup + first /health stays within budget"""
+    code = (
+        "import time; start = time.perf_counter()\n"
+        "from fastapi.testclient import TestClient\n"
+        "from vertexops.main import app\n"
+        "with TestClient(app) as client:\n"
+        "    assert client.get('/health').json()['status'] == 'healthy'\n"
+        "    print((time.perf_counter() - start) * 1000)\n"
+    )
+    proc = run_python(code, tmp_path)
+    assert proc.returncode == 0, proc.stderr
+    elapsed_ms = float(proc.stdout.strip().splitlines()[-1])
+    assert elapsed_ms < FIRST_HEALTHY_BUDGET_MS, f"first healthy response after {elapsed_ms:.0f}ms"
+    assert (tmp_path / "vertexops" / "models.json").exists()  # services came up in the lifespan
+
+def test_shutdown_stops_job_workers(tmp_path):
+    """Test that leaving the lifespan stops the scheduler threads and deregisters its owner"""
+    code = (
+        "import threading\n"
+        "from fastapi.testclient import TestClient\n"
+        "from vertexops import main\n"
+        "from vertexops.registry import JournaledRegistry\n"
+        "with TestClient(main.app) as client:\n"
+        "    assert client.get('/health').status_code == 200\n"
+        "    assert any(t.name.startswith('vertexops-job') for t in threading.enumerate())\n"
+        "print([t.name for t in threading.enumerate() if t.name.startswith('vertexops-job')])\n"
+        "print('model_service' in vars(main))\n"
+        "print(len(JournaledRegistry('vertexops/jobs.owners.json')))\n"
+    )
+    proc = run_python(code, tmp_path)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.split() == ["[]", "False", "0"]
@@ -0,0 +1,170 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from fastapi import Depends, HTTPException
+from .auth import get_api_key
+from .monitoring import record_admission, set_admission_gauges
+
+def _parse_spec(spec: str) -> Dict[str, str]:
+    # "rag=8,search=32" -> {"rag": "8", "search": "32"}
+    out = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        out[name.strip()] = value.strip()
+    return out
+
+# Per API key: "<class>=<tokens per second>:<burst>"
+DEFAULT_RATES = "rag=20:40,search=200:400"
+# Per route class across all keys: requests in flight, and how many may wait for a slot
+DEFAULT_CONCURRENCY = "rag=16,search=64"
+DEFAULT_QUEUE = "rag=64,search=256"
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second refill, up to `burst` banked."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 if one was available, else seconds until one will be."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` requests in flight; up to `max_queue` more wait FIFO for a slot.
+    A request is shed up front when the queue is full or its expected wait (queue
+    position x smoothed service time / limit) already exceeds the SLO, and shed later if
+    it is still waiting when the SLO runs out. Runs on a single event loop.
+    """
+    def __init__(self, name: str, limit: int, max_queue: int, slo: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.slo = slo
+        self.active = 0
+        self.service_time = 0.0  # EWMA of seconds a slot is held
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def expected_wait(self, position: int) -> float:
+        return position * self.service_time / self.limit
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the seconds spent queued. Raises Rejected when shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return 0.0
+        position = len(self._waiters) + 1
+        expected = self.expected_wait(position)
+        if position > self.max_queue or expected > self.slo:
+            raise Rejected(503, "overloaded", expected or self.slo)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        record_admission(self.name, "queued")
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(fut, self.slo)
+        except asyncio.TimeoutError:
+            self._discard(fut)
+            raise Rejected(503, "queue timeout", self.expected_wait(len(self._waiters)) or self.slo)
+        except asyncio.CancelledError:  # client went away
+            if fut.done() and not fut.cancelled():
+                self.release(0.0)  # the slot was already handed to us
+            else:
+                self._discard(fut)
+            raise
+        return time.monotonic() - start
+
+    def _discard(self, fut: asyncio.Future):
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+
+    def release(self, held: float):
+        self.service_time = held if not self.service_time else 0.8 * self.service_time + 0.2 * held
+        # Hand the slot straight to the next live waiter, so newcomers can't jump the queue
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+class AdmissionController:
+    """
+    Admission for expensive route classes: a token bucket per (API key, class) caps
+    each client's rate (429), and a per-class ConcurrencyLimiter protects shared
+    capacity (503). Both rejections carry Retry-After.
+    """
+    def __init__(self, rates: str = None, concurrency: str = None, queue: str = None, slo: float = None):
+        self.rates = {name: tuple(float(x) for x in value.split(":")) for name, value in
+                      _parse_spec(rates if rates is not None else os.getenv("ADMISSION_RATES", DEFAULT_RATES)).items()}
+        slo = slo if slo is not None else float(os.getenv("ADMISSION_QUEUE_SLO_MS", "2000")) / 1000.0
+        limits = _parse_spec(concurrency if concurrency is not None else os.getenv("ADMISSION_CONCURRENCY", DEFAULT_CONCURRENCY))
+        queues = _parse_spec(queue if queue is not None else os.getenv("ADMISSION_QUEUE", DEFAULT_QUEUE))
+        self.limiters = {name: ConcurrencyLimiter(name, int(limit), int(queues.get(name, 0)), slo)
+                         for name, limit in limits.items()}
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    async def admit(self, api_key: str, route_class: str) -> Optional[ConcurrencyLimiter]:
+        """Admit or raise Rejected; returns the limiter whose slot must be released, if any."""
+        rate = self.rates.get(route_class)
+        if rate is not None:
+            bucket = self._buckets.get((api_key, route_class))
+            if bucket is None:
+                bucket = self._buckets[(api_key, route_class)] = TokenBucket(*rate)
+            wait = bucket.take()
+            if wait:
+                raise Rejected(429, "rate limit exceeded", wait)
+        limiter = self.limiters.get(route_class)
+        if limiter is not None:
+            await limiter.acquire()
+            set_admission_gauges(route_class, limiter.active, len(limiter._waiters))
+        return limiter
+
+    def release(self, limiter: Optional[ConcurrencyLimiter], held: float):
+        if limiter is not None:
+            limiter.release(held)
+            set_admission_gauges(limiter.name, limiter.active, len(limiter._waiters))
+
+controller = AdmissionController()
+
+def admit(route_class: str):
+    """
+    Dependency that authenticates like get_api_key, then admits the request into
+    `route_class`; the concurrency slot is held until the request has been handled.
+    """
+    async def dependency(api_key: str = Depends(get_api_key)):
+        try:
+            limiter = await controller.admit(api_key, route_class)
+        except Rejected as e:
+            record_admission(route_class, "rate_limited" if e.status_code == 429 else "shed")
+            raise HTTPException(status_code=e.status_code, detail=f"{route_class}: {e.reason}",
+                                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+        record_admission(route_class, "admitted")
+        start = time.monotonic()
+        try:
+            yield api_key
+        finally:
+            controller.release(limiter, time.monotonic() - start)
+    return dependency
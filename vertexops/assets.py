@@ -0,0 +1,97 @@
+import re
+import gzip
+import hashlib
+import mimetypes
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip covers every browser
+    brotli = None
+
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_URL = "/static/"
+# Text files smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+class Asset:
+    """One static file with its precompressed variants and a content-hash ETag."""
+    def __init__(self, name: str, body: bytes, cache_control: str):
+        self.name = name
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.cache_control = cache_control
+        self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/") or self.media_type.endswith("javascript"):
+            self.media_type += "; charset=utf-8"
+        self.variants: Dict[str, bytes] = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=11)
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+class AssetPipeline:
+    """
+    Serves the UI from STATIC_DIR. On first use every file is read once; css/js get
+    content-fingerprinted names (index.css -> index.<hash>.css) served with an immutable
+    Cache-Control, and references to them in the HTML pages are rewritten to those names.
+    Pages keep stable URLs and revalidate via ETag, so a repeat load is a 304. Gzip (and
+    brotli, if installed) variants are compressed once and picked by Accept-Encoding.
+    """
+    def __init__(self, root: Path = STATIC_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._assets: Optional[Dict[str, Asset]] = None
+        self.urls: Dict[str, str] = {}
+
+    def load(self) -> Dict[str, Asset]:
+        with self._lock:
+            if self._assets is not None:
+                return self._assets
+            assets: Dict[str, Asset] = {}
+            pages = []
+            for path in sorted(self.root.iterdir()):
+                if not path.is_file():
+                    continue
+                if path.suffix == ".html":
+                    pages.append(path)
+                    continue
+                asset = Asset(path.name, path.read_bytes(), IMMUTABLE)
+                fingerprinted = f"{path.stem}.{asset.digest[:10]}{path.suffix}"
+                assets[fingerprinted] = asset
+                self.urls[path.name] = STATIC_URL + fingerprinted
+            for path in pages:
+                html = re.sub(r'(?<=["\'])' + re.escape(STATIC_URL) + r'([\w.-]+)(?=["\'])',
+                              lambda m: self.urls.get(m.group(1), m.group(0)), path.read_text(encoding="utf-8"))
+                assets[path.name] = Asset(path.name, html.encode("utf-8"), REVALIDATE)
+            self._assets = assets
+            return assets
+
+    def get(self, name: str) -> Optional[Asset]:
+        return self.load().get(name)
+
+    def response(self, request: Request, name: str) -> Response:
+        """Response for a named asset, negotiated on Accept-Encoding and If-None-Match."""
+        asset = self.get(name)
+        if asset is None:
+            return Response(status_code=404)
+        accepted = request.headers.get("accept-encoding", "")
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), "identity")
+        headers = {"Cache-Control": asset.cache_control, "ETag": asset.etag(encoding), "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if_none_match = request.headers.get("if-none-match", "")
+        # Any variant's tag matches: the content is the same whatever the encoding
+        if if_none_match == "*" or f'"{asset.digest}' in if_none_match:
+            return Response(status_code=304, headers=headers)
+        return Response(asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+assets = AssetPipeline()
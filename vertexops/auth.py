@@ -1,14 +1,33 @@
 import os
-from fastapi import HTTPException, Security
+from fastapi import HTTPException, Request, Security
 from fastapi.security.api_key import APIKeyHeader
 
 API_KEY = os.getenv("API_KEY", "supersecret123")
 API_KEY_HEADER = "x-api-key"
+# Separate key for /admin (profiling, thread dumps); unset disables those endpoints
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY") or None
 api_key_header = APIKeyHeader(name=API_KEY_HEADER, auto_error=False)
 
+def verify_api_key(value: str):
+    if not value:
+        raise HTTPException(status_code=401, detail="Missing API Key")
+    if value != API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid API Key")
+    return value
+
 async def get_api_key(api_key_header_value: str = Security(api_key_header)):
+    return verify_api_key(api_key_header_value)
+
+async def get_stream_api_key(request: Request, api_key_header_value: str = Security(api_key_header)):
+    """Header, or ?api_key= for EventSource clients, which can't set headers."""
+    return verify_api_key(api_key_header_value or request.query_params.get("api_key"))
+
+async def get_admin_key(api_key_header_value: str = Security(api_key_header)):
+    """The x-api-key header must carry ADMIN_API_KEY."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_API_KEY")
     if not api_key_header_value:
         raise HTTPException(status_code=401, detail="Missing API Key")
-    if api_key_header_value != API_KEY:
-        raise HTTPException(status_code=403, detail="Invalid API Key")
+    if api_key_header_value != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid admin API Key")
     return api_key_header_value
@@ -0,0 +1,84 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from .events import EventHub, Subscription
+
+logger = logging.getLogger(__name__)
+
+class SnapshotBroadcaster:
+    """
+    Computes a dashboard snapshot once per `interval` and fans it out to every
+    subscriber, so N open dashboards cost one computation instead of N polls.
+
+    The sampling task runs on the first subscriber's event loop and exits when the last
+    subscriber leaves. A snapshot is only published when it differs from the previous
+    one; new subscribers get the latest snapshot straight away. Other events (e.g. job
+    transitions) can be pushed through `publish` from any thread.
+    """
+    def __init__(self, compute: Callable[[], Dict[str, Any]], interval: float = None):
+        self.compute = compute
+        self.interval = interval or float(os.getenv("DASHBOARD_EVENT_INTERVAL", "2"))
+        self.hub = EventHub()
+        self.latest: Optional[Dict[str, Any]] = None
+        self.computations = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> Subscription:
+        sub = self.hub.subscribe()
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+        return sub
+
+    async def stop(self):
+        """Cancel the sampling task (on shutdown); the next subscriber starts a new one."""
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        if task.get_loop() is asyncio.get_running_loop():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def publish(self, event: str, data: Any):
+        self.hub.publish((event, data))
+
+    def _sample(self) -> Optional[Dict[str, Any]]:
+        self.computations += 1
+        snapshot = self.compute()
+        changed = self.latest is None or {k: v for k, v in snapshot.items() if k != "timestamp"} != \
+            {k: v for k, v in self.latest.items() if k != "timestamp"}
+        self.latest = snapshot
+        return snapshot if changed else None
+
+    async def _run(self):
+        while len(self.hub):
+            try:
+                # The snapshot reads registries and stats files; keep that off the event loop
+                snapshot = await run_in_threadpool(self._sample)
+                if snapshot is not None:
+                    self.publish("snapshot", snapshot)
+            except Exception:
+                logger.exception("Dashboard snapshot failed")
+            await asyncio.sleep(self.interval)
+
+class RequestRate:
+    """Requests/second between successive calls, from a cumulative counter."""
+    def __init__(self, totals: Callable[[], tuple]):
+        self.totals = totals
+        self._last: Optional[tuple] = None
+
+    def __call__(self) -> Dict[str, float]:
+        now = time.monotonic()
+        total, errors = self.totals()
+        rate = error_rate = 0.0
+        if self._last is not None and now > self._last[0]:
+            rate = (total - self._last[1]) / (now - self._last[0])
+            error_rate = (errors - self._last[2]) / (now - self._last[0])
+        self._last = (now, total, errors)
+        return {"total": total, "errors": errors, "per_second": round(rate, 2), "errors_per_second": round(error_rate, 2)}
@@ -0,0 +1,83 @@
+import os
+import re
+from typing import List, Dict, Any, Tuple
+
+# Word runs and single punctuation marks, a cheap stand-in for a BPE tokenizer
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Token budget for retrieved context per completion model (leaves room for query and answer)
+MODEL_CONTEXT_BUDGETS = {
+    "text-davinci-003": 3000,
+    "gpt-3.5-turbo-instruct": 3000,
+    "gpt-4o-mini": 12000,
+}
+DEFAULT_CONTEXT_BUDGET = 2000
+MIN_TRUNCATED_TOKENS = 32  # don't bother packing a tail fragment shorter than this
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast token estimate: word/punctuation pieces, or ~4 characters per token for
+    long unbroken strings, whichever is larger. Good to within ~20% of BPE on English.
+    """
+    if not text:
+        return 0
+    return max(len(_TOKEN_RE.findall(text)), (len(text) + 3) // 4)
+
+def context_budget(model: str) -> int:
+    override = os.getenv("RAG_CONTEXT_TOKEN_BUDGET")
+    if override:
+        return int(override)
+    return MODEL_CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+def _truncate(text: str, max_tokens: int) -> str:
+    # Cut after the max_tokens-th piece, and within max_tokens * 4 characters
+    end = min(len(text), max_tokens * 4)
+    for i, m in enumerate(_TOKEN_RE.finditer(text, 0, end)):
+        if i + 1 == max_tokens:
+            return text[:m.end()]
+    return text[:end]
+
+def _shingles(words: List[str], k: int = 3) -> set:
+    if len(words) < k:
+        return {tuple(words)}
+    return {tuple(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+def _is_overlapping(norm: str, shingles: set, kept: List[Tuple[str, set]], threshold: float) -> bool:
+    for other_norm, other_shingles in kept:
+        if norm in other_norm or other_norm in norm:
+            return True
+        inter = len(shingles & other_shingles)
+        if inter and inter / len(shingles | other_shingles) >= threshold:
+            return True
+    return False
+
+def pack_context(hits: List[Dict[str, Any]], budget: int, overlap_threshold: float = 0.8) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Select hits for the prompt: highest score first, skipping chunks that duplicate or
+    mostly overlap an already selected one, until `budget` tokens are used. The first
+    chunk that doesn't fit is truncated if a useful amount of budget remains.
+    Returns (packed hits, context token estimate).
+    """
+    packed: List[Dict[str, Any]] = []
+    kept: List[Tuple[str, set]] = []
+    used = 0
+    for h in sorted(hits, key=lambda h: h["score"], reverse=True):
+        words = h["text"].casefold().split()
+        norm = " ".join(words)
+        if not norm:
+            continue
+        shingles = _shingles(words)
+        if _is_overlapping(norm, shingles, kept, overlap_threshold):
+            continue
+        tokens = estimate_tokens(h["text"])
+        remaining = budget - used
+        if tokens > remaining:
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                text = _truncate(h["text"], remaining)
+                packed.append({**h, "text": text, "truncated": True})
+                used += estimate_tokens(text)
+            break
+        packed.append(h)
+        kept.append((norm, shingles))
+        used += tokens
+    return packed, used
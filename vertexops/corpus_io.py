@@ -0,0 +1,300 @@
+"""
+Binary export/import of the vector corpus, for moving it between environments or
+seeding a replica without replaying /vector/add.
+
+Two stream formats, both carrying ids, texts, metadata (JSON) and raw float32
+embeddings in record batches:
+
+- npz (default): MAGIC, a JSON header line {"count", "dim"}, then frames of an 8-byte
+  little-endian length followed by an uncompressed .npz. Strings are packed Arrow-style
+  as one UTF-8 buffer plus offsets, and embeddings are a (rows, dim) float32 array.
+- arrow: an Arrow IPC stream (needs pyarrow). The embedding column is a
+  fixed_size_list<float32>[dim], and the schema metadata carries the count.
+
+    python -m vertexops.corpus_io export --url http://127.0.0.1:8080 --out corpus.vxnpz
+    python -m vertexops.corpus_io import corpus.vxnpz --url http://replica:8080
+"""
+import io
+import os
+import sys
+import json
+import struct
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional; the npz format needs only numpy
+    pa = None
+
+MAGIC = b"VERTEXOPS-NPZ1\n"
+ARROW_MAGIC = b"\xff\xff\xff\xff"  # IPC continuation marker that opens every Arrow stream message
+FORMATS = ("npz", "arrow")
+MEDIA_TYPES = {"npz": "application/x-vertexops-npz", "arrow": "application/vnd.apache.arrow.stream"}
+EXTENSIONS = {"npz": "vxnpz", "arrow": "arrows"}
+DEFAULT_BATCH_SIZE = 8192
+# A frame length beyond this is treated as corruption rather than allocated
+MAX_FRAME_BYTES = int(os.getenv("VECTOR_IMPORT_MAX_FRAME_BYTES", str(512 * 1024 * 1024)))
+# Bounds on what one import may declare (and send) before anything is allocated for it
+MAX_IMPORT_VECTORS = int(os.getenv("VECTOR_IMPORT_MAX_VECTORS", "10000000"))
+MAX_IMPORT_DIM = int(os.getenv("VECTOR_IMPORT_MAX_DIM", "8192"))
+# ...and on the float32 embedding bytes they add up to (count x dim x 4)
+MAX_IMPORT_BYTES = int(os.getenv("VECTOR_IMPORT_MAX_BYTES", str(4 * 1024 ** 3)))
+_LENGTH = struct.Struct("<Q")
+
+class CorpusFormatError(ValueError):
+    """The stream is malformed, truncated, or in a format that can't be read here."""
+
+def _require_arrow():
+    if pa is None:
+        raise CorpusFormatError("The arrow format needs pyarrow installed; use format=npz")
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    blob = data.tobytes()
+    bounds = offsets.tolist()
+    return [blob[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+def _npz_frame(records: List[Dict[str, Any]], embeddings: np.ndarray) -> bytes:
+    arrays = {"embeddings": np.ascontiguousarray(embeddings, dtype=np.float32)}
+    for name, values in (("ids", [r["id"] for r in records]), ("texts", [r["text"] for r in records]),
+                         ("metadata", [json.dumps(r["metadata"], separators=(",", ":")) for r in records])):
+        arrays[f"{name}_data"], arrays[f"{name}_offsets"] = _pack_strings(values)
+    out = io.BytesIO()
+    np.savez(out, **arrays)
+    body = out.getvalue()
+    return _LENGTH.pack(len(body)) + body
+
+def _read_npz_frame(body: bytes) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    try:
+        with np.load(io.BytesIO(body), allow_pickle=False) as z:
+            ids = _unpack_strings(z["ids_data"], z["ids_offsets"])
+            texts = _unpack_strings(z["texts_data"], z["texts_offsets"])
+            metadata = _unpack_strings(z["metadata_data"], z["metadata_offsets"])
+            embeddings = z["embeddings"]
+    except (KeyError, ValueError, OSError, UnicodeDecodeError) as e:
+        raise CorpusFormatError(f"Bad npz frame: {e}")
+    if not len(ids) == len(texts) == len(metadata) == len(embeddings):
+        raise CorpusFormatError("Bad npz frame: column lengths differ")
+    records = [{"id": i, "text": t, "metadata": json.loads(m)} for i, t, m in zip(ids, texts, metadata)]
+    return records, embeddings
+
+def _arrow_schema(dim: int, count: int):
+    return pa.schema([("id", pa.string()), ("text", pa.string()), ("metadata", pa.string()),
+                      ("embedding", pa.list_(pa.float32(), dim))], metadata={"count": str(count)})
+
+def _arrow_batch(schema, records: List[Dict[str, Any]], embeddings: np.ndarray):
+    flat = pa.array(np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1))
+    return pa.record_batch([pa.array([r["id"] for r in records], pa.string()),
+                            pa.array([r["text"] for r in records], pa.string()),
+                            pa.array([json.dumps(r["metadata"], separators=(",", ":")) for r in records], pa.string()),
+                            pa.FixedSizeListArray.from_arrays(flat, embeddings.shape[1])], schema=schema)
+
+class _Chunks:
+    """Write-only file object that hands back what was written since the last drain."""
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+def export_frames(store, format: str = "npz", batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    The store as a byte stream in `format`, one frame per batch. The store lock is only
+    held to take the point-in-time view, not while encoding or sending.
+    """
+    if format not in FORMATS:
+        raise CorpusFormatError(f"Unknown format {format!r}; expected one of {', '.join(FORMATS)}")
+    if format == "arrow":
+        _require_arrow()
+    count, dim = len(store), store.dim or 0
+    batches = store.export_batches(batch_size)
+    if format == "npz":
+        def frames():
+            yield MAGIC + json.dumps({"count": count, "dim": dim}).encode() + b"\n"
+            for records, embeddings in batches:
+                yield _npz_frame(records, embeddings)
+        return frames()
+
+    def arrow_frames():
+        sink = _Chunks()
+        schema = _arrow_schema(dim, count)
+        with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+            for records, embeddings in batches:
+                writer.write_batch(_arrow_batch(schema, records, embeddings))
+                yield sink.drain()
+        yield sink.drain()
+    return arrow_frames()
+
+class Importer:
+    """
+    Incremental decoder for an export stream into `store`. `feed` takes raw bytes as
+    they arrive and returns work items; `load` decodes and appends one (blocking, so run
+    it off the event loop). npz frames load as they complete; an Arrow stream is buffered
+    and loaded at `finish`. The header's count pre-sizes the store, so each batch is one
+    block copy into place. Batches before a malformed one stay imported.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.format: Optional[str] = None
+        self.imported = 0
+        self._buf = bytearray()
+        self._header_done = False
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, Any]]:
+        self._buf += chunk
+        if self.format is None:
+            if self._buf[:len(MAGIC)] == MAGIC:
+                self.format = "npz"
+            elif self._buf[:len(ARROW_MAGIC)] == ARROW_MAGIC:
+                _require_arrow()
+                self.format = "arrow"
+            elif MAGIC.startswith(self._buf) or ARROW_MAGIC.startswith(self._buf):
+                return []  # too short to tell yet
+            else:
+                raise CorpusFormatError("Not a vector export stream (expected npz or Arrow IPC)")
+        return self._npz_items() if self.format == "npz" else []
+
+    def _npz_items(self) -> List[Tuple[str, Any]]:
+        items = []
+        if not self._header_done:
+            end = self._buf.find(b"\n", len(MAGIC))
+            if end < 0:
+                return items
+            try:
+                header = json.loads(bytes(self._buf[len(MAGIC):end]))
+            except ValueError:
+                raise CorpusFormatError("Bad npz stream header")
+            items.append(("header", header))
+            del self._buf[:end + 1]
+            self._header_done = True
+        while len(self._buf) >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(self._buf)
+            if length > MAX_FRAME_BYTES:
+                raise CorpusFormatError(f"Frame of {length} bytes exceeds VECTOR_IMPORT_MAX_FRAME_BYTES")
+            if len(self._buf) < _LENGTH.size + length:
+                break
+            items.append(("npz", bytes(self._buf[_LENGTH.size:_LENGTH.size + length])))
+            del self._buf[:_LENGTH.size + length]
+        return items
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        if self.format is None:
+            raise CorpusFormatError("Empty or truncated stream")
+        if self.format == "arrow":
+            body, self._buf = bytes(self._buf), bytearray()
+            return [("arrow", body)]
+        if not self._header_done or self._buf:
+            raise CorpusFormatError("Truncated npz stream")
+        return []
+
+    def load(self, item: Tuple[str, Any]):
+        kind, value = item
+        try:
+            if kind == "header":
+                self._reserve(value.get("count"), value.get("dim"))
+            elif kind == "npz":
+                self._add(*_read_npz_frame(value))
+            else:
+                self._load_arrow(value)
+        except CorpusFormatError:
+            raise
+        except ValueError as e:  # e.g. dimension mismatch with what the store already holds
+            raise CorpusFormatError(str(e))
+
+    def _load_arrow(self, body: bytes):
+        try:
+            reader = pa.ipc.open_stream(pa.py_buffer(body))
+            dim = reader.schema.field("embedding").type.list_size
+            try:
+                count = int((reader.schema.metadata or {}).get(b"count", b"0"))
+            except ValueError:
+                raise CorpusFormatError("Bad Arrow stream: count metadata is not an integer")
+            self._reserve(count, dim)
+            for batch in reader:
+                ids = batch.column("id").to_pylist()
+                texts = batch.column("text").to_pylist()
+                metadata = batch.column("metadata").to_pylist()
+                embeddings = batch.column("embedding").flatten().to_numpy(zero_copy_only=False).reshape(-1, dim)
+                self._add([{"id": i, "text": t, "metadata": json.loads(m)} for i, t, m in zip(ids, texts, metadata)],
+                          embeddings)
+        except (pa.ArrowException, KeyError) as e:
+            raise CorpusFormatError(f"Bad Arrow stream: {e}")
+
+    def _reserve(self, count: Any, dim: Any):
+        """Pre-size the store for the declared corpus, after checking the client's numbers."""
+        if count == 0:
+            return  # empty export
+        for name, value, cap in (("count", count, MAX_IMPORT_VECTORS), ("dim", dim, MAX_IMPORT_DIM)):
+            if type(value) is not int or not 0 < value <= cap:
+                raise CorpusFormatError(f"Header {name} must be an integer in 1..{cap}, got {value!r}")
+        if count * dim * 4 > MAX_IMPORT_BYTES:
+            raise CorpusFormatError(f"Header declares {count} x {dim} embeddings, over VECTOR_IMPORT_MAX_BYTES ({MAX_IMPORT_BYTES})")
+        if self.store.dim is not None and dim != self.store.dim:
+            raise CorpusFormatError(f"Embedding dimension {dim} does not match store dimension {self.store.dim}")
+        self.store.reserve(count, dim)
+
+    def _add(self, records: List[Dict[str, Any]], embeddings: np.ndarray):
+        if self.imported + len(records) > MAX_IMPORT_VECTORS:
+            raise CorpusFormatError(f"Import exceeds VECTOR_IMPORT_MAX_VECTORS ({MAX_IMPORT_VECTORS})")
+        if (self.imported + len(records)) * embeddings.shape[-1] * 4 > MAX_IMPORT_BYTES:
+            raise CorpusFormatError(f"Import exceeds VECTOR_IMPORT_MAX_BYTES ({MAX_IMPORT_BYTES})")
+        self.store.add_embeddings(embeddings, records)
+        self.imported += len(records)
+
+def main(argv: List[str] = None) -> int:
+    import httpx
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="VertexOps server")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY", "supersecret123"))
+    parser.add_argument("--timeout", type=float, default=300)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="download the server's corpus to a file")
+    export.add_argument("--out", required=True)
+    export.add_argument("--format", choices=FORMATS, default="npz")
+    export.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    load = commands.add_parser("import", help="upload an exported file into the server")
+    load.add_argument("path")
+    args = parser.parse_args(argv)
+
+    headers = {"x-api-key": args.api_key}
+    with httpx.Client(base_url=args.url, headers=headers, timeout=args.timeout) as client:
+        if args.command == "export":
+            params = {"format": args.format, "batch_size": args.batch_size}
+            with client.stream("GET", "/vector/export", params=params) as response:
+                if response.is_error:
+                    print(f"Export failed ({response.status_code}): {response.read().decode()}", file=sys.stderr)
+                    return 1
+                with open(args.out, "wb") as f:
+                    for chunk in response.iter_bytes():
+                        f.write(chunk)
+            print(f"Exported {response.headers.get('x-vector-count', '?')} vectors to {args.out}")
+        else:
+            def chunks():
+                with open(args.path, "rb") as f:
+                    while chunk := f.read(1 << 20):
+                        yield chunk
+            response = client.post("/vector/import", content=chunks())
+            if response.is_error:
+                print(f"Import failed ({response.status_code}): {response.text}", file=sys.stderr)
+                return 1
+            print(json.dumps(response.json()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
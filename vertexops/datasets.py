@@ -0,0 +1,352 @@
+import os
+import csv
+import gzip
+import json
+import shutil
+import struct
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import numpy as np
+from .context_packer import estimate_tokens
+
+DATASET_BUCKET_ROOT = Path(os.getenv("DATASET_BUCKET_ROOT", "vertexops/buckets"))
+DATASET_CACHE_DIR = Path(os.getenv("DATASET_CACHE_DIR", "vertexops/dataset_cache"))
+SOURCE_SUFFIXES = (".jsonl", ".csv")
+CACHE_FORMAT = 1
+MAX_REPORTED_ERRORS = 20
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+def resolve_dataset_uri(uri: str) -> Path:
+    """
+    Map a dataset URI to a local path. Bucket URIs (gs://bucket/key, s3://bucket/key)
+    resolve under DATASET_BUCKET_ROOT/bucket/key, a local stand-in for object storage.
+    """
+    for scheme in ("gs://", "s3://"):
+        if uri.startswith(scheme):
+            return DATASET_BUCKET_ROOT / uri[len(scheme):]
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    return Path(uri)
+
+def validate_record(rec: Any) -> Optional[str]:
+    """Return an error message, or None if rec is a prompt/completion, text or chat-messages record."""
+    if not isinstance(rec, dict):
+        return "record is not an object"
+    if "messages" in rec:
+        msgs = rec["messages"]
+        if not isinstance(msgs, list) or not msgs:
+            return "'messages' must be a non-empty list"
+        for m in msgs:
+            if not isinstance(m, dict) or not isinstance(m.get("role"), str) or not isinstance(m.get("content"), str):
+                return "each message needs string 'role' and 'content'"
+        return None
+    if "prompt" in rec or "completion" in rec:
+        if not isinstance(rec.get("prompt"), str) or not isinstance(rec.get("completion"), str):
+            return "'prompt' and 'completion' must both be strings"
+        return None
+    if isinstance(rec.get("text"), str):
+        return None
+    return "expected 'prompt'/'completion', 'text' or 'messages'"
+
+def record_text(rec: Dict[str, Any]) -> str:
+    if "messages" in rec:
+        return "\n".join(m["content"] for m in rec["messages"])
+    if "prompt" in rec:
+        return rec["prompt"] + rec["completion"]
+    return rec["text"]
+
+class DigestSet:
+    """
+    Exact set of 16-byte digests with bounded memory. Recent digests sit in a Python set
+    of `buffer_size`; each time it fills it is frozen into a sorted array, and arrays are
+    merged LSM-style so each level is at least twice the next. Membership is a set probe
+    plus a binary search per level (O(log n) levels).
+
+    Levels are kept in memory up to about `memory_limit` bytes in total (16 bytes per
+    digest). With a `directory`, a merge that would produce a bigger level is written
+    there as a sorted run and read through a memory map, merging run files in blocks, so
+    the process holds at most `memory_limit` plus a block of digests however many are
+    added. The runs live in the page cache, which the OS can evict under pressure. Without
+    a directory every level stays in memory.
+    """
+    MERGE_BLOCK = 1 << 16
+
+    def __init__(self, buffer_size: int = 16384, memory_limit: int = None, directory: Path = None):
+        self.buffer_size = buffer_size
+        self.memory_limit = memory_limit or int(os.getenv("DATASET_DEDUPE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+        self.directory = Path(directory) if directory is not None else None
+        self._recent = set()
+        self._levels: List[np.ndarray] = []  # sorted "S16" arrays (in memory or memmapped), largest first
+        self._runs = 0
+
+    def __len__(self) -> int:
+        return len(self._recent) + sum(len(level) for level in self._levels)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes of levels held in memory (memory-mapped runs excluded)."""
+        return sum(level.nbytes for level in self._levels if not isinstance(level, np.memmap))
+
+    def add(self, digest: bytes) -> bool:
+        """Add a 16-byte digest; returns True if it was already present."""
+        if digest in self._recent:
+            return True
+        if self._levels:
+            key = np.array(digest, dtype="S16")
+            for level in self._levels:
+                if level.searchsorted(key, "right") > level.searchsorted(key, "left"):
+                    return True
+        self._recent.add(digest)
+        if len(self._recent) >= self.buffer_size:
+            self._freeze()
+        return False
+
+    def _freeze(self):
+        level = np.sort(np.array(list(self._recent), dtype="S16"))
+        self._recent = set()
+        while self._levels and len(self._levels[-1]) <= 2 * len(level):
+            level = self._merge(self._levels.pop(), level)
+        self._levels.append(level)
+
+    def _merge(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        # In-memory levels stay under half the limit, so together they never exceed it
+        if self.directory is None or (len(a) + len(b)) * 16 <= self.memory_limit // 2:
+            return np.sort(np.concatenate((a, b)))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"digests-{self._runs:05d}.bin"
+        self._runs += 1
+        out = np.memmap(path, dtype="S16", mode="w+", shape=(len(a) + len(b),))
+        i = j = k = 0
+        while i < len(a) or j < len(b):
+            ca, cb = a[i:i + self.MERGE_BLOCK], b[j:j + self.MERGE_BLOCK]
+            # Everything up to the smallest block end that still has more after it is final
+            ends = [c[-1] for c, pos, src in ((ca, i, a), (cb, j, b)) if pos + len(c) < len(src)]
+            if ends:
+                cut = min(ends)
+                ca, cb = ca[:ca.searchsorted(cut, "right")], cb[:cb.searchsorted(cut, "right")]
+            merged = np.sort(np.concatenate((ca, cb)))
+            out[k:k + len(merged)] = merged
+            i, j, k = i + len(ca), j + len(cb), k + len(merged)
+        out.flush()
+        del out
+        for level in (a, b):
+            if isinstance(level, np.memmap):
+                os.unlink(level.filename)
+        return np.memmap(path, dtype="S16", mode="r")
+
+class DatasetStats:
+    """Incremental dataset statistics; memory does not grow with the dataset."""
+    def __init__(self):
+        self.records = 0
+        self.valid = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.tokens = 0
+        self.chars = 0
+        self.min_tokens: Optional[int] = None
+        self.max_tokens = 0
+        self.token_histogram = [0] * (len(TOKEN_BUCKETS) + 1)
+        self.errors: List[Dict[str, Any]] = []
+
+    def state(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any]) -> "DatasetStats":
+        stats = cls()
+        vars(stats).update(state)
+        return stats
+
+    def add_error(self, source: str, line: int, error: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"source": source, "line": line, "error": error})
+
+    def add_valid(self, text: str):
+        self.valid += 1
+        tokens = estimate_tokens(text)
+        self.tokens += tokens
+        self.chars += len(text)
+        self.min_tokens = tokens if self.min_tokens is None else min(self.min_tokens, tokens)
+        self.max_tokens = max(self.max_tokens, tokens)
+        for i, bound in enumerate(TOKEN_BUCKETS):
+            if tokens <= bound:
+                self.token_histogram[i] += 1
+                break
+        else:
+            self.token_histogram[-1] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        unique = self.valid - self.duplicates
+        return {
+            "records": self.records, "valid": self.valid, "invalid": self.invalid,
+            "duplicates": self.duplicates, "unique": unique,
+            "tokens": self.tokens, "chars": self.chars,
+            "min_tokens": self.min_tokens or 0, "max_tokens": self.max_tokens,
+            "mean_tokens": round(self.tokens / self.valid, 2) if self.valid else 0.0,
+            "token_histogram": {**{f"<={b}": n for b, n in zip(TOKEN_BUCKETS, self.token_histogram)},
+                                f">{TOKEN_BUCKETS[-1]}": self.token_histogram[-1]},
+            "errors": self.errors,
+        }
+
+class ShardWriter:
+    """Write records as gzip-compressed, length-prefixed JSON frames, rotating shards every `shard_records`."""
+    def __init__(self, directory: Path, shard_records: int):
+        self.directory = directory
+        self.shard_records = shard_records
+        self.shards: List[str] = []
+        self._file = None
+        self._count = 0
+
+    def write(self, rec: Dict[str, Any]):
+        if self._file is None or self._count >= self.shard_records:
+            self._rotate()
+        data = json.dumps(rec, separators=(",", ":")).encode("utf-8")
+        self._file.write(struct.pack("<I", len(data)))
+        self._file.write(data)
+        self._count += 1
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        name = f"shard-{len(self.shards):05d}.bin"
+        self.shards.append(name)
+        self._file = gzip.open(self.directory / name, "wb", compresslevel=6)
+        self._count = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def read_shard(path: Path) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rb") as f:
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return
+            (size,) = struct.unpack("<I", header)
+            yield json.loads(f.read(size))
+
+class DatasetLoader:
+    """
+    Stream a fine-tuning dataset (JSONL/CSV file or a directory of them) in chunks.
+
+    The first full pass validates each record, collects statistics, drops duplicates
+    and writes the surviving records to a sharded binary cache keyed by the source
+    fingerprint (paths, sizes, mtimes). Later loads of an unchanged dataset read the cache.
+    Only one chunk of records is held in memory at a time. Exact dedupe keeps 16 bytes per
+    unique record, in memory up to DATASET_DEDUPE_MEMORY_BYTES and beyond that in sorted
+    runs spilled to the build directory, so memory stays bounded for any dataset size.
+    """
+    def __init__(self, uri: str, chunk_size: int = None, cache_dir: Path = None, shard_records: int = None):
+        self.uri = uri
+        self.path = resolve_dataset_uri(uri)
+        self.chunk_size = chunk_size or int(os.getenv("DATASET_CHUNK_SIZE", "1000"))
+        self.cache_dir = Path(cache_dir or DATASET_CACHE_DIR)
+        self.shard_records = shard_records or int(os.getenv("DATASET_SHARD_RECORDS", "50000"))
+        self.stats = DatasetStats()
+        self.from_cache = False
+
+    def source_files(self) -> List[Path]:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Dataset not found: {self.uri} ({self.path})")
+        if self.path.is_file():
+            return [self.path]
+        return sorted(p for p in self.path.rglob("*") if p.is_file() and p.suffix in SOURCE_SUFFIXES)
+
+    def fingerprint(self) -> str:
+        h = hashlib.sha256(f"v{CACHE_FORMAT}".encode())
+        for p in self.source_files():
+            st = p.stat()
+            h.update(f"{p.resolve()}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+        return h.hexdigest()[:24]
+
+    @staticmethod
+    def _read_source(path: Path) -> Iterator[Tuple[int, Any]]:
+        # (line number, parsed record or ValueError)
+        with open(path, newline="", encoding="utf-8") as f:
+            if path.suffix == ".csv":
+                for i, row in enumerate(csv.DictReader(f), start=2):
+                    yield i, row
+                return
+            for i, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield i, json.loads(line)
+                except ValueError as e:
+                    yield i, e
+
+    def _iter_source(self, writer: ShardWriter, seen: DigestSet) -> Iterator[Dict[str, Any]]:
+        for path in self.source_files():
+            for line, rec in self._read_source(path):
+                self.stats.records += 1
+                error = f"invalid JSON: {rec}" if isinstance(rec, ValueError) else validate_record(rec)
+                if error:
+                    self.stats.add_error(str(path), line, error)
+                    continue
+                text = record_text(rec)
+                self.stats.add_valid(text)
+                digest = hashlib.blake2b(json.dumps(rec, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+                if seen.add(digest):
+                    self.stats.duplicates += 1
+                    continue
+                writer.write(rec)
+                yield rec
+
+    def _iter_cache(self, directory: Path, manifest: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for name in manifest["shards"]:
+            yield from read_shard(directory / name)
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        fingerprint = self.fingerprint()
+        final = self.cache_dir / fingerprint
+        manifest_path = final / "manifest.json"
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text())
+            self.stats = DatasetStats.restore(manifest["state"])
+            self.from_cache = True
+            yield from self._iter_cache(final, manifest)
+            return
+
+        # Private build directory: concurrent builds of the same dataset don't touch each other's output
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        partial = Path(tempfile.mkdtemp(prefix=f"{fingerprint}.", suffix=".partial", dir=self.cache_dir))
+        writer = ShardWriter(partial, self.shard_records)
+        spill = partial / "digests"  # dedupe runs sit next to the shards while building
+        completed = False
+        try:
+            yield from self._iter_source(writer, DigestSet(directory=spill))
+            completed = True
+        finally:
+            writer.close()
+            if not completed:  # failed or abandoned mid-way
+                shutil.rmtree(partial, ignore_errors=True)
+        shutil.rmtree(spill, ignore_errors=True)
+        manifest = {"uri": self.uri, "fingerprint": fingerprint, "format": CACHE_FORMAT,
+                    "shards": writer.shards, "stats": self.stats.to_dict(), "state": self.stats.state()}
+        (partial / "manifest.json").write_text(json.dumps(manifest))
+        # Publish the completed cache atomically; a concurrent builder may have beaten us to it
+        try:
+            os.replace(partial, final)
+        except OSError:
+            shutil.rmtree(partial, ignore_errors=True)
+
+    def iter_chunks(self) -> Iterator[List[Dict[str, Any]]]:
+        chunk: List[Dict[str, Any]] = []
+        for rec in self.iter_records():
+            chunk.append(rec)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def scan(self) -> Dict[str, Any]:
+        """Consume the whole dataset (building the cache if needed) and return its stats."""
+        for _ in self.iter_chunks():
+            pass
+        return self.stats.to_dict()
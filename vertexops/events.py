@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from typing import Any, Optional, Set
+
+class Subscription:
+    """A subscriber's bounded queue. When it overflows the oldest event is dropped."""
+    def __init__(self, hub: "EventHub", loop: asyncio.AbstractEventLoop, maxsize: int):
+        self._hub = hub
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def _put(self, event: Any):
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float = None) -> Optional[Any]:
+        """Next event, or None if `timeout` seconds pass first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self._hub._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class EventHub:
+    """
+    Fan out events published from any thread (e.g. job workers) to asyncio subscribers.
+    Publishing never blocks: events are handed to each subscriber's loop with
+    call_soon_threadsafe.
+    """
+    def __init__(self, maxsize: int = 100):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscription] = set()
+
+    def subscribe(self) -> Subscription:
+        """Subscribe from within a running event loop."""
+        sub = Subscription(self, asyncio.get_running_loop(), self.maxsize)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event: Any):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, event)
+            except RuntimeError:
+                self._unsubscribe(sub)  # loop already closed
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
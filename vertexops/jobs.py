@@ -0,0 +1,367 @@
+import os
+import time
+import uuid
+import heapq
+import socket
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, List, Tuple
+from .registry import JournaledRegistry, RegistryConflict
+from .monitoring import set_job_gauges, record_job_duration
+
+logger = logging.getLogger(__name__)
+
+JOBS_FILE = Path("vertexops/jobs.json")
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+HOSTNAME = socket.gethostname()
+
+# handler(job, cancelled) -> optional result dict; should return early once `cancelled` is set
+JobHandler = Callable[[Dict[str, Any], threading.Event], Optional[Dict[str, Any]]]
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    # "openai=2,vertex=1"
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        return True  # no cheap check; rely on the heartbeat alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobScheduler:
+    """
+    Persistent priority job queue drained by a fixed pool of worker threads.
+
+    Jobs are stored in a JournaledRegistry, so queued and interrupted jobs are picked up
+    again after a restart (handlers must tolerate being re-run). Higher `priority` runs
+    first, FIFO within a priority. At most `type_limits[model_type]` jobs of one model type
+    run at once. Cancelling a queued job removes it; a running job is asked to stop via
+    the event passed to its handler, also when the cancel comes from another process.
+
+    Several processes can share one jobs file. Each job records the scheduler that owns
+    it, and every scheduler heartbeats into a sidecar owners registry. A scheduler only
+    runs jobs it owns, and moves one from queued to running with a compare-and-set on its
+    registry revision, so no job ever runs in two places. Jobs whose owner stopped,
+    crashed or went silent for `owner_timeout` seconds are adopted by a live scheduler
+    on its next heartbeat.
+    """
+    def __init__(self, jobs_file: Path = None, workers: int = None, type_limits: Dict[str, int] = None,
+                 heartbeat: float = None, owner_timeout: float = None):
+        jobs_file = Path(jobs_file or JOBS_FILE)
+        self._jobs = JournaledRegistry(jobs_file)
+        # Last heartbeat of every scheduler sharing the jobs file, keyed by owner id
+        self._owners = JournaledRegistry(jobs_file.with_name(f"{jobs_file.stem}.owners.json"))
+        self.owner = f"{HOSTNAME}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.heartbeat = heartbeat or float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+        self.owner_timeout = owner_timeout or float(os.getenv("JOB_OWNER_TIMEOUT", "30"))
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.type_limits = type_limits if type_limits is not None else _parse_limits(os.getenv("JOB_TYPE_LIMITS", ""))
+        self.retention = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+        self._handlers: Dict[str, JobHandler] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int, str]] = []  # (-priority, seq, job_id)
+        self._seq = 0
+        self._queued_ids = set()  # heap entries still believed queued, for the depth gauge
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._running_by_type: Dict[str, int] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._stopped = threading.Event()
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Register a callback invoked with a copy of each changed job, in transition order.
+        It runs under the scheduler lock on a worker or caller thread, so it must not block.
+        """
+        self._listeners.append(callback)
+
+    def start(self):
+        """Adopt jobs left unfinished by schedulers that are gone and start the workers."""
+        self._beat()
+        now = time.time()
+        with self._cond:
+            for job_id, job in self._jobs.items():
+                if job["status"] in TERMINAL_STATES and now - (job.get("finished_at") or now) > self.retention:
+                    self._jobs.delete(job_id)
+            self._adopt_orphans()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"vertexops-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._heartbeat, name="vertexops-job-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        with self._cond:
+            self._stopping = True
+            for event in self._cancel_events.values():
+                event.set()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        # Going away: whatever we still own is now an orphan for the other schedulers
+        self._owners.delete(self.owner)
+        self._owners.close()
+        self._jobs.close()
+
+    @property
+    def stopping(self) -> bool:
+        """True once stop() has begun; handlers seeing `cancelled` set then are being interrupted, not cancelled."""
+        return self._stopping
+
+    def _beat(self):
+        self._owners.put(self.owner, {"host": HOSTNAME, "pid": os.getpid(), "heartbeat_at": time.time()})
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.heartbeat):
+            try:
+                self._beat()
+                with self._cond:
+                    self._adopt_orphans()
+                    self._check_cancel_requests()
+            except Exception:
+                logger.exception("Job scheduler heartbeat failed")
+
+    def _check_cancel_requests(self):
+        # Caller holds the condition. Cancels requested through the registry by other processes.
+        for job_id, event in self._cancel_events.items():
+            job = self._jobs.get(job_id)
+            if job is not None and job.get("cancel_requested"):
+                event.set()
+
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        if owner is None:
+            return False
+        if owner == self.owner:
+            return True
+        beat = self._owners.get(owner)
+        if beat is None or time.time() - beat["heartbeat_at"] > self.owner_timeout:
+            return False
+        return beat.get("host") != HOSTNAME or _pid_alive(beat["pid"])
+
+    def _adopt_orphans(self):
+        # Caller holds the condition. Compare-and-set, so two schedulers never adopt the same job.
+        adopted = False
+        for job_id, job in self._jobs.items():
+            if job["status"] in TERMINAL_STATES or self._owner_alive(job.get("owner")):
+                continue
+            rev = self._jobs.revision(job_id)
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] in TERMINAL_STATES or self._owner_alive(job.get("owner")):
+                continue
+            fields = {"owner": self.owner}
+            if job["status"] == "running":
+                fields.update(status="queued", message="Re-queued: its worker stopped")
+            try:
+                job = self._jobs.update(job_id, expected_rev=rev, **fields)
+            except RegistryConflict:
+                continue  # changed under us; looked at again on the next heartbeat
+            self._push(job)
+            self._notify(job)
+            adopted = True
+        if adopted:
+            self._update_gauges()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"queued": len(self._queued_ids), "running": sum(self._running_by_type.values()),
+                    "workers": self.workers, "workers_alive": sum(t.is_alive() for t in self._threads)}
+
+    def registry_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Compaction figures for the jobs registry and its owners sidecar, keyed by registry name."""
+        return {name: {"compactions": r.compactions, "compaction_seconds": r.compaction_seconds}
+                for name, r in (("jobs", self._jobs), ("job_owners", self._owners))}
+
+    def _push(self, job: Dict[str, Any]):
+        # Caller holds the condition
+        self._seq += 1
+        self._queued_ids.add(job["job_id"])
+        heapq.heappush(self._queue, (-job.get("priority", 0), self._seq, job["job_id"]))
+
+    def submit(self, kind: str, payload: Dict[str, Any] = None, priority: int = 0,
+               model_type: str = None, model_id: str = None, job_id: str = None) -> Dict[str, Any]:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = {
+            "job_id": job_id or f"{kind}-{uuid.uuid4().hex[:8]}",
+            "kind": kind,
+            "model_id": model_id,
+            "model_type": model_type,
+            "payload": payload or {},
+            "priority": priority,
+            "status": "queued",
+            "owner": self.owner,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "message": None,
+            "result": None,
+        }
+        with self._cond:
+            self._jobs.put(job["job_id"], job)
+            self._push(job)
+            self._update_gauges()
+            self._notify(job)
+            self._cond.notify()
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def list_jobs(self) -> Dict[str, Dict[str, Any]]:
+        return self._jobs.to_dict()
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a queued job, or signal a running one. Returns the job, or None if unknown.
+        A job already finished is returned as is, without a change or a notification.
+        """
+        with self._cond:
+            while True:
+                rev = self._jobs.revision(job_id)
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None
+                if job["status"] in TERMINAL_STATES:
+                    return dict(job)
+                try:
+                    # Compare-and-set, so a job claimed or finished since we looked isn't overwritten
+                    if job["status"] == "queued":
+                        # The heap entry (here or in the owning process) is skipped lazily when popped
+                        job = self._jobs.update(job_id, expected_rev=rev, status="cancelled", finished_at=time.time(),
+                                                message="Cancelled while queued")
+                    else:
+                        # The job may be running in another process; its scheduler sees the flag on its next heartbeat
+                        job = self._jobs.update(job_id, expected_rev=rev, cancel_requested=True,
+                                                message="Cancellation requested")
+                except RegistryConflict:
+                    continue  # changed meanwhile; look again
+                break
+            if job is None:
+                return None  # deleted meanwhile
+            if job["status"] == "cancelled":
+                self._queued_ids.discard(job_id)
+                self._update_gauges()
+            else:
+                event = self._cancel_events.get(job_id)
+                if event is not None:
+                    event.set()
+            job = dict(job)
+            self._notify(job)
+        return job
+
+    def _limit(self, model_type: Optional[str]) -> int:
+        return self.type_limits.get(model_type or "", self.workers)
+
+    def _claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        queued -> running as a compare-and-set on the job's revision, so a job cancelled,
+        adopted or claimed by another process since we looked is never run twice.
+        Returns the running job, or None if it is no longer ours to run.
+        """
+        # Caller holds the condition
+        while True:
+            rev = self._jobs.revision(job_id)
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued" or job.get("owner") != self.owner:
+                return None
+            try:
+                return dict(self._jobs.update(job_id, expected_rev=rev, status="running", started_at=time.time()))
+            except RegistryConflict:
+                continue
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        # Caller holds the condition. Claims the highest-priority queued job whose model type has a free slot.
+        deferred, picked = [], None
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            job = self._jobs.get(item[2])
+            if job is None or job["status"] != "queued":
+                self._queued_ids.discard(item[2])
+                continue
+            if self._running_by_type.get(job.get("model_type") or "", 0) >= self._limit(job.get("model_type")):
+                deferred.append(item)
+                continue
+            self._queued_ids.discard(item[2])
+            picked = self._claim(item[2])
+            if picked is not None:
+                break
+        for item in deferred:
+            heapq.heappush(self._queue, item)
+        return picked
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                model_type = job.get("model_type") or ""
+                self._running_by_type[model_type] = self._running_by_type.get(model_type, 0) + 1
+                cancelled = self._cancel_events[job["job_id"]] = threading.Event()
+                self._update_gauges()
+                self._notify(job)
+            self._run(job, cancelled)
+            with self._cond:
+                self._running_by_type[model_type] -= 1
+                self._cancel_events.pop(job["job_id"], None)
+                self._update_gauges()
+                # A type slot freed up; wake workers that skipped jobs because of it
+                self._cond.notify_all()
+
+    def _run(self, job: Dict[str, Any], cancelled: threading.Event):
+        start = time.perf_counter()
+        fields: Dict[str, Any]
+        try:
+            result = self._handlers[job["kind"]](job, cancelled)
+            if cancelled.is_set() and not self._stopping:
+                fields = {"status": "cancelled", "message": "Cancelled while running"}
+            elif cancelled.is_set():
+                return  # shutting down: leave it "running"; a live scheduler adopts and re-queues it
+            else:
+                fields = {"status": "succeeded", "result": result}
+        except Exception as e:
+            logger.exception("Job %s failed", job["job_id"])
+            fields = {"status": "failed", "message": str(e)}
+        fields["finished_at"] = time.time()
+        with self._cond:
+            updated = dict(self._jobs.update(job["job_id"], **fields))
+            self._notify(updated)
+        record_job_duration(job["kind"], fields["status"], time.perf_counter() - start)
+
+    def _update_gauges(self):
+        # Caller holds the condition
+        set_job_gauges(len(self._queued_ids), sum(self._running_by_type.values()))
+
+    def _notify(self, job: Dict[str, Any]):
+        job = dict(job)  # snapshot: the registry's dict keeps changing after we return
+        for cb in self._listeners:
+            try:
+                cb(job)
+            except Exception:
+                logger.exception("Job listener failed")
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from time import perf_counter
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
+import httpx
+from .monitoring import record_llm_request, record_llm_hedge, set_circuit_state
+
+logger = logging.getLogger(__name__)
+
+class LLMUnavailable(Exception):
+    """The LLM backend could not answer: circuit open, deadline exceeded or upstream error."""
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over a sliding window of recent calls.
+
+    Opens when at least `min_requests` of the last `window` calls were recorded and the
+    failure ratio reaches `error_rate`. After `cooldown` seconds one trial call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, window: int = 20, min_requests: int = 5, error_rate: float = 0.5, cooldown: float = 10.0):
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._results = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self.state = "closed"
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._set("half_open")
+        if self.state == "half_open":
+            # A trial abandoned by a cancelled caller must not wedge the breaker half-open
+            if self._trial_in_flight and time.monotonic() - self._trial_started < self.cooldown:
+                return False
+            self._trial_in_flight = True
+            self._trial_started = time.monotonic()
+        return True
+
+    def record(self, ok: bool):
+        if self.state == "half_open":
+            self._trial_in_flight = False
+            if ok:
+                self._results.clear()
+                self._set("closed")
+            else:
+                self._open()
+            return
+        self._results.append(ok)
+        failures = self._results.count(False)
+        if len(self._results) >= self.min_requests and failures / len(self._results) >= self.error_rate:
+            self._open()
+
+    def abandon(self):
+        """An admitted call ended without telling us anything about the backend (e.g. the caller's deadline ran out)."""
+        if self.state == "half_open":
+            self._trial_in_flight = False
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._set("open")
+
+    def _set(self, state: str):
+        if state != self.state:
+            logger.warning("LLM circuit breaker %s -> %s", self.state, state)
+        self.state = state
+        set_circuit_state(state)
+
+class LatencyTracker:
+    """Recent successful call latencies, used to pick the hedging delay."""
+    def __init__(self, size: int = 200, min_samples: int = 20, default_delay: float = 2.0, min_delay: float = 0.05):
+        self._samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95()
+        return self.default_delay if p95 is None else max(self.min_delay, p95)
+
+class LLMClient:
+    """
+    OpenAI-compatible completions client with tail-latency controls:
+    per-call deadlines, a hedged duplicate request once the primary is slower than the
+    recent p95, and a circuit breaker that fails fast while the backend is erroring.
+    """
+    def __init__(self, api_key: str, model: str, base_url: str = None, timeout: float = None,
+                 hedge: bool = None, transport: httpx.AsyncBaseTransport = None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")).rstrip("/")
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT", "15"))
+        self.hedge = hedge if hedge is not None else os.getenv("LLM_HEDGE", "1") != "0"
+        self.breaker = CircuitBreaker(
+            error_rate=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+            cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "10")),
+        )
+        self.latencies = LatencyTracker(default_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0")))
+        self._transport = transport  # e.g. httpx.ASGITransport around a local stub
+
+    def _budget(self, deadline: Optional[float]) -> Tuple[float, bool]:
+        """(seconds for this call, whether the caller's deadline rather than LLM_TIMEOUT set them)."""
+        # deadline is an absolute time.monotonic() value propagated from the HTTP layer
+        if deadline is None:
+            return self.timeout, False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            record_llm_request("deadline")
+            raise LLMUnavailable("Deadline already exceeded")
+        return min(self.timeout, remaining), remaining < self.timeout
+
+    def _admit(self):
+        if not self.breaker.allow():
+            record_llm_request("circuit_open")
+            raise LLMUnavailable("Circuit breaker open")
+
+    def _client(self, timeout: float) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=self.base_url, timeout=timeout, transport=self._transport,
+                                 headers={"Authorization": f"Bearer {self.api_key}"})
+
+    async def _post(self, client: httpx.AsyncClient, payload: Dict[str, Any]) -> str:
+        start = perf_counter()
+        r = await client.post("/completions", json=payload)
+        if r.status_code != 200:
+            raise LLMUnavailable(f"Upstream returned {r.status_code}")
+        text = r.json()["choices"][0]["text"]
+        self.latencies.observe(perf_counter() - start)
+        return text
+
+    async def _hedged(self, client: httpx.AsyncClient, payload: Dict[str, Any]) -> str:
+        pending = {asyncio.ensure_future(self._post(client, payload))}
+        try:
+            if self.hedge:
+                done, pending = await asyncio.wait(pending, timeout=self.latencies.hedge_delay())
+                if done:
+                    return done.pop().result()
+                # Primary is slower than usual: race a duplicate, first success wins
+                record_llm_hedge()
+                pending.add(asyncio.ensure_future(self._post(client, payload)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, prompt: str, max_tokens: int = 256, deadline: float = None) -> str:
+        """Return the completion text, or raise LLMUnavailable."""
+        budget, caller_bound = self._budget(deadline)
+        self._admit()
+        payload = {"model": self.model, "prompt": prompt, "max_tokens": max_tokens}
+        try:
+            async with self._client(budget) as client:
+                text = await asyncio.wait_for(self._hedged(client, payload), budget)
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            self._timed_out(caller_bound, "LLM call exceeded its %.2fs budget", budget)
+            raise LLMUnavailable("Deadline exceeded")
+        except (httpx.HTTPError, LLMUnavailable, ValueError, KeyError, IndexError) as e:
+            self._failed("error", "LLM call failed: %s", e)
+            raise LLMUnavailable(str(e)) from e
+        self.breaker.record(True)
+        record_llm_request("ok")
+        return text
+
+    async def stream(self, prompt: str, max_tokens: int = 256, deadline: float = None) -> AsyncIterator[str]:
+        """Relay completion tokens from the streaming API. Raises LLMUnavailable before the first token on failure."""
+        budget, caller_bound = self._budget(deadline)
+        self._admit()
+        payload = {"model": self.model, "prompt": prompt, "max_tokens": max_tokens, "stream": True}
+        ends_at = time.monotonic() + budget
+        try:
+            async with self._client(budget) as client:
+                async with client.stream("POST", "/completions", json=payload) as r:
+                    if r.status_code != 200:
+                        raise LLMUnavailable(f"Upstream returned {r.status_code}")
+                    lines = r.aiter_lines()
+                    while True:
+                        try:
+                            line = await asyncio.wait_for(lines.__anext__(), max(0.0, ends_at - time.monotonic()))
+                        except StopAsyncIteration:
+                            break
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        text = json.loads(data)["choices"][0].get("text")
+                        if text:
+                            yield text
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            self._timed_out(caller_bound, "LLM stream exceeded its %.2fs budget", budget)
+            raise LLMUnavailable("Deadline exceeded")
+        except (httpx.HTTPError, LLMUnavailable, ValueError, KeyError, IndexError) as e:
+            self._failed("error", "LLM stream failed: %s", e)
+            raise LLMUnavailable(str(e)) from e
+        self.breaker.record(True)
+        record_llm_request("ok")
+
+    def _timed_out(self, caller_bound: bool, msg: str, *args):
+        # Only LLM_TIMEOUT expiring says the backend is slow. A caller's short deadline says
+        # nothing about it, and must not let one client open the breaker for everyone.
+        if caller_bound:
+            logger.info(msg, *args)
+            self.breaker.abandon()
+            record_llm_request("deadline")
+        else:
+            self._failed("timeout", msg, *args)
+
+    def _failed(self, outcome: str, msg: str, *args):
+        logger.warning(msg, *args)
+        self.breaker.record(False)
+        record_llm_request(outcome)
@@ -0,0 +1,79 @@
+"""
+Fault-injecting stand-in for an OpenAI-compatible /completions backend.
+
+Run it locally and point the platform at it to rehearse slow or failing upstreams:
+
+    STUB_LATENCY=0.5 STUB_ERROR_RATE=0.2 uvicorn vertexops.llm_stub:app --port 9000
+    OPENAI_BASE_URL=http://127.0.0.1:9000 OPENAI_API_KEY=stub uvicorn vertexops.main:app
+
+Tests mount it in-process with httpx.ASGITransport.
+"""
+import os
+import json
+import random
+import asyncio
+from typing import List, Optional, Tuple
+
+class FaultInjectingLLM:
+    """
+    Minimal ASGI app answering POST /completions (plain and streaming).
+
+    Each request gets `latency` seconds of delay and fails with `error_status` with
+    probability `error_rate`. `script` overrides the first requests with explicit
+    (latency, status) pairs, consumed in arrival order.
+    """
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 script: Optional[List[Tuple[float, int]]] = None, answer: str = "stub answer"):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.script = list(script or [])
+        self.answer = answer
+        self.calls = 0
+
+    def _next_fault(self) -> Tuple[float, int]:
+        self.calls += 1
+        if self.script:
+            return self.script.pop(0)
+        status = self.error_status if random.random() < self.error_rate else 200
+        return self.latency, status
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        if scope["method"] != "POST" or not scope["path"].endswith("/completions"):
+            await self._send(send, 404, b'{"error": "not found"}', b"application/json")
+            return
+
+        latency, status = self._next_fault()
+        await asyncio.sleep(latency)
+        if status != 200:
+            await self._send(send, status, json.dumps({"error": {"message": "injected fault"}}).encode(), b"application/json")
+            return
+
+        payload = json.loads(body or b"{}")
+        if payload.get("stream"):
+            words = self.answer.split(" ")
+            chunks = [f"data: {json.dumps({'choices': [{'text': w + (' ' if i < len(words) - 1 else '')}]})}\n\n"
+                      for i, w in enumerate(words)]
+            await self._send(send, 200, ("".join(chunks) + "data: [DONE]\n\n").encode(), b"text/event-stream")
+        else:
+            await self._send(send, 200, json.dumps({"choices": [{"text": " " + self.answer}]}).encode(), b"application/json")
+
+    @staticmethod
+    async def _send(send, status: int, body: bytes, content_type: bytes):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+app = FaultInjectingLLM(
+    latency=float(os.getenv("STUB_LATENCY", "0.2")),
+    error_rate=float(os.getenv("STUB_ERROR_RATE", "0.0")),
+    error_status=int(os.getenv("STUB_ERROR_STATUS", "503")),
+)
@@ -1,24 +1,95 @@
 import time
+import asyncio
 import uuid
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
-from typing import List
+from typing import List, Optional, Literal
 from pathlib import Path
 import os
+import json
 from .schemas import (
-    DeployRequest, DeployResponse, FineTuneRequest, FineTuneResponse,
-    RAGQueryRequest, RAGQueryResponse, VectorSearchRequest, VectorSearchResponse
+    DeployRequest, DeployResponse, FineTuneRequest, FineTuneResponse, JobResponse,
+    RAGQueryRequest, RAGQueryResponse, RAGBatchQueryRequest, VectorSearchRequest, VectorSearchResponse
 )
-from .auth import get_api_key
-from .vector_store import InMemoryVectorStore
-from .model_service import ModelService
-from .rag_service import RAGService
-from .monitoring import record_request, metrics_response
-from time import perf_counter
+from .auth import get_api_key, get_admin_key, get_stream_api_key, verify_api_key, API_KEY_HEADER
+from .admission import admit
+from .monitoring import (request_totals, metrics_response, register_vector_store, register_model_service,
+                         register_threads, register_event_loop)
+from .middleware import MetricsMiddleware
+from .utils import format_sse, text_to_embedding
+from .singleflight import SingleFlight
+from .events import EventHub
+from .broadcaster import SnapshotBroadcaster, RequestRate
+from .jobs import TERMINAL_STATES
+from .assets import assets
+from .serialization import FastJSONResponse, parse_fields, project
+from . import profiling
+from fastapi.concurrency import run_in_threadpool
 
-app = FastAPI(title="VertexOps - LLMOps Platform (Local MVP)")
+# Services are built by init_services(), normally from the lifespan hook, so importing this
+# module stays cheap: numpy, httpx and the registry I/O are only paid once the app starts.
+SERVICES = ("vector_store", "model_service", "rag_service")
+_services_lock = threading.Lock()
+_created_services = {}  # name -> service built by init_services, so close_services may tear them down
+
+def init_services():
+    """Create the module-level services once. Ones already set (e.g. test doubles) are kept."""
+    global vector_store, model_service, rag_service
+    with _services_lock:
+        created = globals()
+        if "vector_store" not in created:
+            from .vector_store import InMemoryVectorStore
+            vector_store = InMemoryVectorStore()
+        if "model_service" not in created:
+            from .model_service import ModelService
+            Path("vertexops").mkdir(exist_ok=True)
+            model_service = ModelService()
+            _created_services["model_service"] = model_service
+            model_service.scheduler.add_listener(job_events.publish)
+            # Job transitions also go to dashboards as they happen
+            model_service.scheduler.add_listener(lambda job: dashboard_events.publish("job", job))
+        if "rag_service" not in created:
+            from .rag_service import RAGService
+            rag_service = RAGService(vector_store)
+        register_vector_store(vector_store)
+        register_model_service(model_service)
+        register_threads()
+
+def close_services():
+    """
+    Stop the job workers and close the registry files of a model service init_services
+    built, and forget it so the next startup builds a fresh one. Test doubles are left to
+    whoever set them; the vector store and RAG service hold no threads or files.
+    """
+    with _services_lock:
+        service = _created_services.get("model_service")
+        if service is not None and globals().get("model_service") is service:
+            del _created_services["model_service"], globals()["model_service"]
+            service.close()
+
+def __getattr__(name):
+    # `main.model_service` and friends also work before the app has started
+    if name in SERVICES:
+        init_services()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Registry loading and asset compression are blocking I/O; keep them off the event loop
+    await run_in_threadpool(init_services)
+    await run_in_threadpool(assets.load)
+    register_event_loop(asyncio.get_running_loop())
+    yield
+    # Shutdown: stop the dashboard sampler, then the job workers, heartbeat and registry files
+    await dashboard_events.stop()
+    await run_in_threadpool(close_services)
+
+app = FastAPI(title="VertexOps - LLMOps Platform (Local MVP)", lifespan=lifespan)
 
 # CORS for local testing
 app.add_middleware(
@@ -28,28 +99,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request metrics and Server-Timing (outermost, so it times everything below it)
+app.add_middleware(MetricsMiddleware)
 
-# Initialize services
-vector_store = InMemoryVectorStore()
-model_service = ModelService()
-rag_service = RAGService(vector_store)
+search_flights = SingleFlight("vector_search")
+# Job state transitions, pushed to long-pollers and /ws/jobs clients
+job_events = EventHub()
+JOB_MAX_WAIT = 60.0
+RAG_BATCH_MAX_QUERIES = int(os.getenv("RAG_BATCH_MAX_QUERIES", "5000"))
+DEADLINE_HEADER = "x-request-timeout-ms"
+SEARCH_RESULT_FIELDS = ("id", "score", "text", "metadata")
 
-# Ensure models.json exists
-Path("vertexops").mkdir(exist_ok=True)
-
-# Middleware-like helper to record metrics (simple)
-@app.middleware("http")
-async def add_metrics(request, call_next):
-    start = perf_counter()
+def request_deadline(request: Request) -> Optional[float]:
+    """Absolute time.monotonic() deadline from the caller's x-request-timeout-ms header, if any."""
+    value = request.headers.get(DEADLINE_HEADER)
+    if not value:
+        return None
     try:
-        response = await call_next(request)
-        latency = perf_counter() - start
-        record_request(request.method, request.url.path, str(response.status_code), latency)
-        return response
-    except Exception as e:
-        latency = perf_counter() - start
-        record_request(request.method, request.url.path, "500", latency)
-        raise
+        return time.monotonic() + float(value) / 1000.0
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header")
 
 @app.get("/metrics")
 def prometheus_metrics():
@@ -57,33 +126,121 @@ def prometheus_metrics():
 
 @app.post("/models/deploy", response_model=DeployResponse)
 async def deploy_model(req: DeployRequest, api_key: str = Depends(get_api_key)):
-    entry = model_service.deploy_model(req.model_type, req.config)
-    return DeployResponse(model_id=entry["model_id"], status=entry["status"], message=entry.get("message"))
+    entry = model_service.deploy_model(req.model_type, req.config, priority=req.priority)
+    return DeployResponse(model_id=entry["model_id"], status=entry["status"], message=entry.get("message"), job_id=entry["job_id"])
 
 @app.post("/models/{model_id}/finetune", response_model=FineTuneResponse)
 async def finetune_model(model_id: str, req: FineTuneRequest, api_key: str = Depends(get_api_key)):
     status = model_service.get_status(model_id)
     if not status:
         raise HTTPException(status_code=404, detail="Model not found")
-    job = model_service.fine_tune(model_id, req.dataset_uri)
+    job = model_service.fine_tune(model_id, req.dataset_uri, priority=req.priority)
     return FineTuneResponse(job_id=job["job_id"], status=job["status"])
 
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=JOB_MAX_WAIT), api_key: str = Depends(get_api_key)):
+    """Job status. With ?wait=N, an unfinished job is held until its next state change or N seconds."""
+    # Subscribe before reading so a transition between the read and the wait isn't missed
+    with job_events.subscribe() as sub:
+        job = model_service.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if wait and job["status"] not in TERMINAL_STATES:
+            deadline = time.monotonic() + wait
+            while (remaining := deadline - time.monotonic()) > 0:
+                event = await sub.get(timeout=remaining)
+                if event is None:
+                    break
+                if event["job_id"] == job_id:
+                    job = event
+                    break
+    return JobResponse(**job)
+
+@app.websocket("/ws/jobs")
+async def jobs_websocket(websocket: WebSocket):
+    """Push job transitions. Auth via x-api-key header or ?api_key= (browsers can't set WS headers)."""
+    try:
+        verify_api_key(websocket.headers.get(API_KEY_HEADER) or websocket.query_params.get("api_key"))
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    job_filter = websocket.query_params.get("job_id")
+    await websocket.accept()
+    with job_events.subscribe() as sub:
+        try:
+            while True:
+                event = await sub.get(timeout=30)
+                if event is None:
+                    await websocket.send_json({"type": "ping"})  # keepalive; also detects dead clients
+                elif not job_filter or event["job_id"] == job_filter:
+                    await websocket.send_json({"type": "job", "job": event})
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str, api_key: str = Depends(get_api_key)):
+    job = model_service.cancel_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job)
+
 @app.post("/rag/query", response_model=RAGQueryResponse)
-async def rag_query(req: RAGQueryRequest, api_key: str = Depends(get_api_key)):
-    res = await rag_service.generate_response(req.query, top_k=req.top_k or 5)
+async def rag_query(req: RAGQueryRequest, request: Request, api_key: str = Depends(admit("rag")),
+                    deadline: Optional[float] = Depends(request_deadline),
+                    fast: bool = False, fields: Optional[str] = None):
+    """`fast=true` or `fields=id,score` (projects source_docs) skip re-validation and use the fast encoder."""
+    if req.stream:
+        return _rag_event_stream(req, deadline)
+    projection = parse_fields(fields, SEARCH_RESULT_FIELDS)
+    res = await rag_service.generate_response(req.query, top_k=req.top_k or 5, deadline=deadline)
+    if fast or projection:
+        return FastJSONResponse({"response_text": res["response_text"], "source_docs": project(res["source_docs"], projection),
+                                 "confidence_score": res["confidence_score"]}, request)
     return RAGQueryResponse(response_text=res["response_text"], source_docs=res["source_docs"], confidence_score=res["confidence_score"])
 
+@app.post("/rag/query/stream")
+async def rag_query_stream(req: RAGQueryRequest, api_key: str = Depends(admit("rag")),
+                           deadline: Optional[float] = Depends(request_deadline)):
+    return _rag_event_stream(req, deadline)
+
+def _rag_event_stream(req: RAGQueryRequest, deadline: Optional[float] = None) -> StreamingResponse:
+    # Sources go out as soon as retrieval finishes, then LLM tokens as they arrive
+    async def events():
+        async for event, data in rag_service.stream_response(req.query, top_k=req.top_k or 5, deadline=deadline):
+            yield format_sse(event, data)
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/rag/query/batch")
+async def rag_query_batch(req: RAGBatchQueryRequest, api_key: str = Depends(admit("rag")),
+                          deadline: Optional[float] = Depends(request_deadline)):
+    if len(req.queries) > RAG_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {RAG_BATCH_MAX_QUERIES} queries per batch")
+    # One NDJSON line per query, in completion order
+    async def lines():
+        async for item in rag_service.generate_batch(req.queries, top_k=req.top_k or 5,
+                                                     concurrency=req.max_concurrency, deadline=deadline):
+            yield json.dumps(item) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.post("/vector/search", response_model=VectorSearchResponse)
-async def vector_search(req: VectorSearchRequest, api_key: str = Depends(get_api_key)):
+async def vector_search(req: VectorSearchRequest, request: Request, api_key: str = Depends(admit("search")),
+                        fast: bool = False, fields: Optional[str] = None):
+    """`fast=true` or `fields=id,score` (drops text/metadata) skip re-validation and use the fast encoder."""
+    projection = parse_fields(fields, SEARCH_RESULT_FIELDS)
     if req.embedding is None:
         if req.text:
-            from .utils import text_to_embedding
             emb = text_to_embedding(req.text)
+            key = ("text", req.text, req.top_k)  # exact: the embedding is a hash of the raw text
         else:
             raise HTTPException(status_code=400, detail="Provide embedding or text")
     else:
         emb = req.embedding
-    results = vector_store.search(emb, top_k=req.top_k)
+        key = ("embedding", tuple(emb), req.top_k)
+    # Concurrent identical searches share one scan, run off the event loop
+    results = await search_flights.do(key, lambda: run_in_threadpool(vector_store.search, emb, top_k=req.top_k))
+    if fast or projection:
+        return FastJSONResponse({"results": project(results, projection)}, request)
     return VectorSearchResponse(results=results)
 
 # Utility endpoints for data ingestion and listing models / vectors (for testing)
@@ -92,353 +249,94 @@ async def add_vector(id: str, text: str, api_key: str = Depends(get_api_key)):
     rec = vector_store.add_text(id=id, text=text)
     return {"status": "ok", "record": rec}
 
+@app.get("/vector/export")
+def export_vectors(format: Literal["npz", "arrow"] = "npz", batch_size: int = Query(8192, ge=1, le=1_000_000),
+                   api_key: str = Depends(get_api_key)):
+    """Stream the whole corpus (ids, texts, metadata, float32 embeddings) as npz frames or Arrow IPC."""
+    from . import corpus_io
+    try:
+        frames = corpus_io.export_frames(vector_store, format, batch_size)
+    except corpus_io.CorpusFormatError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return StreamingResponse(frames, media_type=corpus_io.MEDIA_TYPES[format], headers={
+        "Content-Disposition": f'attachment; filename="corpus.{corpus_io.EXTENSIONS[format]}"',
+        "X-Vector-Count": str(len(vector_store)), "X-Vector-Dim": str(vector_store.dim or 0)})
+
+@app.post("/vector/import")
+async def import_vectors(request: Request, api_key: str = Depends(get_api_key)):
+    """Append a /vector/export stream (format sniffed from the body); batches load as they arrive."""
+    from . import corpus_io
+    importer = corpus_io.Importer(vector_store)
+    try:
+        async for chunk in request.stream():
+            for item in importer.feed(chunk):
+                await run_in_threadpool(importer.load, item)
+        for item in importer.finish():
+            await run_in_threadpool(importer.load, item)
+    except corpus_io.CorpusFormatError as e:
+        raise HTTPException(status_code=400, detail=f"{e} ({importer.imported} vectors imported before the error)")
+    return {"status": "ok", "imported": importer.imported, "total": len(vector_store)}
+
 @app.get("/models")
-async def list_models(api_key: str = Depends(get_api_key)):
-    # Return models.json content
-    import json
-    p = Path("vertexops/models.json")
-    if p.exists():
-        return json.loads(p.read_text())
-    return {}
+async def list_models(request: Request, status: Optional[str] = None, model_type: Optional[str] = None,
+                      limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None,
+                      api_key: str = Depends(get_api_key)):
+    """
+    Models keyed by id, oldest first. Paginate with the X-Next-Cursor / Link headers.
+    Served from the in-memory registry; an unchanged view answers If-None-Match with 304.
+    """
+    etag = model_service.etag(status, model_type, limit, cursor)
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    try:
+        page, next_cursor, total = model_service.list_page(status, model_type, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Total-Count": str(total)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return JSONResponse(page, headers=headers)
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(mode: Literal["sample", "cprofile"] = "sample",
+                        duration: float = Query(5, gt=0, le=profiling.MAX_SECONDS),
+                        interval_ms: float = Query(5, ge=1, le=1000),
+                        admin_key: str = Depends(get_admin_key)):
+    """
+    Time-boxed profile. `sample`: collapsed stacks of all threads (flamegraph input);
+    `cprofile`: pstats report of the event-loop thread. One capture at a time (409 otherwise).
+    """
+    try:
+        with profiling.capture():
+            if mode == "cprofile":
+                return await profiling.profile_event_loop(duration)
+            counts = await run_in_threadpool(profiling.sample_stacks, duration, interval_ms / 1000)
+            return profiling.collapsed(counts)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/tracemalloc")
+async def admin_tracemalloc(duration: float = Query(10, gt=0, le=profiling.MAX_SECONDS),
+                            top: int = Query(25, ge=1, le=500), frames: int = Query(1, ge=1, le=50),
+                            admin_key: str = Depends(get_admin_key)):
+    """Allocation sites that grew most over `duration` seconds (tracemalloc runs only for the window)."""
+    try:
+        with profiling.capture():
+            stats = await run_in_threadpool(profiling.allocation_diff, duration, top, frames)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"duration": duration, "top": stats}
+
+@app.get("/admin/threads", response_class=PlainTextResponse)
+def admin_threads(admin_key: str = Depends(get_admin_key)):
+    """Current stack of every thread."""
+    return profiling.thread_stacks()
 
 @app.get("/", response_class=HTMLResponse)
-def root():
+def root(request: Request):
     """Professional landing page for VertexOps"""
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>VertexOps - LLMOps Platform</title>
-        <style>
-            * {
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }
-            
-            body {
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                color: #333;
-            }
-            
-            .container {
-                max-width: 1200px;
-                margin: 0 auto;
-                padding: 2rem;
-            }
-            
-            .header {
-                text-align: center;
-                color: white;
-                margin-bottom: 3rem;
-            }
-            
-            .logo {
-                font-size: 3.5rem;
-                font-weight: 700;
-                margin-bottom: 0.5rem;
-                text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-            }
-            
-            .tagline {
-                font-size: 1.3rem;
-                opacity: 0.9;
-                margin-bottom: 1rem;
-            }
-            
-            .version-badge {
-                display: inline-block;
-                background: rgba(255,255,255,0.2);
-                padding: 0.3rem 1rem;
-                border-radius: 20px;
-                font-size: 0.9rem;
-                backdrop-filter: blur(10px);
-            }
-            
-            .main-content {
-                background: white;
-                border-radius: 20px;
-                padding: 3rem;
-                box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-                margin-bottom: 2rem;
-            }
-            
-            .status {
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                margin-bottom: 2rem;
-                padding: 1rem;
-                background: #e8f5e8;
-                border-radius: 10px;
-                border-left: 4px solid #28a745;
-            }
-            
-            .status-dot {
-                width: 12px;
-                height: 12px;
-                background: #28a745;
-                border-radius: 50%;
-                margin-right: 0.5rem;
-                animation: pulse 2s infinite;
-            }
-            
-            @keyframes pulse {
-                0% { opacity: 1; }
-                50% { opacity: 0.5; }
-                100% { opacity: 1; }
-            }
-            
-            .features {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
-                gap: 2rem;
-                margin: 2rem 0;
-            }
-            
-            .feature {
-                padding: 1.5rem;
-                background: #f8f9fa;
-                border-radius: 15px;
-                border-left: 4px solid #667eea;
-                transition: transform 0.3s ease;
-            }
-            
-            .feature:hover {
-                transform: translateY(-5px);
-            }
-            
-            .feature-icon {
-                font-size: 2rem;
-                margin-bottom: 1rem;
-            }
-            
-            .feature-title {
-                font-size: 1.2rem;
-                font-weight: 600;
-                margin-bottom: 0.5rem;
-                color: #333;
-            }
-            
-            .feature-desc {
-                color: #666;
-                line-height: 1.5;
-            }
-            
-            .quick-actions {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 1rem;
-                margin: 2rem 0;
-            }
-            
-            .action-btn {
-                display: block;
-                padding: 1rem 1.5rem;
-                background: #667eea;
-                color: white;
-                text-decoration: none;
-                border-radius: 10px;
-                text-align: center;
-                font-weight: 600;
-                transition: all 0.3s ease;
-                box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
-            }
-            
-            .action-btn:hover {
-                background: #5a67d8;
-                transform: translateY(-2px);
-                box-shadow: 0 6px 20px rgba(102, 126, 234, 0.4);
-            }
-            
-            .action-btn.secondary {
-                background: #6c757d;
-                box-shadow: 0 4px 15px rgba(108, 117, 125, 0.3);
-            }
-            
-            .action-btn.secondary:hover {
-                background: #5a6268;
-            }
-            
-            .api-info {
-                background: #fff3cd;
-                border: 1px solid #ffeaa7;
-                border-radius: 10px;
-                padding: 1.5rem;
-                margin: 2rem 0;
-            }
-            
-            .api-key {
-                font-family: 'Courier New', monospace;
-                background: #f8f9fa;
-                padding: 0.5rem 1rem;
-                border-radius: 5px;
-                color: #d63384;
-                font-weight: 600;
-            }
-            
-            .footer {
-                text-align: center;
-                color: white;
-                margin-top: 2rem;
-                opacity: 0.8;
-            }
-            
-            .stats {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-                gap: 1rem;
-                margin: 2rem 0;
-            }
-            
-            .stat {
-                text-align: center;
-                padding: 1rem;
-                background: rgba(255,255,255,0.1);
-                border-radius: 10px;
-                color: white;
-                backdrop-filter: blur(10px);
-            }
-            
-            .stat-number {
-                font-size: 2rem;
-                font-weight: 700;
-                margin-bottom: 0.5rem;
-            }
-            
-            .stat-label {
-                font-size: 0.9rem;
-                opacity: 0.9;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <div class="logo">🚀 VertexOps</div>
-                <div class="tagline">Professional LLMOps Platform</div>
-                <div class="version-badge">v1.0.0 • Production Ready</div>
-            </div>
-            
-            <div class="stats">
-                <div class="stat">
-                    <div class="stat-number">⚡</div>
-                    <div class="stat-label">High Performance</div>
-                </div>
-                <div class="stat">
-                    <div class="stat-number">🔒</div>
-                    <div class="stat-label">Secure API</div>
-                </div>
-                <div class="stat">
-                    <div class="stat-number">📊</div>
-                    <div class="stat-label">Full Monitoring</div>
-                </div>
-                <div class="stat">
-                    <div class="stat-number">🐳</div>
-                    <div class="stat-label">Docker Ready</div>
-                </div>
-            </div>
-            
-            <div class="main-content">
-                <div class="status">
-                    <div class="status-dot"></div>
-                    <strong>System Status: Online & Ready</strong>
-                </div>
-                
-                <div class="features">
-                    <div class="feature">
-                        <div class="feature-icon">🤖</div>
-                        <div class="feature-title">Model Deployment</div>
-                        <div class="feature-desc">Deploy and manage AI models with automated scaling and version control</div>
-                    </div>
-                    
-                    <div class="feature">
-                        <div class="feature-icon">🔍</div>
-                        <div class="feature-title">RAG Query Engine</div>
-                        <div class="feature-desc">Advanced retrieval-augmented generation with semantic search capabilities</div>
-                    </div>
-                    
-                    <div class="feature">
-                        <div class="feature-icon">🗂️</div>
-                        <div class="feature-title">Vector Search</div>
-                        <div class="feature-desc">High-performance vector similarity search with real-time indexing</div>
-                    </div>
-                    
-                    <div class="feature">
-                        <div class="feature-icon">📈</div>
-                        <div class="feature-title">Monitoring & Metrics</div>
-                        <div class="feature-desc">Comprehensive observability with Prometheus metrics and health checks</div>
-                    </div>
-                </div>
-                
-                <div class="api-info">
-                    <h3>🔐 API Authentication</h3>
-                    <p>Include this header in all requests:</p>
-                    <div class="api-key">x-api-key: supersecret123</div>
-                </div>
-                
-                <div class="quick-actions">
-                    <a href="/docs" class="action-btn">📚 Interactive API Docs</a>
-                    <a href="/dashboard" class="action-btn">📊 Admin Dashboard</a>
-                    <a href="/metrics" class="action-btn secondary">� System Metrics</a>
-                    <a href="/health" class="action-btn secondary">🏥 Health Check</a>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <p>Built with FastAPI • Powered by Python • Ready for Production</p>
-                <p>© 2025 VertexOps Platform</p>
-            </div>
-        </div>
-        
-        <script>
-            // Add some interactivity
-            document.addEventListener('DOMContentLoaded', function() {
-                // Animate features on scroll
-                const features = document.querySelectorAll('.feature');
-                
-                const observer = new IntersectionObserver((entries) => {
-                    entries.forEach(entry => {
-                        if (entry.isIntersecting) {
-                            entry.target.style.opacity = '1';
-                            entry.target.style.transform = 'translateY(0)';
-                        }
-                    });
-                });
-                
-                features.forEach(feature => {
-                    feature.style.opacity = '0';
-                    feature.style.transform = 'translateY(20px)';
-                    feature.style.transition = 'all 0.6s ease';
-                    observer.observe(feature);
-                });
-                
-                // Update status in real-time
-                setInterval(async () => {
-                    try {
-                        const response = await fetch('/health');
-                        const data = await response.json();
-                        if (data.status === 'healthy') {
-                            document.querySelector('.status').style.background = '#e8f5e8';
-                            document.querySelector('.status').style.borderLeftColor = '#28a745';
-                            document.querySelector('.status-dot').style.background = '#28a745';
-                        }
-                    } catch (error) {
-                        document.querySelector('.status').style.background = '#f8d7da';
-                        document.querySelector('.status').style.borderLeftColor = '#dc3545';
-                        document.querySelector('.status-dot').style.background = '#dc3545';
-                    }
-                }, 30000); // Check every 30 seconds
-            });
-        </script>
-    </body>
-    </html>
-    """
-    return HTMLResponse(content=html_content)
+    return assets.response(request, "index.html")
 
 @app.get("/api")
 def api_info():
@@ -463,306 +361,89 @@ def api_info():
                 "list": "GET /models",
                 "finetune": "POST /models/{model_id}/finetune"
             },
+            "jobs": {
+                "status": "GET /jobs/{job_id}?wait=30",
+                "cancel": "POST /jobs/{job_id}/cancel",
+                "push": "WS /ws/jobs"
+            },
             "vector": {
                 "add": "POST /vector/add",
-                "search": "POST /vector/search"
+                "search": "POST /vector/search",
+                "export": "GET /vector/export",
+                "import": "POST /vector/import"
             },
             "rag": {
-                "query": "POST /rag/query"
+                "query": "POST /rag/query",
+                "stream": "POST /rag/query/stream",
+                "batch": "POST /rag/query/batch"
             },
             "system": {
                 "health": "GET /health",
+                "events": "GET /events (SSE)",
+            },
+            "admin": {
+                "profile": "POST /admin/profile?mode=sample|cprofile&duration=5",
+                "allocations": "POST /admin/tracemalloc?duration=10",
+                "threads": "GET /admin/threads"
             }
         }
     }
 
 @app.get("/dashboard", response_class=HTMLResponse)
-def dashboard():
+def dashboard(request: Request):
     """Professional dashboard for monitoring VertexOps"""
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>VertexOps Dashboard</title>
-        <style>
-            * {
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }
-            
-            body {
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-                background: #f8f9fa;
-                color: #333;
-            }
-            
-            .navbar {
-                background: #343a40;
-                color: white;
-                padding: 1rem 2rem;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            
-            .navbar h1 {
-                display: inline;
-                font-size: 1.5rem;
-            }
-            
-            .nav-links {
-                float: right;
-            }
-            
-            .nav-links a {
-                color: white;
-                text-decoration: none;
-                margin-left: 2rem;
-                padding: 0.5rem 1rem;
-                border-radius: 5px;
-                transition: background 0.3s;
-            }
-            
-            .nav-links a:hover {
-                background: rgba(255,255,255,0.1);
-            }
-            
-            .container {
-                max-width: 1200px;
-                margin: 2rem auto;
-                padding: 0 2rem;
-            }
-            
-            .dashboard-grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-                gap: 2rem;
-                margin-bottom: 2rem;
-            }
-            
-            .card {
-                background: white;
-                border-radius: 10px;
-                padding: 2rem;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                transition: transform 0.3s;
-            }
-            
-            .card:hover {
-                transform: translateY(-5px);
-            }
-            
-            .card-header {
-                display: flex;
-                align-items: center;
-                margin-bottom: 1rem;
-            }
-            
-            .card-icon {
-                font-size: 2rem;
-                margin-right: 1rem;
-            }
-            
-            .card-title {
-                font-size: 1.3rem;
-                font-weight: 600;
-            }
-            
-            .metric {
-                font-size: 2.5rem;
-                font-weight: 700;
-                color: #28a745;
-                margin: 1rem 0;
-            }
-            
-            .status-online {
-                color: #28a745;
-            }
-            
-            .status-offline {
-                color: #dc3545;
-            }
-            
-            .activity-log {
-                max-height: 300px;
-                overflow-y: auto;
-            }
-            
-            .log-entry {
-                padding: 0.5rem 0;
-                border-bottom: 1px solid #e9ecef;
-                font-family: 'Courier New', monospace;
-                font-size: 0.9rem;
-            }
-            
-            .btn {
-                display: inline-block;
-                padding: 0.7rem 1.5rem;
-                background: #007bff;
-                color: white;
-                text-decoration: none;
-                border-radius: 5px;
-                margin-right: 1rem;
-                margin-top: 1rem;
-                transition: background 0.3s;
-            }
-            
-            .btn:hover {
-                background: #0056b3;
-            }
-            
-            .btn-success {
-                background: #28a745;
-            }
-            
-            .btn-success:hover {
-                background: #1e7e34;
-            }
-        </style>
-    </head>
-    <body>
-        <nav class="navbar">
-            <h1>🚀 VertexOps Dashboard</h1>
-            <div class="nav-links">
-                <a href="/">Home</a>
-                <a href="/docs">API Docs</a>
-                <a href="/metrics">Metrics</a>
-                <a href="/health">Health</a>
-            </div>
-        </nav>
-        
-        <div class="container">
-            <div class="dashboard-grid">
-                <div class="card">
-                    <div class="card-header">
-                        <div class="card-icon">🏥</div>
-                        <div class="card-title">System Health</div>
-                    </div>
-                    <div class="metric status-online" id="system-status">ONLINE</div>
-                    <p>All services are operational</p>
-                    <a href="/health" class="btn btn-success">Check Health</a>
-                </div>
-                
-                <div class="card">
-                    <div class="card-header">
-                        <div class="card-icon">🤖</div>
-                        <div class="card-title">Models Deployed</div>
-                    </div>
-                    <div class="metric" id="models-count">0</div>
-                    <p>Active model instances</p>
-                    <a href="/docs#/default/deploy_model_models_deploy_post" class="btn">Deploy Model</a>
-                </div>
-                
-                <div class="card">
-                    <div class="card-header">
-                        <div class="card-icon">🗂️</div>
-                        <div class="card-title">Vector Store</div>
-                    </div>
-                    <div class="metric" id="vector-count">0</div>
-                    <p>Documents indexed</p>
-                    <a href="/docs#/default/add_vector_vector_add_post" class="btn">Add Documents</a>
-                </div>
-                
-                <div class="card">
-                    <div class="card-header">
-                        <div class="card-icon">📊</div>
-                        <div class="card-title">API Requests</div>
-                    </div>
-                    <div class="metric" id="requests-count">-</div>
-                    <p>Total requests processed</p>
-                    <a href="/metrics" class="btn">View Metrics</a>
-                </div>
-                
-                <div class="card" style="grid-column: span 2;">
-                    <div class="card-header">
-                        <div class="card-icon">📝</div>
-                        <div class="card-title">Recent Activity</div>
-                    </div>
-                    <div class="activity-log" id="activity-log">
-                        <div class="log-entry">2025-08-25 10:30:15 - Server started successfully</div>
-                        <div class="log-entry">2025-08-25 10:30:16 - Vector store initialized</div>
-                        <div class="log-entry">2025-08-25 10:30:16 - Model service ready</div>
-                        <div class="log-entry">2025-08-25 10:30:16 - RAG service initialized</div>
-                        <div class="log-entry">2025-08-25 10:30:16 - Metrics endpoint active</div>
-                        <div class="log-entry">2025-08-25 10:30:17 - Dashboard loaded</div>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="card">
-                <div class="card-header">
-                    <div class="card-icon">🔧</div>
-                    <div class="card-title">Quick Actions</div>
-                </div>
-                <a href="/docs#/default/rag_query_rag_query_post" class="btn">Test RAG Query</a>
-                <a href="/docs#/default/vector_search_vector_search_post" class="btn">Vector Search</a>
-                <a href="/docs#/default/list_models_models_get" class="btn">List Models</a>
-                <a href="/docs" class="btn btn-success">View Full API</a>
-            </div>
-        </div>
-        
-        <script>
-            // Real-time dashboard updates
-            async function updateDashboard() {
-                try {
-                    // Update system status
-                    const healthResponse = await fetch('/health');
-                    const healthData = await healthResponse.json();
-                    document.getElementById('system-status').textContent = 
-                        healthData.status === 'healthy' ? 'ONLINE' : 'OFFLINE';
-                    
-                    // Update models count
-                    const modelsResponse = await fetch('/models', {
-                        headers: {'x-api-key': 'supersecret123'}
-                    });
-                    if (modelsResponse.ok) {
-                        const modelsData = await modelsResponse.json();
-                        document.getElementById('models-count').textContent = 
-                            Object.keys(modelsData).length;
-                    }
-                    
-                    // Add activity log entry
-                    const now = new Date().toLocaleString();
-                    const logEntry = document.createElement('div');
-                    logEntry.className = 'log-entry';
-                    logEntry.textContent = `${now} - Dashboard updated`;
-                    
-                    const activityLog = document.getElementById('activity-log');
-                    activityLog.insertBefore(logEntry, activityLog.firstChild);
-                    
-                    // Keep only last 10 entries
-                    while (activityLog.children.length > 10) {
-                        activityLog.removeChild(activityLog.lastChild);
-                    }
-                    
-                } catch (error) {
-                    console.error('Dashboard update failed:', error);
-                    document.getElementById('system-status').textContent = 'ERROR';
-                    document.getElementById('system-status').className = 'metric status-offline';
-                }
-            }
-            
-            // Update dashboard every 10 seconds
-            setInterval(updateDashboard, 10000);
-            
-            // Initial update
-            updateDashboard();
-        </script>
-    </body>
-    </html>
-    """
-    return HTMLResponse(content=html_content)
+    return assets.response(request, "dashboard.html")
 
-@app.get("/health")
-def health_check():
-    """Health check endpoint for monitoring"""
+@app.get("/static/{name}", include_in_schema=False)
+def static_asset(name: str, request: Request):
+    """Fingerprinted css/js for the UI pages; cached forever by browsers"""
+    return assets.response(request, name)
+
+def service_health():
     return {
         "status": "healthy",
-        "timestamp": time.time(),
         "services": {
             "vector_store": "active",
             "model_service": "active", 
             "rag_service": "active"
         }
     }
+
+@app.get("/health")
+def health_check():
+    """Health check endpoint for monitoring"""
+    return {**service_health(), "timestamp": time.time()}
+
+def dashboard_snapshot():
+    """Everything the dashboard shows; computed once per tick for all /events subscribers."""
+    return {
+        "timestamp": time.time(),
+        "health": service_health(),
+        "models": model_service.summary(),
+        "vectors": {"count": len(vector_store)},
+        "requests": request_rate(),
+    }
+
+# One shared sampler for every dashboard
+request_rate = RequestRate(request_totals)
+dashboard_events = SnapshotBroadcaster(dashboard_snapshot)
+
+@app.get("/events")
+async def events_stream(request: Request, api_key: str = Depends(get_stream_api_key)):
+    """
+    Server-Sent Events for dashboards: a `snapshot` (health, model counts, vector count,
+    request rate) whenever it changes, and a `job` event per job transition.
+    Auth via x-api-key header or ?api_key= (EventSource can't set headers).
+    """
+    async def events():
+        with dashboard_events.subscribe() as sub:
+            # Read before yielding: a freshly started sampler publishes its first snapshot itself
+            latest = dashboard_events.latest
+            yield "retry: 5000\n\n"
+            if latest is not None:
+                yield format_sse("snapshot", latest)
+            while not await request.is_disconnected():
+                event = await sub.get(timeout=15)
+                yield ": keepalive\n\n" if event is None else format_sse(*event)
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
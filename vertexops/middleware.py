@@ -0,0 +1,47 @@
+from time import perf_counter
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .monitoring import record_request
+from .tracing import start_trace, server_timing
+
+# Endpoint label for requests no route matched (404s, scanners), so they share one series
+UNMATCHED = "<unmatched>"
+
+class MetricsMiddleware:
+    """
+    Pure ASGI request metrics: count, latency and response size per method, route
+    template and status, plus the Server-Timing header from the request's stage spans.
+
+    Unlike BaseHTTPMiddleware it adds no extra task or stream per request. Series are
+    labelled by the matched route's template (/models/{model_id}/finetune), which the
+    router leaves in scope["route"], so label cardinality is bounded by the route table.
+    Latency and size cover the whole body, including streamed responses.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        spans = start_trace()
+        status = 500  # if the app raises before responding
+        size = 0
+
+        async def send_with_metrics(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Stages finished before the response started (all of them unless streaming)
+                MutableHeaders(scope=message).append("Server-Timing", server_timing(spans, perf_counter() - start))
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or UNMATCHED
+            record_request(scope["method"], endpoint, status, perf_counter() - start, size)
@@ -0,0 +1,147 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from time import perf_counter
+from typing import Dict, Any, Callable, Iterable
+from .monitoring import record_model_load, record_model_cache_lookup, set_model_cache_resident, record_model_eviction
+
+logger = logging.getLogger(__name__)
+
+class FakeModel:
+    """Local stand-in for an inference handle. `size_bytes` is its nominal (not allocated) footprint."""
+    def __init__(self, model_id: str, size_bytes: int):
+        self.model_id = model_id
+        self.size_bytes = size_bytes
+        self.loaded_at = time.time()
+
+    def predict(self, prompt: str) -> str:
+        return f"[{self.model_id}] {prompt}"
+
+class FakeModelLoader:
+    """Builds FakeModels after sleeping `load_latency` seconds, like pulling weights would."""
+    def __init__(self, load_latency: float = None, size_bytes: int = None):
+        self.load_latency = load_latency if load_latency is not None else float(os.getenv("FAKE_MODEL_LOAD_SECONDS", "0.5"))
+        self.size_bytes = size_bytes or int(os.getenv("FAKE_MODEL_BYTES", str(256 * 1024 * 1024)))
+        self.loads = 0
+
+    def __call__(self, model: Dict[str, Any]) -> FakeModel:
+        time.sleep(self.load_latency)
+        self.loads += 1
+        size = int((model.get("config") or {}).get("size_bytes", self.size_bytes))
+        return FakeModel(model["model_id"], size)
+
+class ModelHandleCache:
+    """
+    LRU of loaded model handles bounded by a memory budget.
+
+    Each handle reports its footprint as `size_bytes`. Loading the same model from
+    several threads at once runs the loader only once. When the budget is exceeded, the
+    least recently used handles are evicted (never the one just loaded).
+    """
+    def __init__(self, loader: Callable[[Dict[str, Any]], Any], budget_bytes: int = None):
+        self.loader = loader
+        self.budget_bytes = budget_bytes or int(os.getenv("MODEL_CACHE_BUDGET_BYTES", str(2 * 1024 ** 3)))
+        self._lock = threading.Lock()
+        self._handles: "OrderedDict[str, Any]" = OrderedDict()
+        self._loading: Dict[str, threading.Event] = {}
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: Dict[str, Any]):
+        """Return a warm handle for the model entry, loading it on a miss."""
+        return self._get(model, lookup=True)
+
+    def warm(self, model: Dict[str, Any]) -> bool:
+        """
+        Load a handle ahead of its first request, on the calling thread, if the budget has
+        room (nothing is evicted for it). Not counted as a hit or miss.
+        """
+        if self.resident_bytes >= self.budget_bytes:
+            return False
+        self._get(model, lookup=False)
+        return True
+
+    def _get(self, model: Dict[str, Any], lookup: bool):
+        model_id = model["model_id"]
+        while True:
+            with self._lock:
+                handle = self._handles.get(model_id)
+                if handle is not None:
+                    self._handles.move_to_end(model_id)
+                    if lookup:
+                        self.hits += 1
+                        record_model_cache_lookup(True)
+                    return handle
+                pending = self._loading.get(model_id)
+                if pending is None:
+                    if lookup:
+                        self.misses += 1
+                        record_model_cache_lookup(False)
+                    done = self._loading[model_id] = threading.Event()
+                    break
+            pending.wait()  # another thread is loading it; re-check once it's done
+        try:
+            start = perf_counter()
+            handle = self.loader(model)
+            record_model_load(perf_counter() - start)
+            with self._lock:
+                self._handles[model_id] = handle
+                self.resident_bytes += handle.size_bytes
+                self._evict_over_budget(keep=model_id)
+            return handle
+        finally:
+            with self._lock:
+                del self._loading[model_id]
+            done.set()
+
+    def _evict_over_budget(self, keep: str):
+        # Caller holds the lock
+        while self.resident_bytes > self.budget_bytes and len(self._handles) > 1:
+            model_id = next(iter(self._handles))
+            if model_id == keep:
+                self._handles.move_to_end(keep)
+                continue
+            self._drop(model_id)
+        set_model_cache_resident(self.resident_bytes, len(self._handles))
+
+    def _drop(self, model_id: str):
+        # Caller holds the lock
+        handle = self._handles.pop(model_id)
+        self.resident_bytes -= handle.size_bytes
+        record_model_eviction()
+
+    def evict(self, model_id: str) -> bool:
+        """Drop a handle, e.g. after its model was retrained."""
+        with self._lock:
+            if model_id not in self._handles:
+                return False
+            self._drop(model_id)
+            set_model_cache_resident(self.resident_bytes, len(self._handles))
+            return True
+
+    def preload(self, models: Iterable[Dict[str, Any]]) -> threading.Thread:
+        """Warm handles in a background thread, most recent first, without evicting to make room."""
+        def _run():
+            for model in sorted(models, key=lambda m: m.get("created_at", 0), reverse=True):
+                try:
+                    if not self.warm(model):
+                        break
+                except Exception:
+                    logger.exception("Preloading %s failed", model.get("model_id"))
+        t = threading.Thread(target=_run, name="vertexops-model-preload", daemon=True)
+        t.start()
+        return t
+
+    def __contains__(self, model_id: str) -> bool:
+        with self._lock:
+            return model_id in self._handles
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"handles": len(self._handles), "resident_bytes": self.resident_bytes,
+                    "budget_bytes": self.budget_bytes, "hits": self.hits, "misses": self.misses,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0}
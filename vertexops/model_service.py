@@ -1,72 +1,210 @@
 import uuid
 import json
 import time
+import base64
+import bisect
+import hashlib
+import logging
 import threading
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
+from .registry import JournaledRegistry, RegistryConflict
+from .jobs import JobScheduler
+from .datasets import DatasetLoader
+from .model_cache import ModelHandleCache, FakeModelLoader
+
+logger = logging.getLogger(__name__)
 
 MODELS_FILE = Path("vertexops/models.json")
 
 class ModelService:
-    def __init__(self):
+    # Simulated work per job; deploys outrank fine-tunes in the queue
+    DEPLOY_SECONDS = 2.0
+    FINETUNE_SECONDS = 3.0
+    DEPLOY_PRIORITY = 10
+    FINETUNE_PRIORITY = 0
+
+    def __init__(self, models_file: Path = None, scheduler: JobScheduler = None, model_loader=None):
         self._lock = threading.Lock()
-        # Load or init
-        if MODELS_FILE.exists():
-            try:
-                self._models = json.loads(MODELS_FILE.read_text())
-            except Exception:
-                self._models = {}
-        else:
-            self._models = {}
-            self._persist()
-
-    def _persist(self):
-        with self._lock:
-            MODELS_FILE.write_text(json.dumps(self._models, indent=2))
+        models_file = Path(models_file or MODELS_FILE)
+        # Load or init: snapshot in models.json, changes appended to models.journal
+        self._models = JournaledRegistry(models_file)
+        self._sorted: Tuple[int, List[Tuple[float, str]], Dict[str, Dict[str, Any]]] = (-1, [], {})
+        self._counts: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        # Warm pool of inference handles; deployed models are loaded in the background
+        self.handles = ModelHandleCache(model_loader or FakeModelLoader())
+        self.handles.preload([m for m in self._models.to_dict().values() if m.get("status") == "deployed"])
+        # Deploys and fine-tunes run on a bounded, persistent job queue. Started last: adopted
+        # jobs can run straight away and use everything above.
+        self.scheduler = scheduler or JobScheduler(models_file.with_name("jobs.json"))
+        self.scheduler.register("deploy", self._run_deploy)
+        self.scheduler.register("finetune", self._run_finetune)
+        self.scheduler.start()
 
-    def deploy_model(self, model_type: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    def deploy_model(self, model_type: str, config: Dict[str, Any], priority: int = None) -> Dict[str, Any]:
         model_id = f"model-{uuid.uuid4().hex[:8]}"
+        job_id = f"deploy-{uuid.uuid4().hex[:8]}"
         entry = {
             "model_id": model_id,
             "model_type": model_type,
             "config": config,
             "status": "deploying",
             "created_at": time.time(),
-            "message": "Starting deployment"
+            "message": "Starting deployment",
+            "job_id": job_id
         }
-        with self._lock:
-            self._models[model_id] = entry
-            self._persist()
+        self._models.put(model_id, entry)
+        self.scheduler.submit("deploy", priority=self.DEPLOY_PRIORITY if priority is None else priority,
+                              model_type=model_type, model_id=model_id, job_id=job_id)
+        return dict(entry)
+
+    def _run_deploy(self, job: Dict[str, Any], cancelled: threading.Event):
+        if cancelled.wait(self.DEPLOY_SECONDS):  # simulate some work
+            if not self.scheduler.stopping:  # on shutdown the job is re-run elsewhere, so keep "deploying"
+                self._models.update(job["model_id"], status="cancelled", message="Deployment cancelled")
+            return None
+        model = self._models.update(job["model_id"], status="deployed", message="Deployment succeeded (simulated)")
+        # Warm it before the first request; we're already on a scheduler worker, so load inline
+        try:
+            if model is not None:
+                self.handles.warm(model)
+        except Exception:
+            logger.exception("Warming %s failed; it will load on first use", job["model_id"])
+        return {"model_id": job["model_id"]}
 
-        # Simulate async deployment in background
-        threading.Thread(target=self._finish_deploy, args=(model_id,), daemon=True).start()
-        return entry
+    def get_status(self, model_id: str):
+        return self._models.get(model_id)
+
+    def get_handle(self, model_id: str):
+        """Warm inference handle for a deployed model (loaded on first use); None if not deployed."""
+        model = self._models.get(model_id)
+        if model is None or model.get("status") != "deployed":
+            return None
+        return self.handles.get(model)
+
+    def list_models(self) -> Dict[str, Dict[str, Any]]:
+        return self._models.to_dict()
 
-    def _finish_deploy(self, model_id):
-        time.sleep(2)  # simulate some work
+    @property
+    def version(self) -> int:
+        return self._models.version
+
+    def etag(self, *params) -> str:
+        """Weak ETag for a registry view: changes whenever the registry or the view parameters do."""
+        view = hashlib.sha1(json.dumps(params).encode()).hexdigest()[:8]
+        # Lineage and version are shared by every worker process, so any worker can answer 304
+        return f'W/"{self._models.lineage}-{self._models.version}-{view}"'
+
+    def _sorted_view(self):
+        # (created_at, model_id) keys and a snapshot, rebuilt only when the registry version moves
         with self._lock:
-            if model_id in self._models:
-                self._models[model_id]["status"] = "deployed"
-                self._models[model_id]["message"] = "Deployment succeeded (simulated)"
-                self._persist()
+            version = self._models.version
+            if self._sorted[0] != version:
+                models = self._models.to_dict()
+                keys = sorted((m.get("created_at", 0.0), k) for k, m in models.items())
+                self._sorted = (version, keys, models)
+                self._counts = {}
+            return self._sorted
 
-    def get_status(self, model_id: str):
+    @staticmethod
+    def _matches(model: Dict[str, Any], status: Optional[str], model_type: Optional[str]) -> bool:
+        return (status is None or model.get("status") == status) and (model_type is None or model.get("model_type") == model_type)
+
+    def summary(self) -> Dict[str, Any]:
+        """Model counts by status, from the cached sorted view."""
+        version, _, models = self._sorted_view()
+        by_status: Dict[str, int] = {}
+        for m in models.values():
+            by_status[m.get("status")] = by_status.get(m.get("status"), 0) + 1
+        return {"total": len(models), "by_status": by_status, "version": version}
+
+    def stats(self) -> Dict[str, Any]:
+        """Resource figures for the metrics collector: jobs, registry compactions, handle cache."""
+        models = {"compactions": self._models.compactions, "compaction_seconds": self._models.compaction_seconds}
+        return {"jobs": self.scheduler.stats(), "handles": self.handles.stats(),
+                "registries": {"models": models, **self.scheduler.registry_stats()}}
+
+    @staticmethod
+    def encode_cursor(key: Tuple[float, str]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[float, str]:
+        """Raises ValueError on a malformed cursor."""
+        try:
+            created_at, model_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            return float(created_at), str(model_id)
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid cursor") from e
+
+    def list_page(self, status: str = None, model_type: str = None, limit: int = 100,
+                  cursor: str = None) -> Tuple[Dict[str, Dict[str, Any]], Optional[str], int]:
+        """Models ordered by creation time, after `cursor`. Returns (page, next cursor, total matching)."""
+        version, keys, models = self._sorted_view()
+        start = bisect.bisect_right(keys, self.decode_cursor(cursor)) if cursor else 0
+        page: Dict[str, Dict[str, Any]] = {}
+        next_cursor = None
+        for key in keys[start:]:
+            model = models[key[1]]
+            if not self._matches(model, status, model_type):
+                continue
+            if len(page) == limit:
+                next_cursor = self.encode_cursor(last)
+                break
+            page[key[1]] = model
+            last = key
         with self._lock:
-            return self._models.get(model_id)
-
-    def fine_tune(self, model_id: str, dataset_uri: str) -> Dict[str, Any]:
-        job_id = f"finetune-{uuid.uuid4().hex[:8]}"
-        job = {"job_id": job_id, "model_id": model_id, "dataset_uri": dataset_uri, "status": "running", "started_at": time.time()}
-        # store job under model if needed
-        def _run():
-            time.sleep(3)
+            total = self._counts.get((status, model_type)) if self._sorted[0] == version else None
+        if total is None:
+            total = sum(1 for m in models.values() if self._matches(m, status, model_type))
             with self._lock:
-                if model_id in self._models:
-                    ver = self._models[model_id].get("version", 0) + 1
-                    self._models[model_id]["version"] = ver
-                    self._models[model_id]["status"] = "deployed"
-                    self._models[model_id]["last_finetune_job"] = job_id
-                    self._persist()
-            job["status"] = "succeeded"
-        threading.Thread(target=_run, daemon=True).start()
+                if self._sorted[0] == version:
+                    self._counts[(status, model_type)] = total
+        return page, next_cursor, total
+
+    def fine_tune(self, model_id: str, dataset_uri: str, priority: int = None) -> Dict[str, Any]:
+        model = self._models.get(model_id) or {}
+        return self.scheduler.submit("finetune", {"dataset_uri": dataset_uri},
+                                     priority=self.FINETUNE_PRIORITY if priority is None else priority,
+                                     model_type=model.get("model_type"), model_id=model_id)
+
+    def _run_finetune(self, job: Dict[str, Any], cancelled: threading.Event):
+        # Stream the dataset once: validates it, gathers stats and builds the shard cache
+        loader = DatasetLoader(job["payload"]["dataset_uri"])
+        for _ in loader.iter_chunks():
+            if cancelled.is_set():
+                return None
+        dataset = loader.stats.to_dict()
+        if not dataset["unique"]:
+            raise ValueError(f"Dataset has no valid records ({dataset['invalid']} invalid)")
+        if cancelled.wait(self.FINETUNE_SECONDS):  # simulate training
+            return None
+        model_id = job["model_id"]
+        while True:
+            # Compare-and-set, since another worker process may bump the version concurrently
+            rev = self._models.revision(model_id)
+            model = self._models.get(model_id)
+            if model is None:
+                raise ValueError(f"Model {model_id} no longer exists")
+            ver = model.get("version", 0) + 1
+            try:
+                self._models.update(model_id, expected_rev=rev, version=ver, status="deployed", last_finetune_job=job["job_id"])
+                break
+            except RegistryConflict:
+                continue
+        self.handles.evict(model_id)  # new weights; the next request loads the new version
+        return {"model_id": model_id, "version": ver, "dataset": dataset, "dataset_cached": loader.from_cache}
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.scheduler.get(job_id)
+
+    def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.scheduler.cancel(job_id)
+        if job and job["kind"] == "deploy" and job["status"] == "cancelled":
+            # Never started, so the handler won't get to update the model
+            self._models.update(job["model_id"], status="cancelled", message="Deployment cancelled")
         return job
+
+    def close(self):
+        self.scheduler.stop()
+        self._models.close()
@@ -1,12 +1,212 @@
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+import time
+import asyncio
+import logging
+import threading
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 from fastapi import Response
 
+logger = logging.getLogger(__name__)
+
 REQUEST_COUNT = Counter("vertexops_requests_total", "Total API requests", ["method", "endpoint", "status"])
 REQUEST_LATENCY = Histogram("vertexops_request_latency_seconds", "Request latency", ["endpoint"])
+RESPONSE_SIZE = Histogram("vertexops_response_size_bytes", "Response body size", ["endpoint"],
+                          buckets=(100, 1000, 10_000, 100_000, 1_000_000, 10_000_000))
+_request_children = {}
+
+def record_request(method: str, endpoint: str, status, latency: float, size: int = None):
+    # Bound children per (method, endpoint, status); endpoint is a route template, so this stays small
+    key = (method, endpoint, status)
+    children = _request_children.get(key)
+    if children is None:
+        children = _request_children[key] = (REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=str(status)),
+                                              REQUEST_LATENCY.labels(endpoint=endpoint),
+                                              RESPONSE_SIZE.labels(endpoint=endpoint))
+    children[0].inc()
+    children[1].observe(latency)
+    if size is not None:
+        children[2].observe(size)
 
-def record_request(method: str, endpoint: str, status: str, latency: float):
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status).inc()
-    REQUEST_LATENCY.labels(endpoint=endpoint).observe(latency)
+def request_totals():
+    """(all requests, 5xx responses) served so far, summed over every label."""
+    total = errors = 0.0
+    for metric in REQUEST_COUNT.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                total += sample.value
+                if sample.labels.get("status", "").startswith("5"):
+                    errors += sample.value
+    return total, errors
 
 def metrics_response():
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+RAG_CACHE_REQUESTS = Counter("vertexops_rag_cache_requests_total", "Semantic RAG cache lookups", ["result"])
+RAG_CACHE_SAVED_SECONDS = Counter("vertexops_rag_cache_saved_seconds_total", "Generation latency avoided by semantic cache hits")
+
+def record_cache_lookup(hit: bool, saved: float = 0.0):
+    RAG_CACHE_REQUESTS.labels(result="hit" if hit else "miss").inc()
+    if hit and saved > 0:
+        RAG_CACHE_SAVED_SECONDS.inc(saved)
+
+SINGLEFLIGHT_REQUESTS = Counter("vertexops_singleflight_requests_total", "Requests by single-flight role", ["scope", "role"])
+
+def record_coalesced(scope: str, leader: bool):
+    SINGLEFLIGHT_REQUESTS.labels(scope=scope, role="leader" if leader else "follower").inc()
+
+RAG_PROMPT_TOKENS = Histogram("vertexops_rag_prompt_tokens", "Estimated prompt tokens per RAG request", ["model"],
+                              buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384))
+
+def record_prompt_tokens(model: str, tokens: int):
+    RAG_PROMPT_TOKENS.labels(model=model).observe(tokens)
+
+LLM_REQUESTS = Counter("vertexops_llm_requests_total", "LLM backend calls by outcome", ["outcome"])
+LLM_HEDGED = Counter("vertexops_llm_hedged_requests_total", "Duplicate LLM requests sent after the hedging delay")
+LLM_CIRCUIT_OPEN = Gauge("vertexops_llm_circuit_open", "1 while the LLM circuit breaker is open or half-open")
+
+def record_llm_request(outcome: str):
+    LLM_REQUESTS.labels(outcome=outcome).inc()
+
+def record_llm_hedge():
+    LLM_HEDGED.inc()
+
+def set_circuit_state(state: str):
+    LLM_CIRCUIT_OPEN.set(0 if state == "closed" else 1)
+
+STAGE_LATENCY = Histogram("vertexops_stage_latency_seconds", "Latency of pipeline stages", ["component", "stage"],
+                          buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+_stage_children = {}
+
+def record_stage(component: str, stage: str, latency: float):
+    # Cache bound children; .labels() does a lock + dict lookup per call
+    child = _stage_children.get((component, stage))
+    if child is None:
+        child = _stage_children[(component, stage)] = STAGE_LATENCY.labels(component=component, stage=stage)
+    child.observe(latency)
+
+JOB_QUEUE_DEPTH = Gauge("vertexops_job_queue_depth", "Jobs waiting for a worker")
+JOBS_RUNNING = Gauge("vertexops_jobs_running", "Jobs currently running")
+JOB_DURATION = Histogram("vertexops_job_duration_seconds", "Job run time by kind and final status", ["kind", "status"],
+                         buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0))
+
+def set_job_gauges(queued: int, running: int):
+    JOB_QUEUE_DEPTH.set(queued)
+    JOBS_RUNNING.set(running)
+
+def record_job_duration(kind: str, status: str, seconds: float):
+    JOB_DURATION.labels(kind=kind, status=status).observe(seconds)
+
+MODEL_LOAD_SECONDS = Histogram("vertexops_model_load_seconds", "Time to load a model handle",
+                               buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+MODEL_CACHE_REQUESTS = Counter("vertexops_model_cache_requests_total", "Model handle cache lookups", ["result"])
+MODEL_CACHE_EVICTIONS = Counter("vertexops_model_cache_evictions_total", "Model handles evicted from the warm pool")
+MODEL_CACHE_RESIDENT_BYTES = Gauge("vertexops_model_cache_resident_bytes", "Nominal bytes of loaded model handles")
+MODEL_CACHE_HANDLES = Gauge("vertexops_model_cache_handles", "Loaded model handles")
+
+def record_model_load(seconds: float):
+    MODEL_LOAD_SECONDS.observe(seconds)
+
+def record_model_cache_lookup(hit: bool):
+    MODEL_CACHE_REQUESTS.labels(result="hit" if hit else "miss").inc()
+
+def record_model_eviction():
+    MODEL_CACHE_EVICTIONS.inc()
+
+def set_model_cache_resident(resident_bytes: int, handles: int):
+    MODEL_CACHE_RESIDENT_BYTES.set(resident_bytes)
+    MODEL_CACHE_HANDLES.set(handles)
+
+ADMISSION_REQUESTS = Counter("vertexops_admission_requests_total", "Admission decisions by route class "
+                             "(admitted, queued, rate_limited, shed)", ["route_class", "result"])
+ADMISSION_IN_FLIGHT = Gauge("vertexops_admission_in_flight", "Admitted requests holding a slot", ["route_class"])
+ADMISSION_QUEUED = Gauge("vertexops_admission_queued", "Requests waiting for a slot", ["route_class"])
+
+def record_admission(route_class: str, result: str):
+    ADMISSION_REQUESTS.labels(route_class=route_class, result=result).inc()
+
+def set_admission_gauges(route_class: str, in_flight: int, queued: int):
+    ADMISSION_IN_FLIGHT.labels(route_class=route_class).set(in_flight)
+    ADMISSION_QUEUED.labels(route_class=route_class).set(queued)
+
+class ResourceCollector:
+    """
+    Gauges computed at scrape time instead of being pushed on every change: each source
+    is a callable returning metric families, read only when /metrics is scraped, so hot
+    paths pay nothing beyond the counters they already keep. A failing source is logged
+    and skipped rather than breaking the whole scrape.
+    """
+    def __init__(self):
+        self._sources = {}
+
+    def add_source(self, name: str, source):
+        # Keyed by name so re-registering (e.g. a new app in tests) replaces the old source
+        self._sources[name] = source
+
+    def describe(self):
+        return []  # families are dynamic; don't run the sources at registration time
+
+    def collect(self):
+        for name, source in list(self._sources.items()):
+            try:
+                yield from source()
+            except Exception:
+                logger.exception("Metrics source %s failed", name)
+
+RESOURCES = ResourceCollector()
+REGISTRY.register(RESOURCES)
+
+def _gauge(name: str, doc: str, value: float):
+    return GaugeMetricFamily(name, doc, value=value)
+
+def register_vector_store(store):
+    def source():
+        s = store.stats()
+        yield _gauge("vertexops_vector_count", "Vectors in the store", s["vectors"])
+        yield _gauge("vertexops_vector_embedding_bytes", "Bytes of live embeddings (count x dim x float32)", s["embedding_bytes"])
+        yield _gauge("vertexops_vector_allocated_bytes", "Bytes allocated for the embedding matrix and norms", s["allocated_bytes"])
+        yield _gauge("vertexops_vector_resident_bytes", "Approximate bytes held by the store, records included", s["resident_bytes"])
+        yield CounterMetricFamily("vertexops_vector_lock_wait_seconds", "Time spent waiting for the store lock", value=s["lock_wait_seconds"])
+        yield CounterMetricFamily("vertexops_vector_lock_contended", "Store lock acquisitions that had to wait", value=s["lock_contended"])
+        yield CounterMetricFamily("vertexops_vector_index_grows", "Embedding matrix reallocations", value=s["grows"])
+        yield CounterMetricFamily("vertexops_vector_index_grow_seconds", "Time spent reallocating the embedding matrix", value=s["grow_seconds"])
+    RESOURCES.add_source("vector_store", source)
+
+def register_model_service(service):
+    def source():
+        s = service.stats()
+        yield _gauge("vertexops_job_workers_alive", "Job worker threads alive", s["jobs"]["workers_alive"])
+        count = CounterMetricFamily("vertexops_registry_compactions", "Registry journal compactions", labels=["registry"])
+        seconds = CounterMetricFamily("vertexops_registry_compaction_seconds", "Time spent compacting registry journals", labels=["registry"])
+        for name, r in s["registries"].items():
+            count.add_metric([name], r["compactions"])
+            seconds.add_metric([name], r["compaction_seconds"])
+        yield count
+        yield seconds
+    RESOURCES.add_source("model_service", source)
+
+def register_threads():
+    def source():
+        yield _gauge("vertexops_threads", "Python threads alive in this process", threading.active_count())
+    RESOURCES.add_source("threads", source)
+
+def register_event_loop(loop, timeout: float = 1.0):
+    """
+    Event-loop lag, probed when scraped: time for a callback scheduled from the scraping
+    thread to run on the loop. /metrics is a sync route, so scrapes run in the threadpool;
+    on the loop thread itself (or if the loop has stopped) the probe is skipped.
+    """
+    def source():
+        if loop.is_closed() or not loop.is_running():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                return
+        except RuntimeError:
+            pass
+        ran = threading.Event()
+        start = time.perf_counter()
+        loop.call_soon_threadsafe(ran.set)
+        lag = time.perf_counter() - start if ran.wait(timeout) else timeout
+        yield _gauge("vertexops_event_loop_lag_seconds", "Delay before a callback scheduled on the event loop runs "
+                     f"(capped at {timeout:g}s)", lag)
+    RESOURCES.add_source("event_loop", source)
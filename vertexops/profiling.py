@@ -0,0 +1,108 @@
+import io
+import os
+import sys
+import time
+import pstats
+import asyncio
+import cProfile
+import threading
+import traceback
+import tracemalloc
+from collections import Counter
+from typing import Dict, List
+
+# Upper bound for any time-boxed capture
+MAX_SECONDS = float(os.getenv("ADMIN_PROFILE_MAX_SECONDS", "60"))
+# Only one capture at a time: profiles taken under load shouldn't stack up on each other
+_busy = threading.Lock()
+
+class ProfilerBusy(Exception):
+    """Another profile or allocation trace is already running."""
+
+class capture:
+    """Context manager holding the single capture slot; raises ProfilerBusy if it's taken."""
+    def __enter__(self):
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        return self
+
+    def __exit__(self, *exc):
+        _busy.release()
+        return False
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+def sample_stacks(duration: float, interval: float = 0.005) -> Dict[str, int]:
+    """
+    Statistical profile of every thread: every `interval` seconds, walk each thread's
+    current frame stack. Returns collapsed stacks ("thread;outer;...;inner" -> samples),
+    the input format of flamegraph tools. Costs nothing when not running.
+    """
+    names = {t.ident: t.name for t in threading.enumerate()}
+    me = threading.get_ident()
+    counts: Counter = Counter()
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if ident not in names:
+                names.update((t.ident, t.name) for t in threading.enumerate())
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return dict(counts)
+
+def collapsed(counts: Dict[str, int]) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in sorted(counts.items(), key=lambda kv: -kv[1]))
+
+async def profile_event_loop(duration: float, sort: str = "cumulative", limit: int = 50) -> str:
+    """
+    Deterministic cProfile of the event-loop thread for `duration` seconds: every
+    coroutine step and sync handler run on the loop in that window (threadpool work is
+    not included; use sample_stacks for that). Returns the pstats report.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+def allocation_diff(duration: float, top: int = 25, frames: int = 1) -> List[str]:
+    """
+    Top allocation sites by growth over `duration` seconds. tracemalloc is started just
+    for the window (unless something else already runs it), so it costs nothing idle.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    try:
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        before = tracemalloc.take_snapshot().filter_traces(filters)
+        time.sleep(duration)
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+    finally:
+        if started:
+            tracemalloc.stop()
+    return [str(stat) for stat in after.compare_to(before, "traceback" if frames > 1 else "lineno")[:top]]
+
+def thread_stacks() -> str:
+    """Current stack of every thread, like a JVM thread dump."""
+    threads = {t.ident: t for t in threading.enumerate()}
+    parts = []
+    for ident, frame in sys._current_frames().items():
+        thread = threads.get(ident)
+        name = thread.name if thread else f"thread-{ident}"
+        daemon = " daemon" if thread is not None and thread.daemon else ""
+        parts.append(f'"{name}" id={ident}{daemon}\n' + "".join(traceback.format_stack(frame)))
+    return "\n".join(parts)
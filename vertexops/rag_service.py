@@ -1,42 +1,205 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Tuple
 from .vector_store import InMemoryVectorStore
 from .utils import text_to_embedding
+from .semantic_cache import SemanticCache
+from .monitoring import record_cache_lookup, record_prompt_tokens
+from .context_packer import pack_context, context_budget, estimate_tokens
+from .llm_client import LLMClient, LLMUnavailable
+from .singleflight import SingleFlight
+from .tracing import stage
 import os
-import httpx
-import time
+import re
+import asyncio
+from time import perf_counter
+from starlette.concurrency import run_in_threadpool
 
 # Simple RAG orchestrator. Use a real LLM or Vertex AI in production.
 class RAGService:
+    # Delay between simulated answer chunks when streaming the local fallback
+    FALLBACK_CHUNK_DELAY = 0.005
+
     def __init__(self, vector_store: InMemoryVectorStore):
         self.vs = vector_store
         self.OPENAI_KEY = os.getenv("OPENAI_API_KEY") or None
+        self.model = os.getenv("OPENAI_MODEL", "text-davinci-003")
+        self.context_budget = context_budget(self.model)
+        # Calls go through LLMClient for deadlines, hedging and circuit breaking
+        self.llm = LLMClient(self.OPENAI_KEY, self.model) if self.OPENAI_KEY else None
+        self.cache = SemanticCache() if os.getenv("RAG_CACHE_ENABLED", "1") != "0" else None
+        if self.cache is not None:
+            self.vs.add_listener(self.cache.invalidate)
+        self._flights = SingleFlight("rag")
+        self.batch_concurrency = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+        # Queries per similarity scan in a batch: bounds the (queries x corpus) score matrix
+        self.batch_search_chunk = int(os.getenv("RAG_BATCH_SEARCH_CHUNK", "128"))
+
+    def _cache_lookup(self, q_emb: List[float], top_k: int):
+        if self.cache is None:
+            return None
+        with stage("rag", "cache_lookup"):
+            entry = self.cache.lookup(q_emb, top_k)
+        record_cache_lookup(entry is not None, entry["latency"] if entry else 0.0)
+        return entry["result"] if entry else None
+
+    def _cache_store(self, q_emb: List[float], top_k: int, result: Dict[str, Any], start: float, generation):
+        if self.cache is not None:
+            self.cache.store(q_emb, top_k, result, perf_counter() - start, generation=generation)
+
+    @staticmethod
+    def _build_prompt(query: str, context: str) -> str:
+        return f"Use the following context to answer the query.\nContext:\n{context}\n\nQuery: {query}\n\nAnswer:"
+
+    def _prepare(self, query: str, hits: List[Dict[str, Any]]) -> Tuple[str, List[str]]:
+        """Pack hits into the model's context budget and build the prompt."""
+        with stage("rag", "prompt"):
+            packed, _ = pack_context(hits, self.context_budget)
+            context_texts = [h["text"] for h in packed]
+            prompt = self._build_prompt(query, "\n\n".join(context_texts))
+        record_prompt_tokens(self.model, estimate_tokens(prompt))
+        return prompt, context_texts
+
+    @staticmethod
+    def _simulated_answer(query: str, context_texts: List[str]) -> str:
+        return f"[SIMULATED LLM ANSWER]\nQuery: {query}\nContext snippets:\n" + "\n---\n".join(context_texts[:3])
+
+    @staticmethod
+    def _confidence(hits: List[Dict[str, Any]]) -> float:
+        return float(sum([h["score"] for h in hits]) / (len(hits) or 1))
+
+    async def generate_response(self, query: str, top_k: int = 5, deadline: float = None) -> Dict[str, Any]:
+        """deadline is an absolute time.monotonic() value; past it the LLM is skipped for the fallback."""
+        # Identical concurrent queries share one retrieval + LLM call (under the first caller's deadline).
+        # Keyed on the exact text: both the embedding and the answer depend on it.
+        key = (query, top_k)
+        return await self._flights.do(key, lambda: self._generate_response(query, top_k, deadline))
 
-    async def generate_response(self, query: str, top_k: int = 5) -> Dict[str, Any]:
-        q_emb = text_to_embedding(query)
-        hits = self.vs.search(q_emb, top_k=top_k)
-        # Build context
-        context_texts = [h["text"] for h in hits]
-        context = "\n\n".join(context_texts)
+    async def _generate_response(self, query: str, top_k: int, deadline: float = None) -> Dict[str, Any]:
+        start = perf_counter()
+        with stage("rag", "embed"):
+            q_emb = text_to_embedding(query)
+        cached = self._cache_lookup(q_emb, top_k)
+        if cached is not None:
+            return dict(cached)
+        generation = self.cache.generation if self.cache is not None else None
+        with stage("rag", "search"):
+            hits = await run_in_threadpool(self.vs.search, q_emb, top_k=top_k)
+        result, cacheable = await self._answer(query, hits, deadline)
+        if cacheable:
+            self._cache_store(q_emb, top_k, result, start, generation)
+        return result
+
+    async def _answer(self, query: str, hits: List[Dict[str, Any]], deadline: float = None) -> Tuple[Dict[str, Any], bool]:
+        """Generate an answer from retrieved hits. Returns (result, cacheable)."""
+        # Build context within the token budget
+        prompt, context_texts = self._prepare(query, hits)
         # If OPENAI_API_KEY is provided, call OpenAI (text-davinci-like) to generate response.
-        if self.OPENAI_KEY:
-            # Minimal OpenAI call using httpx to keep dependency low (you can swap to openai pkg)
-            prompt = f"Use the following context to answer the query.\nContext:\n{context}\n\nQuery: {query}\n\nAnswer:"
-            headers = {"Authorization": f"Bearer {self.OPENAI_KEY}"}
-            # Note: this is simplified; configure model and params as needed
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                # Using the OpenAI Completion API (legacy) - adjust if using Chat Completions API
-                payload = {"model": "text-davinci-003", "prompt": prompt, "max_tokens": 256}
-                r = await client.post("https://api.openai.com/v1/completions", json=payload, headers=headers)
-                if r.status_code == 200:
-                    data = r.json()
-                    text = data["choices"][0]["text"].strip()
-                    confidence = sum([h["score"] for h in hits]) / (len(hits) or 1)
-                    return {"response_text": text, "source_docs": hits, "confidence_score": float(confidence)}
-                else:
-                    # fallback to local response
-                    pass
+        if self.llm is not None:
+            try:
+                with stage("rag", "llm"):
+                    text = await self.llm.complete(prompt, deadline=deadline)
+                return {"response_text": text.strip(), "source_docs": hits, "confidence_score": self._confidence(hits)}, True
+            except LLMUnavailable:
+                # fallback to local response (not cached, so the LLM is retried next time)
+                return await self._fallback_response(query, hits, context_texts), False
+        return await self._fallback_response(query, hits, context_texts), True
+
+    async def _fallback_response(self, query: str, hits: List[Dict[str, Any]], context_texts: List[str]) -> Dict[str, Any]:
         # Local deterministic fallback: combine and return
-        time.sleep(0.1)
-        response = f"[SIMULATED LLM ANSWER]\nQuery: {query}\nContext snippets:\n" + "\n---\n".join(context_texts[:3])
-        confidence = sum([h["score"] for h in hits]) / (len(hits) or 1)
-        return {"response_text": response, "source_docs": hits, "confidence_score": float(confidence)}
+        with stage("rag", "fallback"):
+            await asyncio.sleep(0.1)
+            response = self._simulated_answer(query, context_texts)
+        return {"response_text": response, "source_docs": hits, "confidence_score": self._confidence(hits)}
+
+    async def stream_response(self, query: str, top_k: int = 5, deadline: float = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of generate_response. Yields (event, data) pairs:
+        "sources" once retrieval is done, then "token" chunks, then "done" with the full answer.
+        """
+        start = perf_counter()
+        with stage("rag", "embed"):
+            q_emb = text_to_embedding(query)
+        cached = self._cache_lookup(q_emb, top_k)
+        if cached is not None:
+            yield "sources", {"source_docs": cached["source_docs"], "confidence_score": cached["confidence_score"]}
+            yield "token", {"text": cached["response_text"]}
+            yield "done", {"response_text": cached["response_text"]}
+            return
+        generation = self.cache.generation if self.cache is not None else None
+        with stage("rag", "search"):
+            hits = await run_in_threadpool(self.vs.search, q_emb, top_k=top_k)
+        confidence = self._confidence(hits)
+        yield "sources", {"source_docs": hits, "confidence_score": confidence}
+
+        prompt, context_texts = self._prepare(query, hits)
+        parts: List[str] = []
+        if self.llm is not None:
+            try:
+                async for token in self.llm.stream(prompt, deadline=deadline):
+                    parts.append(token)
+                    yield "token", {"text": token}
+            except LLMUnavailable as e:
+                if parts:
+                    # Tokens already went out; we can't splice in the fallback answer
+                    yield "error", {"detail": f"Upstream stream failed: {e}"}
+                    return
+        cacheable = bool(parts) or self.llm is None  # don't cache a fallback for a failed upstream
+        if not parts:
+            # Local fallback: stream the simulated answer word by word
+            for chunk in re.findall(r"\S+\s*|\s+", self._simulated_answer(query, context_texts)):
+                await asyncio.sleep(self.FALLBACK_CHUNK_DELAY)
+                parts.append(chunk)
+                yield "token", {"text": chunk}
+        text = "".join(parts).strip()
+        if cacheable:
+            result = {"response_text": text, "source_docs": hits, "confidence_score": confidence}
+            self._cache_store(q_emb, top_k, result, start, generation)
+        yield "done", {"response_text": text}
+
+    async def generate_batch(self, queries: List[str], top_k: int = 5, concurrency: int = None,
+                             deadline: float = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many queries: batched vector searches for the cache misses, in chunks of
+        `batch_search_chunk` queries off the event loop, then LLM calls with at most
+        `concurrency` in flight. Yields per-item results in completion order.
+        """
+        limit = max(1, min(concurrency or self.batch_concurrency, self.batch_concurrency))
+        start = perf_counter()
+        with stage("rag", "embed"):
+            embeddings = [text_to_embedding(q) for q in queries]
+        ready: List[Dict[str, Any]] = []
+        misses: List[int] = []
+        for i, (query, q_emb) in enumerate(zip(queries, embeddings)):
+            cached = self._cache_lookup(q_emb, top_k)
+            if cached is not None:
+                ready.append({"index": i, "query": query, "status": "ok", "cached": True, **cached})
+            else:
+                misses.append(i)
+        for item in ready:
+            yield item
+
+        generation = self.cache.generation if self.cache is not None else None
+        retrieved: List[List[Dict[str, Any]]] = []
+        with stage("rag", "search"):
+            for n in range(0, len(misses), self.batch_search_chunk):
+                chunk = [embeddings[i] for i in misses[n:n + self.batch_search_chunk]]
+                retrieved.extend(await run_in_threadpool(self.vs.search_batch, chunk, top_k=top_k))
+        semaphore = asyncio.Semaphore(limit)
+
+        async def answer(i: int, hits: List[Dict[str, Any]]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result, cacheable = await self._answer(queries[i], hits, deadline)
+                except Exception as e:
+                    return {"index": i, "query": queries[i], "status": "error", "detail": str(e)}
+            if cacheable:
+                self._cache_store(embeddings[i], top_k, result, start, generation)
+            return {"index": i, "query": queries[i], "status": "ok", "cached": False, **result}
+
+        tasks = [asyncio.ensure_future(answer(i, hits)) for i, hits in zip(misses, retrieved)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            # Client went away or the generator was closed early
+            for t in tasks:
+                t.cancel()
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): the files must then belong to a single process
+    fcntl = None
+
+class RegistryConflict(Exception):
+    """A compare-and-set update found the record at a different revision."""
+
+class JournaledRegistry:
+    """
+    Dict of JSON records persisted as a snapshot file plus an append-only journal.
+
+    Every change appends one JSON line (put/update/delete) to the journal, so a write
+    costs O(record) instead of rewriting the whole registry. On load the snapshot is read
+    and the journal replayed; a torn last line from a crash is dropped. Once the journal
+    holds more events than max(compact_every, number of records), it is folded into a new
+    snapshot written to a temp file and atomically renamed over the old one, which keeps
+    compaction cost amortized O(1) per write.
+
+    Several processes (e.g. uvicorn workers) can share the files. Writers take an
+    exclusive flock on a sidecar .lock file, replay whatever other processes appended
+    since their last look, then append. Readers only stat the snapshot and journal:
+    unchanged files cost no reads, a grown journal is replayed from the last offset, and
+    a replaced snapshot (another process compacted) triggers a full reload. Each event
+    carries a sequence number shared by all processes, which is the registry `version`
+    and the revision of the record it touched, for compare-and-set updates.
+    """
+    def __init__(self, snapshot_path: Path, journal_path: Path = None, compact_every: int = None,
+                 fsync: bool = None, refresh_interval: float = None):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = Path(journal_path) if journal_path else self.snapshot_path.with_suffix(".journal")
+        self.lock_path = self.snapshot_path.with_name(self.snapshot_path.name + ".lock")
+        self.compact_every = compact_every or int(os.getenv("REGISTRY_COMPACT_EVERY", "1000"))
+        self.fsync = fsync if fsync is not None else os.getenv("REGISTRY_FSYNC", "0") == "1"
+        # Minimum seconds between change checks on reads; 0 stats the files on every read
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(os.getenv("REGISTRY_REFRESH_INTERVAL", "0"))
+        self._lock = threading.RLock()
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._revs: Dict[str, int] = {}
+        self._journal_events = 0
+        self._journal_offset = 0
+        self._journal_ino = None
+        self._snapshot_id = None
+        self._checked_at = 0.0
+        self._flock_depth = 0
+        # Last applied sequence number; identifies the registry state across processes
+        self.seq = 0
+        # Random id of this registry's history, so a wiped and recreated registry never reuses versions
+        self.lineage = None
+        self._journal = None
+        self.compactions = 0
+        self.compaction_seconds = 0.0
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.lock_path, "a+")
+        with self._lock, self._locked(exclusive=True):
+            self._reload(truncate_torn=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            if self.lineage is None:  # new registry, or a snapshot from before lineages
+                self.lineage = uuid.uuid4().hex[:12]
+                self.compact()
+
+    # -- inter-process locking -----------------------------------------------
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        # Caller holds self._lock. Re-entrant; a nested acquire keeps the outer mode.
+        if fcntl is None or self._flock_depth:
+            self._flock_depth += 1
+            try:
+                yield
+            finally:
+                self._flock_depth -= 1
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._flock_depth = 1
+        try:
+            yield
+        finally:
+            self._flock_depth = 0
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    # -- loading -------------------------------------------------------------
+    @staticmethod
+    def _stat(path: Path) -> Optional[os.stat_result]:
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def _changed(self) -> Optional[str]:
+        """'reload', 'tail' or None, judged from file metadata alone."""
+        snap = self._stat(self.snapshot_path)
+        if (snap and (snap.st_ino, snap.st_mtime_ns, snap.st_size)) != self._snapshot_id:
+            return "reload"
+        journal = self._stat(self.journal_path)
+        if journal is None:
+            return "reload" if self._journal_ino is not None else None
+        if journal.st_ino != self._journal_ino or journal.st_size < self._journal_offset:
+            return "reload"
+        return "tail" if journal.st_size > self._journal_offset else None
+
+    def _reload(self, truncate_torn: bool = False):
+        # Caller holds both locks
+        snap = self._stat(self.snapshot_path)
+        self._data, self._revs, self.seq = {}, {}, 0
+        if snap is not None:
+            try:
+                raw = json.loads(self.snapshot_path.read_text())
+            except (ValueError, OSError):
+                raw = {}
+            if "records" in raw and "seq" in raw:
+                self._data, self._revs = raw["records"], raw.get("revs", {})
+                self.seq, self.lineage = raw["seq"], raw.get("lineage")
+            else:  # plain {key: record} snapshot
+                self._data = raw
+        self._snapshot_id = snap and (snap.st_ino, snap.st_mtime_ns, snap.st_size)
+        self._journal_offset = 0
+        self._journal_events = 0
+        self._journal_ino = None
+        self._tail(truncate_torn)
+        if self._journal is not None and self._journal_ino != os.fstat(self._journal.fileno()).st_ino:
+            self._journal.close()  # journal was replaced under us; append to the new one
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal_ino = os.fstat(self._journal.fileno()).st_ino
+
+    def _tail(self, truncate_torn: bool = False):
+        # Caller holds both locks; replays journal events past the last applied offset
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            self._journal_ino = os.fstat(f.fileno()).st_ino
+            f.seek(self._journal_offset)
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # torn write from a crash; everything after it is discarded
+                if not line.endswith(b"\n"):
+                    break
+                self._apply(event)
+                self._journal_events += 1
+                self._journal_offset += len(line)
+            size = os.fstat(f.fileno()).st_size
+        if truncate_torn and self._journal_offset != size:
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(self._journal_offset)
+
+    def _apply(self, event: Dict[str, Any]):
+        op, key = event["op"], event["key"]
+        self.seq = event.get("seq", self.seq + 1)
+        if op == "put":
+            self._data[key] = event["value"]
+            self._revs[key] = self.seq
+        elif op == "update":
+            if key in self._data:
+                self._data[key].update(event["fields"])
+                self._revs[key] = self.seq
+        elif op == "delete":
+            self._data.pop(key, None)
+            self._revs.pop(key, None)
+
+    def _sync(self, truncate_torn: bool = False):
+        # Caller holds both locks
+        change = self._changed()
+        if change == "reload":
+            self._reload(truncate_torn)
+        elif change == "tail":
+            self._tail(truncate_torn)
+
+    def _refresh(self):
+        # Caller holds self._lock. Under our own exclusive flock we are already in sync.
+        if self._flock_depth:
+            return
+        if self.refresh_interval:
+            now = time.monotonic()
+            if now - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = now
+        if self._changed() is None:
+            return
+        with self._locked(exclusive=False):
+            self._sync()
+
+    # -- writing -------------------------------------------------------------
+    def _commit(self, event: Dict[str, Any]):
+        # Caller holds both locks and has synced
+        event["seq"] = self.seq + 1
+        self._apply(event)
+        self._journal.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_offset = self._journal.tell()
+        self._journal_events += 1
+        if self._journal_events >= max(self.compact_every, len(self._data)):
+            self.compact()
+
+    def _write_snapshot(self):
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        state = {"lineage": self.lineage, "seq": self.seq, "revs": self._revs, "records": self._data}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        snap = os.stat(self.snapshot_path)
+        self._snapshot_id = (snap.st_ino, snap.st_mtime_ns, snap.st_size)
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and truncate it."""
+        with self._lock, self._locked(exclusive=True):
+            start = time.perf_counter()
+            self._sync(truncate_torn=True)
+            self._write_snapshot()
+            # A crash before this truncate just replays idempotent events over the new snapshot
+            self._journal.truncate(0)
+            self._journal.seek(0)
+            self._journal_offset = 0
+            self._journal_events = 0
+            self.compactions += 1
+            self.compaction_seconds += time.perf_counter() - start
+
+    def put(self, key: str, value: Dict[str, Any]):
+        with self._lock, self._locked(exclusive=True):
+            self._sync(truncate_torn=True)
+            self._commit({"op": "put", "key": key, "value": value})
+
+    def update(self, key: str, expected_rev: int = None, **fields) -> Optional[Dict[str, Any]]:
+        """
+        Merge fields into an existing record; returns it, or None if missing.
+        With expected_rev, raises RegistryConflict unless the record is still at that revision.
+        """
+        with self._lock, self._locked(exclusive=True):
+            self._sync(truncate_torn=True)
+            if key not in self._data:
+                return None
+            if expected_rev is not None and self._revs.get(key) != expected_rev:
+                raise RegistryConflict(f"{key} is at revision {self._revs.get(key)}, expected {expected_rev}")
+            self._commit({"op": "update", "key": key, "fields": fields})
+            return self._data[key]
+
+    def delete(self, key: str):
+        with self._lock, self._locked(exclusive=True):
+            self._sync(truncate_torn=True)
+            if key in self._data:
+                self._commit({"op": "delete", "key": key})
+
+    # -- reading -------------------------------------------------------------
+    @property
+    def version(self) -> int:
+        """Sequence number of the last change from any process; bumps on every change."""
+        with self._lock:
+            self._refresh()
+            return self.seq
+
+    def revision(self, key: str) -> Optional[int]:
+        """Sequence number of the record's last change, for update(expected_rev=...)."""
+        with self._lock:
+            self._refresh()
+            return self._revs.get(key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._data.get(key)
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return {k: dict(v) for k, v in self._data.items()}
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return iter(self.to_dict().items())
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._data)
+
+    def close(self):
+        with self._lock:
+            self._journal.close()
+            self._lock_file.close()
@@ -4,23 +4,44 @@ from pydantic import BaseModel
 class DeployRequest(BaseModel):
     model_type: str  # "openai"|"vertex"|"custom"
     config: Optional[Dict[str, Any]] = {}
+    priority: Optional[int] = None  # higher runs first; defaults favour deploys over fine-tunes
 
 class DeployResponse(BaseModel):
     model_id: str
     status: str
     message: Optional[str] = None
+    job_id: Optional[str] = None
 
 class FineTuneRequest(BaseModel):
     dataset_uri: str  # e.g. gs://bucket/dataset.csv or local path
+    priority: Optional[int] = None
 
 class FineTuneResponse(BaseModel):
     job_id: str
     status: str
 
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    model_id: Optional[str] = None
+    priority: int = 0
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+
 class RAGQueryRequest(BaseModel):
     query: str
     context_sources: Optional[List[str]] = []
     top_k: Optional[int] = 5
+    stream: Optional[bool] = False  # stream sources and answer tokens as Server-Sent Events
+
+class RAGBatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: Optional[int] = 5
+    max_concurrency: Optional[int] = None  # capped by RAG_BATCH_CONCURRENCY
 
 class RAGQueryResponse(BaseModel):
     response_text: str
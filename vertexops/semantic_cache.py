@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+import numpy as np
+from typing import Dict, Any, List, Optional, Iterable, Set
+from .utils import EMBED_DIM
+
+class SemanticCache:
+    """
+    Small answer cache for RAG queries, keyed by query-embedding similarity.
+
+    Recent query embeddings live in a fixed-size ring buffer matrix, so a lookup is one
+    matrix-vector product. Entries are dropped when one of the docs they were built from
+    changes, and when a newly added doc could enter their top-k: each entry keeps the
+    lowest score among its sources, and a new doc whose similarity to the cached query
+    reaches that floor, less `margin`, drops it. The margin covers every query close
+    enough to be served the entry (for unit vectors, cos >= threshold implies the
+    scores differ by at most sqrt(2 * (1 - threshold))). An add of more than
+    MAX_SCAN_DOCS docs just clears the cache.
+    """
+    MAX_SCAN_DOCS = 4096
+
+    def __init__(self, dim: int = EMBED_DIM, capacity: int = None, threshold: float = None, ttl: float = None):
+        self.capacity = capacity or int(os.getenv("RAG_CACHE_SIZE", "256"))
+        self.threshold = threshold if threshold is not None else float(os.getenv("RAG_CACHE_THRESHOLD", "0.95"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("RAG_CACHE_TTL", "600"))
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((self.capacity, dim), dtype=np.float32)  # unit-normalized query embeddings
+        self._valid = np.zeros(self.capacity, dtype=bool)
+        self._top_k = np.zeros(self.capacity, dtype=np.int32)
+        self._floor = np.full(self.capacity, -np.inf, dtype=np.float32)  # lowest source score; -inf if under top_k
+        self.margin = float(np.sqrt(2 * max(0.0, 1 - self.threshold)))
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._by_doc: Dict[str, Set[int]] = {}  # source doc id -> slots that used it
+        self._next = 0
+        # Bumped on every invalidation so answers computed across a doc change are not stored
+        self.generation = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        q = np.asarray(embedding, dtype=np.float32)
+        return q / (np.linalg.norm(q) + 1e-12)
+
+    def _drop(self, slot: int):
+        entry = self._entries[slot]
+        if entry is None:
+            return
+        for doc_id in entry["doc_ids"]:
+            slots = self._by_doc.get(doc_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._by_doc[doc_id]
+        self._entries[slot] = None
+        self._valid[slot] = False
+
+    def lookup(self, embedding, top_k: int) -> Optional[Dict[str, Any]]:
+        """Return the cached entry most similar to the query, or None below the threshold."""
+        q = self._normalize(embedding)
+        with self._lock:
+            mask = self._valid & (self._top_k == top_k)
+            if not mask.any():
+                return None
+            sims = self._matrix @ q
+            sims[~mask] = -np.inf
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                return None
+            entry = self._entries[slot]
+            if time.time() - entry["created_at"] > self.ttl:
+                self._drop(slot)
+                return None
+            return entry
+
+    def store(self, embedding, top_k: int, result: Dict[str, Any], latency: float, generation: int = None):
+        """Cache a computed answer. Skipped if docs changed since `generation` was read."""
+        q = self._normalize(embedding)
+        docs = result.get("source_docs", [])
+        doc_ids = {d["id"] for d in docs}
+        scores = [d.get("score") for d in docs]
+        floor = min(scores) if len(docs) >= top_k and None not in scores else -np.inf
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            slot = self._next
+            self._next = (self._next + 1) % self.capacity
+            self._drop(slot)
+            self._matrix[slot] = q
+            self._top_k[slot] = top_k
+            self._floor[slot] = floor
+            self._valid[slot] = True
+            self._entries[slot] = {"result": result, "latency": latency, "doc_ids": doc_ids, "created_at": time.time()}
+            for doc_id in doc_ids:
+                self._by_doc.setdefault(doc_id, set()).add(slot)
+
+    def invalidate(self, doc_ids: Iterable[str], embeddings=None):
+        """
+        Drop every cached answer built from any of the given docs and, given the docs'
+        embeddings (one row each), every answer whose top-k they could now enter.
+        """
+        with self._lock:
+            self.generation += 1
+            for doc_id in doc_ids:
+                for slot in list(self._by_doc.get(doc_id, ())):
+                    self._drop(slot)
+            if embeddings is None or not len(embeddings) or not self._valid.any():
+                return
+            docs = np.asarray(embeddings, dtype=np.float32)
+            if docs.ndim != 2 or docs.shape[1] != self._matrix.shape[1] or len(docs) > self.MAX_SCAN_DOCS:
+                stale = np.flatnonzero(self._valid)
+            else:
+                docs = docs / (np.linalg.norm(docs, axis=1, keepdims=True) + 1e-12)
+                best = (self._matrix @ docs.T).max(axis=1)
+                stale = np.flatnonzero(self._valid & (best >= self._floor - self.margin))
+            for slot in stale:
+                self._drop(int(slot))
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            for slot in range(self.capacity):
+                self._drop(slot)
+
+    def __len__(self):
+        with self._lock:
+            return int(self._valid.sum())
@@ -0,0 +1,54 @@
+import os
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Sequence
+from fastapi import Request, HTTPException
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # listed in requirements.txt; the stdlib encoder keeps minimal installs working
+    orjson = None
+
+# Fast-path bodies at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "65536"))
+# Level 1: most of the size win for a fraction of the CPU of the default level
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "1"))
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """'id,score' -> ['id', 'score']; None keeps every field. Unknown names are a 400."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}; allowed: {', '.join(allowed)}")
+    return names
+
+def project(items: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Keep only `fields` of each item (missing ones are skipped)."""
+    if fields is None:
+        return items
+    return [{f: item[f] for f in fields if f in item} for item in items]
+
+class FastJSONResponse(Response):
+    """
+    JSON response for already-shaped data: skips response_model validation and
+    jsonable_encoder, encodes with orjson, and gzips large bodies when accepted.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content: Any, request: Request = None, status_code: int = 200, headers: Dict[str, str] = None):
+        body = dumps(content)
+        headers = dict(headers or {})
+        if request is not None and len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        super().__init__(body, status_code=status_code, headers=headers)
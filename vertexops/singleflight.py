@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from .monitoring import record_coalesced
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key onto one in-flight task.
+
+    The first caller (leader) starts the work; callers arriving before it finishes await
+    the same result. The task is shielded, so a disconnecting caller doesn't cancel it
+    for the others. Nothing is kept once the task completes.
+    """
+    def __init__(self, scope: str):
+        self.scope = scope
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None and not fut.done() and fut.get_loop() is asyncio.get_running_loop():
+            record_coalesced(self.scope, leader=False)
+            return await asyncio.shield(fut)
+
+        record_coalesced(self.scope, leader=True)
+        fut = asyncio.ensure_future(fn())
+        self._inflight[key] = fut
+
+        def _forget(f):
+            if self._inflight.get(key) is f:
+                del self._inflight[key]
+        fut.add_done_callback(_forget)
+        return await asyncio.shield(fut)
+
+    def __len__(self):
+        return len(self._inflight)
@@ -0,0 +1,42 @@
+// Live dashboard updates, pushed by the server over Server-Sent Events
+const API_KEY = 'supersecret123';
+
+function logActivity(message) {
+    const logEntry = document.createElement('div');
+    logEntry.className = 'log-entry';
+    logEntry.textContent = `${new Date().toLocaleString()} - ${message}`;
+
+    const activityLog = document.getElementById('activity-log');
+    activityLog.insertBefore(logEntry, activityLog.firstChild);
+
+    // Keep only last 10 entries
+    while (activityLog.children.length > 10) {
+        activityLog.removeChild(activityLog.lastChild);
+    }
+}
+
+function setStatus(online) {
+    const status = document.getElementById('system-status');
+    status.textContent = online ? 'ONLINE' : 'OFFLINE';
+    status.className = online ? 'metric status-online' : 'metric status-offline';
+}
+
+const events = new EventSource(`/events?api_key=${encodeURIComponent(API_KEY)}`);
+
+events.addEventListener('snapshot', (e) => {
+    const snapshot = JSON.parse(e.data);
+    setStatus(snapshot.health.status === 'healthy');
+    document.getElementById('models-count').textContent = snapshot.models.total;
+    document.getElementById('vector-count').textContent = snapshot.vectors.count;
+    document.getElementById('requests-count').textContent = Math.round(snapshot.requests.total);
+});
+
+events.addEventListener('job', (e) => {
+    const job = JSON.parse(e.data);
+    logActivity(`${job.kind} ${job.model_id || job.job_id} ${job.status}`);
+});
+
+events.addEventListener('open', () => logActivity('Connected to live updates'));
+
+// EventSource reconnects by itself; show the outage meanwhile
+events.addEventListener('error', () => setStatus(false));
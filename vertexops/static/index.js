@@ -0,0 +1,38 @@
+// Add some interactivity
+document.addEventListener('DOMContentLoaded', function() {
+    // Animate features on scroll
+    const features = document.querySelectorAll('.feature');
+
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                entry.target.style.opacity = '1';
+                entry.target.style.transform = 'translateY(0)';
+            }
+        });
+    });
+
+    features.forEach(feature => {
+        feature.style.opacity = '0';
+        feature.style.transform = 'translateY(20px)';
+        feature.style.transition = 'all 0.6s ease';
+        observer.observe(feature);
+    });
+
+    // Update status in real-time
+    setInterval(async () => {
+        try {
+            const response = await fetch('/health');
+            const data = await response.json();
+            if (data.status === 'healthy') {
+                document.querySelector('.status').style.background = '#e8f5e8';
+                document.querySelector('.status').style.borderLeftColor = '#28a745';
+                document.querySelector('.status-dot').style.background = '#28a745';
+            }
+        } catch (error) {
+            document.querySelector('.status').style.background = '#f8d7da';
+            document.querySelector('.status').style.borderLeftColor = '#dc3545';
+            document.querySelector('.status-dot').style.background = '#dc3545';
+        }
+    }, 30000); // Check every 30 seconds
+});
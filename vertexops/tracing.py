@@ -0,0 +1,47 @@
+from contextvars import ContextVar
+from time import perf_counter
+from typing import List, Optional, Tuple, Dict
+from .monitoring import record_stage
+
+# Spans of the request being handled, set by the HTTP middleware
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("vertexops_spans", default=None)
+
+class stage:
+    """
+    Time a pipeline stage into the stage-latency histogram, and into the current
+    request's spans if a trace is active. A plain class keeps the overhead to two
+    perf_counter calls and a dict lookup.
+    """
+    __slots__ = ("component", "name", "_start")
+
+    def __init__(self, component: str, name: str):
+        self.component = component
+        self.name = name
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = perf_counter() - self._start
+        record_stage(self.component, self.name, elapsed)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((f"{self.component}-{self.name}", elapsed))
+        return False
+
+def start_trace() -> List[Tuple[str, float]]:
+    """Begin collecting spans for the current request; returns the (shared, mutable) span list."""
+    spans: List[Tuple[str, float]] = []
+    _spans.set(spans)
+    return spans
+
+def server_timing(spans: List[Tuple[str, float]], total: float = None) -> str:
+    """Render spans as a Server-Timing header value (durations in ms, repeated stages summed)."""
+    totals: Dict[str, float] = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in totals.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
@@ -1,5 +1,5 @@
 import hashlib
-import numpy as np
+import json
 from typing import List
 
 # Deterministic dummy embeddings: convert text -> fixed-size vector via sha256 bytes
@@ -9,6 +9,7 @@ def text_to_embedding(text: str, dim: int = EMBED_DIM) -> List[float]:
     """
     Deterministic pseudo-embedding for local testing. Replace with real model embeddings.
     """
+    import numpy as np  # deferred, like cosine_similarity, to keep importing this module cheap
     h = hashlib.sha256(text.encode("utf-8")).digest()
     # Repeat bytes to ensure enough length
     buf = (h * ((dim // len(h)) + 1))[:dim]
@@ -26,3 +27,7 @@ def cosine_similarity(query_vec, matrix):
     M_norms = np.linalg.norm(M, axis=1) + 1e-12
     sims = (M @ q) / (M_norms * q_norm)
     return sims.tolist()
+
+def format_sse(event: str, data) -> str:
+    """Encode one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -1,40 +1,194 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Callable, Iterator, Optional
+import sys
 import threading
-from .utils import text_to_embedding, cosine_similarity
+from time import perf_counter
+import numpy as np
+from .utils import text_to_embedding
+from .tracing import stage
+
+class TimedLock:
+    """
+    threading.Lock that accounts for time spent waiting on it. The uncontended path is a
+    single non-blocking acquire; only contended acquisitions are timed.
+    """
+    __slots__ = ("_lock", "wait_seconds", "contended")
 
-class InMemoryVectorStore:
     def __init__(self):
         self._lock = threading.Lock()
-        self._store: List[Dict[str, Any]] = []  # {id, text, metadata, embedding}
+        self.wait_seconds = 0.0
+        self.contended = 0
+
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):
+            start = perf_counter()
+            self._lock.acquire()
+            # Updated while holding the lock, so no extra synchronisation is needed
+            self.wait_seconds += perf_counter() - start
+            self.contended += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        return False
+
+class InMemoryVectorStore:
+    def __init__(self):
+        self._lock = TimedLock()
+        self._records: List[Dict[str, Any]] = []  # {id, text, metadata}; embedding is row i of _matrix
+        # Contiguous float32 embeddings grown by doubling, so search is one matrix product
+        self._matrix: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._listeners: List[Callable[[List[str], np.ndarray], None]] = []
+        # Resource accounting, read at scrape time by stats()
+        self._record_bytes = 0
+        self._grows = 0
+        self._grow_seconds = 0.0
+
+    def __len__(self):
+        return len(self._records)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and contention figures for the metrics collector."""
+        with self._lock._lock:  # not counted as contention
+            n = len(self._records)
+            dim = self.dim or 0
+            allocated = 0 if self._matrix is None else self._matrix.nbytes + self._norms.nbytes
+            return {"vectors": n, "dim": dim, "embedding_bytes": n * dim * 4, "allocated_bytes": allocated,
+                    "resident_bytes": allocated + self._record_bytes,
+                    "lock_wait_seconds": self._lock.wait_seconds, "lock_contended": self._lock.contended,
+                    "grows": self._grows, "grow_seconds": self._grow_seconds}
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def add_listener(self, callback: Callable[[List[str], np.ndarray], None]):
+        """Register a callback invoked with the ids of docs added or replaced and their embeddings (one row each)."""
+        self._listeners.append(callback)
+
+    def _notify(self, ids: List[str], embeddings: np.ndarray):
+        for cb in self._listeners:
+            cb(ids, embeddings)
+
+    def _reserve(self, extra: int, dim: int):
+        # Caller holds the lock
+        n = len(self._records)
+        if self._matrix is None:
+            cap = max(16, extra)
+            self._matrix = np.empty((cap, dim), dtype=np.float32)
+            self._norms = np.empty(cap, dtype=np.float32)
+            return
+        if dim != self._matrix.shape[1]:
+            raise ValueError(f"Embedding dimension {dim} does not match store dimension {self._matrix.shape[1]}")
+        if n + extra > self._matrix.shape[0]:
+            start = perf_counter()
+            cap = max(n + extra, 2 * self._matrix.shape[0])
+            matrix = np.empty((cap, dim), dtype=np.float32)
+            matrix[:n] = self._matrix[:n]
+            norms = np.empty(cap, dtype=np.float32)
+            norms[:n] = self._norms[:n]
+            self._matrix, self._norms = matrix, norms
+            self._grows += 1
+            self._grow_seconds += perf_counter() - start
+
+    def _append(self, vectors: np.ndarray, records: List[Dict[str, Any]]):
+        # Caller holds the lock
+        self._reserve(len(records), vectors.shape[1])
+        n = len(self._records)
+        self._matrix[n:n + len(records)] = vectors
+        self._norms[n:n + len(records)] = np.linalg.norm(vectors, axis=1)
+        self._extend(records)
+
+    def _extend(self, records: List[Dict[str, Any]]):
+        # Caller holds the lock
+        self._records.extend(records)
+        self._record_bytes += sum(sys.getsizeof(r) + sys.getsizeof(r["id"]) + sys.getsizeof(r["text"]) +
+                                  sys.getsizeof(r["metadata"]) for r in records)
 
     def add_text(self, id: str, text: str, metadata: Dict = None, embedding: List[float] = None):
         if embedding is None:
             embedding = text_to_embedding(text)
-        rec = {"id": id, "text": text, "metadata": metadata or {}, "embedding": embedding}
+        rec = {"id": id, "text": text, "metadata": metadata or {}}
+        vectors = np.asarray([embedding], dtype=np.float32)
         with self._lock:
-            self._store.append(rec)
-        return rec
+            self._append(vectors, [rec])
+        self._notify([id], vectors)
+        return {**rec, "embedding": embedding}
 
     def bulk_add(self, items: List[Dict[str, Any]]):
+        if not items:
+            return
+        embeddings = [it.get("embedding") or text_to_embedding(it["text"]) for it in items]
+        records = [{"id": it["id"], "text": it["text"], "metadata": it.get("metadata", {})} for it in items]
+        vectors = np.asarray(embeddings, dtype=np.float32)
         with self._lock:
-            for it in items:
-                emb = it.get("embedding") or text_to_embedding(it["text"])
-                self._store.append({
-                    "id": it["id"],
-                    "text": it["text"],
-                    "metadata": it.get("metadata", {}),
-                    "embedding": emb
-                })
+            self._append(vectors, records)
+        self._notify([it["id"] for it in items], vectors)
+
+    def reserve(self, count: int, dim: int):
+        """Pre-size the embedding matrix for `count` more vectors, so a bulk import copies each batch once."""
+        with self._lock:
+            self._reserve(count, dim)
+
+    def add_embeddings(self, embeddings: np.ndarray, records: List[Dict[str, Any]]):
+        """
+        Append precomputed embeddings (row i belongs to records[i]) without per-row
+        conversion. Into an empty store a float32 C-contiguous array is adopted as the
+        matrix outright (the store takes ownership of it); otherwise it is one block copy
+        into the reserved rows.
+        """
+        if not records:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(records):
+            raise ValueError(f"Expected {len(records)} embeddings, got shape {embeddings.shape}")
+        with self._lock:
+            if self._matrix is None and embeddings.flags.c_contiguous and embeddings.flags.writeable:
+                self._matrix = embeddings
+                self._norms = np.linalg.norm(embeddings, axis=1).astype(np.float32)
+                self._extend(records)
+            else:
+                self._append(embeddings, records)
+        self._notify([r["id"] for r in records], embeddings)
+
+    def export_batches(self, batch_size: int = 8192) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """
+        (records, embeddings) batches of a point-in-time view of the store. Rows below
+        the current count are never rewritten, so the embeddings are views, not copies,
+        and the lock is only held to take the view.
+        """
+        with self._lock:
+            n = len(self._records)
+            records = self._records[:n]
+            matrix = None if self._matrix is None else self._matrix[:n]
+        for start in range(0, n, batch_size):
+            yield records[start:start + batch_size], matrix[start:start + batch_size]
+
+    def _top_k(self, sims: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        # Caller holds the lock. Highest score first; ties keep insertion order.
+        if top_k < len(sims):
+            idx = np.argpartition(-sims, top_k - 1)[:top_k]
+            idx = idx[np.lexsort((idx, -sims[idx]))]
+        else:
+            idx = np.argsort(-sims, kind="stable")
+        return [{"score": float(sims[i]), "id": self._records[i]["id"], "text": self._records[i]["text"],
+                 "metadata": self._records[i]["metadata"]} for i in idx]
 
     def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        return self.search_batch([query_embedding], top_k=top_k)[0]
+
+    def search_batch(self, query_embeddings: List[List[float]], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Cosine top-k for several queries with a single (queries x corpus) matrix product."""
+        if not query_embeddings:
+            return []
+        Q = np.asarray(query_embeddings, dtype=np.float32)
+        q_norms = np.linalg.norm(Q, axis=1) + 1e-12
         with self._lock:
-            if not self._store:
-                return []
-            embeddings = [r["embedding"] for r in self._store]
-            sims = cosine_similarity(query_embedding, embeddings)
-            scored = []
-            for r, s in zip(self._store, sims):
-                scored.append((s, r))
-            scored.sort(key=lambda x: x[0], reverse=True)
-            top = scored[:top_k]
-            return [{"score": float(s), "id": r["id"], "text": r["text"], "metadata": r["metadata"]} for s, r in top]
+            n = len(self._records)
+            if n == 0 or top_k <= 0:
+                return [[] for _ in query_embeddings]
+            with stage("vector_store", "similarity"):
+                M = self._matrix[:n]
+                sims = (Q @ M.T) / ((self._norms[:n] + 1e-12) * q_norms[:, None])
+            with stage("vector_store", "topk"):
+                return [self._top_k(row, top_k) for row in sims]